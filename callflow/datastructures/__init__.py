@@ -6,6 +6,7 @@
 """
 CallFlow's data structure API.
 """
+from .path_table import PathTable  # noqa
 from .supergraph import SuperGraph  # noqa
 from .ensemblegraph import EnsembleGraph  # noqa
 from .metrics import *  # noqa
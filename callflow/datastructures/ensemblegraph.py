@@ -7,7 +7,11 @@
 """
 CallFlow's ensemble super graph.
 """
+import os
+import shutil
+
 from callflow import get_logger
+from callflow.utils import columnar
 from .supergraph import SuperGraph
 
 from callflow.modules import Gradients
@@ -69,8 +73,92 @@ class EnsembleGraph(SuperGraph):
             runs = [name for name, sg in self.supergraphs.items()]
             self.dataframe = self.df_filter_by_search_string("dataset", runs)
 
+        # the statistics are not computed for a subset of the datasets.
+        self.stats = None
+
         return runs
 
+    def write_append(self, path, df):
+        """
+        Append the rows of the datasets unified by UnifyAppend to the ensemble
+        written in path, and rewrite its nxg, paths, filter thresholds, maps
+        and statistics. The default Sankey layout is removed, as it is stale.
+
+        The updated ensemble is written to a copy of path, which is swapped in
+        with a rename, so an interrupted append leaves either the old ensemble
+        or no ensemble (which is then processed from scratch).
+
+        :param path: path to the .callflow directory of the ensemble
+        :param df: (pd.DataFrame) remapped rows (UnifyAppend.dataframe)
+        :return:
+        """
+        LOGGER.info(f"[{self.name}] Appending {len(df)} rows to ({path})")
+        path = os.path.normpath(path)
+        parent, name = os.path.split(path)
+        ftmp = os.path.join(parent, f".{name}.{os.getpid()}.tmp")
+        fold = os.path.join(parent, f".{name}.{os.getpid()}.old")
+        shutil.rmtree(ftmp, ignore_errors=True)
+        shutil.copytree(path, ftmp)
+        try:
+            self._write_append(ftmp, df)
+            os.rename(path, fold)
+            os.rename(ftmp, path)
+        finally:
+            shutil.rmtree(ftmp, ignore_errors=True)
+            shutil.rmtree(fold, ignore_errors=True)
+
+        # the dataframe is read again from the updated store.
+        if self._load_path is not None:
+            self._release()
+
+    def _write_append(self, path, df):
+        """
+        Append the rows to the ensemble written in path (see write_append).
+
+        :param path: path to the staged copy of the ensemble
+        :param df: (pd.DataFrame) remapped rows (UnifyAppend.dataframe)
+        :return:
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["df"])
+        columnar.append_df(fname, df)
+
+        SuperGraph.write_nxg(path, self.nxg)
+        SuperGraph.write_paths(path, self.paths)
+        if self.filter_thresholds is not None:
+            SuperGraph.write_thresholds(path, self.filter_thresholds)
+        SuperGraph.write_module_callsite_maps(
+            path,
+            {
+                "c2idx": self.callsite2idx,
+                "m2idx": self.module2idx,
+                "m2c": self.module2callsite,
+            },
+        )
+
+        if self.stats is not None:
+            columns = ["name", "module", "rank"] + self.time_columns
+            stored = columnar.read_columns(fname)
+            df_all = SuperGraph.read_df(
+                path, columns=[_ for _ in columns if _ in stored], mmap=True
+            )
+            self.stats = self.stats.append(df_all, df, self.name)
+            SuperGraph.write_stats(path, self.stats)
+
+        self.sankey = None
+        SuperGraph.write_sankey(path, None)
+
+    @staticmethod
+    def read_datasets(path):
+        """
+        Names of the datasets in the ensemble written in path.
+
+        :param path: path to the .callflow directory of the ensemble
+        :return: (list) dataset names
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["df"])
+        arrays, _ = columnar.read_arrays(fname, keys=["dataset/categories"])
+        return arrays["dataset/categories"].tolist()
+
     def get_gradients(self, node, nbins):
         """
         Getter to obtain the gradients of a node by the runtime metrics.
@@ -81,5 +169,33 @@ class EnsembleGraph(SuperGraph):
             self, node=node, bins=nbins, proxy_columns=self.proxy_columns
         ).result
 
+    def get_all_gradients(self, nodes, nbins):
+        """
+        Getter to obtain the gradients of several nodes at once (i.e., the
+        per-dataset means of all the nodes are computed in one pass).
+
+        :param nodes (list): nodes (e.g., {"id": 0, "type": "module"})
+        :param nbins (int): number of bins
+        :return (dict): (node type, node index) -> gradients
+        """
+        assert self.name == "ensemble"
+
+        ret = {}
+        for ntype in ["callsite", "module"]:
+            nids = [_.get("id") for _ in nodes if _.get("type") == ntype]
+            if len(nids) == 0:
+                continue
+
+            means = Gradients.dataset_means(self, ntype, nids, self.proxy_columns)
+            for nid in nids:
+                ret[(ntype, nid)] = Gradients(
+                    self,
+                    node={"id": nid, "type": ntype},
+                    bins=nbins,
+                    proxy_columns=self.proxy_columns,
+                    means=means[nid],
+                ).result
+        return ret
+
 
 # ------------------------------------------------------------------------------
@@ -0,0 +1,278 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+"""
+CallFlow's data structure to store the paths of the call sites.
+"""
+import numpy as np
+
+from callflow.utils.columnar import pack_lists
+
+
+# ------------------------------------------------------------------------------
+class PathTable:
+    """
+    Path information (e.g., path, callers, group_path) stored once per call
+    site, instead of a list per row of the dataframe.
+
+    Each column is stored in CSR form, i.e., a flat int32 array of values and
+    the offsets of the rows, and the row of a call site is found by its index
+    (the "name" column of the dataframe). The accessors return numpy views
+    into the flat arrays.
+    """
+
+    # columns and the index map their values refer to
+    COLUMNS = {
+        "path": "callsite",
+        "callers": "callsite",
+        "callees": "callsite",
+        "component_path": "callsite",
+        "group_path": "module",
+    }
+
+    def __init__(self, keys, columns={}):
+        """
+        Constructor to the path table.
+
+        :param keys: (array-like) callsite index of each row (unique)
+        :param columns: (dict) column -> (offsets, values) arrays
+        """
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.columns = {}
+        for column, (offsets, values) in columns.items():
+            assert column in PathTable.COLUMNS
+            assert offsets.shape[0] == self.keys.shape[0] + 1
+            self.columns[column] = (offsets, values)
+
+        self._pos = {k: i for i, k in enumerate(self.keys.tolist())}
+        assert len(self._pos) == self.keys.shape[0]
+
+    def __len__(self):
+        return self.keys.shape[0]
+
+    def __contains__(self, callsite):
+        return callsite in self._pos
+
+    def __str__(self):
+        return f"PathTable<{len(self)} callsites; columns = {list(self.columns)}>"
+
+    def __repr__(self):
+        return self.__str__()
+
+    # --------------------------------------------------------------------------
+    def get(self, column, callsite):
+        """
+        Path of a call site.
+
+        :param column: (str) column (e.g., path, group_path)
+        :param callsite: (int) callsite index
+        :return: (np.array) view of the path
+        """
+        i = self._pos[callsite]
+        offsets, values = self.columns[column]
+        return values[offsets[i] : offsets[i + 1]]
+
+    def as_dict(self, column, callsites=None):
+        """
+        Paths of the call sites as a dictionary.
+
+        :param column: (str) column (e.g., path, group_path)
+        :param callsites: (array-like) callsite indexes, default is all the
+        call sites of the table. The call sites not in the table are skipped.
+        :return: (dict) callsite index -> view of the path
+        """
+        if callsites is None:
+            callsites = self.keys
+        return {int(_): self.get(column, _) for _ in callsites if int(_) in self._pos}
+
+    def take(self, column, callsites):
+        """
+        Paths of call sites in CSR form.
+
+        :param column: (str) column (e.g., path, group_path)
+        :param callsites: (array-like) callsite indexes
+        :return: (np.array, np.array) offsets and values, in the order of
+        callsites
+        """
+        rows = np.array([self._pos[int(_)] for _ in callsites], dtype=np.int64)
+        return PathTable._take({column: self.columns[column]}, rows)[column]
+
+    def add_column(self, column, data):
+        """
+        Add (or replace) a column.
+
+        :param column: (str) column (e.g., path, group_path)
+        :param data: (dict) callsite index -> list of indexes; the call sites
+        that are not in data get an empty list.
+        """
+        assert column in PathTable.COLUMNS
+        offsets, values = pack_lists([data.get(_, []) for _ in self.keys.tolist()])
+        self.columns[column] = (offsets, values.astype(np.int32))
+
+    def add_csr_column(self, column, callsites, offsets, values):
+        """
+        Add (or replace) a column from CSR arrays.
+
+        :param column: (str) column (e.g., path, group_path)
+        :param callsites: (array-like) callsite index of each row of the CSR
+        arrays; the other call sites get an empty list.
+        :param offsets: (np.array) offsets (len(callsites) + 1)
+        :param values: (np.array) flat values
+        """
+        assert column in PathTable.COLUMNS
+        rows = np.array([self._pos[int(_)] for _ in callsites], dtype=np.int64)
+        assert offsets.shape[0] == rows.shape[0] + 1
+
+        lengths = np.zeros(len(self), dtype=np.int64)
+        lengths[rows] = np.diff(offsets)
+        _offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=_offsets[1:])
+
+        # the values in the order of the rows of the table
+        taken = PathTable._take({column: (offsets, values)}, np.argsort(rows))
+        self.columns[column] = (_offsets, taken[column][1].astype(np.int32))
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def from_dicts(data):
+        """
+        Create a path table from dictionaries of lists.
+
+        :param data: (dict) column -> {callsite index -> list of indexes}
+        :return: (PathTable)
+        """
+        keys = sorted(set().union(*[_.keys() for _ in data.values()]))
+        table = PathTable(keys)
+        for column, _data in data.items():
+            table.add_column(column, _data)
+        return table
+
+    @staticmethod
+    def from_dataframe(df):
+        """
+        Create a path table from the list columns of a dataframe (i.e., the
+        dataframes processed before the path table). The first row of each
+        call site is used.
+
+        :param df: (pd.DataFrame) dataframe with a name column
+        :return: (PathTable)
+        """
+        first = df.drop_duplicates(subset="name")
+        table = PathTable(first["name"].to_numpy())
+        for column in PathTable.COLUMNS:
+            if column in first.columns:
+                offsets, values = pack_lists(first[column].to_numpy(dtype=object))
+                table.columns[column] = (offsets, values.astype(np.int32))
+        return table
+
+    @staticmethod
+    def from_arrays(arrays):
+        """
+        Create a path table from the arrays of PathTable.to_arrays.
+
+        :param arrays: (dict) name -> np.array
+        :return: (PathTable)
+        """
+        columns = {
+            column: (arrays[f"{column}/offsets"], arrays[f"{column}/values"])
+            for column in PathTable.COLUMNS
+            if f"{column}/offsets" in arrays
+        }
+        return PathTable(arrays["keys"], columns)
+
+    def to_arrays(self):
+        """
+        Arrays of the path table (e.g., to write a columnar store).
+
+        :return: (dict) name -> np.array
+        """
+        arrays = {"keys": self.keys}
+        for column, (offsets, values) in self.columns.items():
+            arrays[f"{column}/offsets"] = offsets
+            arrays[f"{column}/values"] = values
+        return arrays
+
+    # --------------------------------------------------------------------------
+    def subset(self, callsites):
+        """
+        Path table restricted to a set of call sites.
+
+        :param callsites: (array-like) callsite indexes
+        :return: (PathTable)
+        """
+        callsites = set(int(_) for _ in callsites)
+        rows = np.array(
+            [i for i, k in enumerate(self.keys.tolist()) if k in callsites],
+            dtype=np.int64,
+        )
+        return PathTable(self.keys[rows], PathTable._take(self.columns, rows))
+
+    def remap(self, luts):
+        """
+        Path table with its callsite and module indexes remapped (e.g., to the
+        indexes of an ensemble).
+
+        :param luts: (dict) {"callsite": np.array, "module": np.array} lookup
+        arrays from the indexes of this table (see Unify.lookup_array)
+        :return: (PathTable)
+        """
+        columns = {}
+        for column, (offsets, values) in self.columns.items():
+            lut = luts[PathTable.COLUMNS[column]]
+            columns[column] = (offsets, np.take(lut, values).astype(np.int32))
+        return PathTable(np.take(luts["callsite"], self.keys), columns)
+
+    @staticmethod
+    def merge(tables):
+        """
+        Merge path tables of the same index space. A call site present in
+        several tables gets the paths of the first one.
+
+        :param tables: (list) PathTables
+        :return: (PathTable) rows sorted by callsite index
+        """
+        assert len(tables) > 0
+        keys = np.concatenate([_.keys for _ in tables])
+
+        columns = {}
+        for column in PathTable.COLUMNS:
+            if not any(column in _.columns for _ in tables):
+                continue
+
+            offsets, values = [np.zeros(1, dtype=np.int64)], []
+            for table in tables:
+                _offsets, _values = table.columns.get(
+                    column,
+                    (np.zeros(len(table) + 1, dtype=np.int64), np.array([], np.int32)),
+                )
+                offsets.append(_offsets[1:] + offsets[-1][-1])
+                values.append(_values)
+            columns[column] = (np.concatenate(offsets), np.concatenate(values))
+
+        # np.unique returns the first occurrence of each key.
+        keys, rows = np.unique(keys, return_index=True)
+        return PathTable(keys, PathTable._take(columns, rows))
+
+    @staticmethod
+    def _take(columns, rows):
+        """
+        Rows of the CSR columns.
+
+        :param columns: (dict) column -> (offsets, values) arrays
+        :param rows: (np.array) row numbers
+        :return: (dict) column -> (offsets, values) arrays
+        """
+        ret = {}
+        for column, (offsets, values) in columns.items():
+            lengths = np.diff(offsets)[rows]
+            _offsets = np.zeros(rows.shape[0] + 1, dtype=np.int64)
+            np.cumsum(lengths, out=_offsets[1:])
+            idx = np.repeat(offsets[rows] - _offsets[:-1], lengths)
+            idx += np.arange(_offsets[-1], dtype=np.int64)
+            ret[column] = (_offsets, np.asarray(values)[idx])
+        return ret
+
+
+# ------------------------------------------------------------------------------
@@ -9,11 +9,13 @@ CallFlow's data structure to construct Super Graphs.
 import os
 import json
 import datetime
+import threading
+from collections import OrderedDict
 import hatchet as ht
+from hatchet.node import traversal_order
 import networkx as nx
 import numpy as np
 import pandas as pd
-from ast import literal_eval as make_list
 
 from callflow import get_logger
 from callflow.utils.sanitizer import Sanitizer
@@ -21,12 +23,17 @@ from callflow.utils.df import (
     df_unique,
     df_info,
     df_lookup_by_column,
-    df_bi_level_group,
+    df_group_slices,
+    df_map_dict,
     callsites_column_mean,
 )
 from .metrics import FILE_FORMATS, METRIC_PROXIES, TIME_COLUMNS
-from callflow.modules import Histogram
-from callflow.utils.utils import get_file_size
+from .path_table import PathTable
+from callflow.modules import Histogram, NodeStats
+from callflow.utils.utils import get_file_size, NumpyEncoder
+from callflow.utils import columnar
+from callflow.utils.ingest_cache import IngestCache
+from callflow.utils.hpctoolkit_reader import HPCToolkitStreamReader
 from callflow.operations import RegexModuleMatcher
 
 LOGGER = get_logger(__name__)
@@ -39,18 +46,33 @@ class SuperGraph(ht.GraphFrame):
     """
 
     _FILENAMES = {
-        "df": "df.pkl",
+        # these are columnar stores (see callflow.utils.columnar)
+        "df": "df",
+        "nxg": "nxg",
+        "maps": "maps",
+        "stats": "stats",
+        "paths": "paths",
+        "thresholds": "thresholds",
         "ht": "graph.json",
-        "nxg": "nxg.json",
         "env_params": "env_params.txt",
+        "sankey": "sankey.json",
         "aux": "aux-{}.npz",
-        "maps": "maps.json",
+        # these filenames are for the legacy (pickle and json) format
+        "df-legacy": "df.pkl",
+        "nxg-legacy": "nxg.json",
+        "maps-legacy": "maps.json",
         # these filenames are for storing a processed hatchet graph frame
         "ht-df": "ht-df.pkl",
         "ht-graph": "ht-graph.pkl",
         "ht-metrics": "ht-metrics.npz",
     }
 
+    # cali-query query to read the .cali files
+    _CALI_QUERY = (
+        "select function,sum(sum#time.duration), inclusive_sum(sum#time.duration) "
+        "group by function format json-split"
+    )
+
     # --------------------------------------------------------------------------
     def __init__(self, name):
         """
@@ -62,6 +84,7 @@ class SuperGraph(ht.GraphFrame):
         self.roots = []  # Roots of the call graph
         self.mean_root_inctime = 0.0  # Mean inc. metric of the root nodes
 
+        self._load_path = None  # set if the SuperGraph is loaded lazily
         self.dataframe = None
         self.nxg = None
         self.graph = None
@@ -76,9 +99,7 @@ class SuperGraph(ht.GraphFrame):
 
         self.parameters = {}
         self.proxy_columns = {}
-        self.callers = {}
-        self.callees = {}
-        self.paths = {}
+        self.paths = None  # paths, callers and callees of the callsites
 
         # meta information to manage the callsites and modules
         self.idx2callsite = {}  # callsite idx to callsite name
@@ -97,6 +118,15 @@ class SuperGraph(ht.GraphFrame):
         self.callsite_aux_dict = {}
         self.module_aux_dict = {}
 
+        # summary statistics of the nodes (computed at process time)
+        self.stats = None
+
+        # largest filter percentage retaining each callsite (see Filter)
+        self.filter_thresholds = None
+
+        # node-link data of the default Sankey layout (computed at process time)
+        self.sankey = None
+
     # --------------------------------------------------------------------------
     def __str__(self):
         """SuperGraph string representation"""
@@ -156,6 +186,10 @@ class SuperGraph(ht.GraphFrame):
     def _get_node_runtime(self, node, metric):
         assert node.get("type") == "callsite"
 
+        if self.stats is not None:
+            stats = self.get_node_stats(node.get("id"), "callsite", metric)
+            return 0.0 if stats is None else stats["rows_mean"]
+
         _df = self.df_lookup_with_column("name", node.get("id"))
         if _df.empty:
             return 0.0
@@ -176,6 +210,43 @@ class SuperGraph(ht.GraphFrame):
         elif node.get("type") == "module":
             return self._get_supernode_runtime(node, metric)
 
+    def get_callsite_runtimes(self, metric):
+        """
+        Getter to obtain the runtime of all the callsites at once (i.e., as
+        get_runtime for each callsite).
+
+        :param metric (str): metric (e.g., 'time' or 'time (inc)')
+        :return (dict): callsite index -> runtime
+        """
+        if self.stats is not None:
+            columns = self.stats.columns
+            mask = (
+                (columns["ntype"] == "callsite")
+                & (columns["metric"] == metric)
+                & (columns["dataset"] == self.name)
+            )
+            return dict(
+                zip(columns["nid"][mask].tolist(), columns["rows_mean"][mask].tolist())
+            )
+
+        return self.dataframe.groupby("name")[metric].mean().to_dict()
+
+    def get_node_stats(self, nid, ntype, metric, dataset=None):
+        """
+        Getter to obtain the precomputed summary statistics of a node.
+
+        :param nid (int): node index
+        :param ntype (str): node type (e.g., module, callsite)
+        :param metric (str): metric (e.g., 'time' or 'time (inc)')
+        :param dataset (str): dataset, default is the SuperGraph's name.
+        :return (dict): statistics, None if they are not available.
+        """
+        if self.stats is None:
+            return None
+        if dataset is None:
+            dataset = self.name
+        return self.stats.lookup(nid, ntype, metric, dataset)
+
     def get_name_by_nid(self, nid):
         """
         Getter to obtain node's name by nid.
@@ -222,13 +293,17 @@ class SuperGraph(ht.GraphFrame):
         nid = node.get("id")
         ntype = node.get("type")
 
-        if ntype == "callsite":
-            aux_dict = self.callsite_aux_dict
-        elif ntype == "module":
-            aux_dict = self.module_aux_dict
+        if self.stats is not None:
+            if self.get_node_stats(nid, ntype, self.time_columns[0]) is None:
+                return {}
+        else:
+            if ntype == "callsite":
+                aux_dict = self.callsite_aux_dict
+            elif ntype == "module":
+                aux_dict = self.module_aux_dict
 
-        if nid not in aux_dict.keys():
-            return {}
+            if nid not in aux_dict.keys():
+                return {}
 
         return Histogram(
             sg=self,
@@ -239,14 +314,42 @@ class SuperGraph(ht.GraphFrame):
             bins=nbins,
         ).unpack()
 
-    def get_entry_functions(self, node):
+    def get_module_callsites(self):
+        """
+        Getter to obtain the callsites of all the modules at once, in the
+        order of their first row (as get_component_path).
+
+        :return (dict): module index -> callsite indexes
+        """
+        df = self.dataframe[["module", "name"]].drop_duplicates()
+        return {k: v.to_numpy() for k, v in df.groupby("module", sort=False)["name"]}
+
+    def get_all_histograms(self, nodes, nbins):
+        """
+        Getter to obtain the rank histograms of several nodes at once (i.e.,
+        as get_histograms for each node).
+
+        :param nodes (list): nodes (e.g., {"id": 0, "type": "module"})
+        :param nbins (int): number of bins
+        :return (dict): (node type, node index) -> histograms
+        """
+        ret = {}
+        for ntype in ["callsite", "module"]:
+            nids = [_.get("id") for _ in nodes if _.get("type") == ntype]
+            if len(nids) == 0:
+                continue
+            hists = Histogram.batch(self, ntype, nids, bins=nbins)
+            ret.update({(ntype, k): v for k, v in hists.items()})
+        return ret
+
+    def get_entry_functions(self, node, callsites=None):
         # If the node type is callsite, we return an empty list.
         if node.get("type") == "callsite":
             return []
 
         assert node.get("type") == "module"
         ret = []
-        unique_cp = self.get_component_path(node)
+        unique_cp = self.get_component_path(node, callsites)
         entry_funcs = [list(_)[0] for _ in unique_cp if len(_) == 1]
 
         for cf_id in entry_funcs:
@@ -274,23 +377,32 @@ class SuperGraph(ht.GraphFrame):
     # try to figure a way to do it differently.
     # Additionally this function returns the component path expressed with
     # nid's. This would not be pleasant if one uses CallFlow's API.
-    def get_component_path(self, node):
+    # The callsites of a module can be passed if they are precomputed (see
+    # get_module_callsites).
+    def get_component_path(self, node, callsites=None):
         ntype = node.get("type")
         if ntype == "callsite":
-            lk_column = "name"
-            lk_name = node.get("id")
-        elif ntype == "module":
-            lk_column = "module"
-            lk_name = node.get("id")
-        cp = list(
-            df_lookup_by_column(self.dataframe, lk_column, lk_name)["component_path"]
-        )
-        unique_cp = list(set([tuple(line) for line in cp]))
+            callsites = [node.get("id")]
+        elif ntype == "module" and callsites is None:
+            callsites = df_unique(
+                df_lookup_by_column(self.dataframe, "module", node.get("id")), "name"
+            )
+        cp = self.paths.as_dict("component_path", callsites).values()
+        unique_cp = list(set([tuple(line.tolist()) for line in cp]))
 
         return unique_cp
 
     # --------------------------------------------------------------------------
-    def create(self, path, profile_format, m2c: dict = {}, m2m: dict = {}) -> None:
+    def create(
+        self,
+        path,
+        profile_format,
+        m2c: dict = {},
+        m2m: dict = {},
+        module_policy: str = "interactive",
+        module_cache: str = "",
+        ingest_cache: str = "",
+    ) -> None:
         """
         Create SuperGraph from basic information. It does the following:
             1. Using the config object, it constructs the Hatchet GraphFrame.
@@ -303,6 +415,11 @@ class SuperGraph(ht.GraphFrame):
         :param path: Path to data
         :param profile_format: Format of data
         :param module_callsite_map: Module callsite mapping
+        :param module_policy: Policy for the call sites with no or multiple
+        module matches (see RegexModuleMatcher)
+        :param module_cache: Cache file of the callsite-module assignments
+        :param ingest_cache: Directory of the cache of the GraphFrames read from
+        the profiles (disabled if empty)
         :return:
         """
         self.profile_format = profile_format
@@ -312,22 +429,21 @@ class SuperGraph(ht.GraphFrame):
         )
 
         # Create the hatchet.GraphFrame based on the profile format.
-        gf = SuperGraph.from_config(path, self.profile_format)
+        gf = SuperGraph.from_config(path, self.profile_format, ingest_cache)
         assert isinstance(gf, ht.GraphFrame)
         assert gf.graph is not None
         LOGGER.info(f"[{self.name}] Loaded Hatchet GraphFrame: {df_info(gf.dataframe)}")
         self.gf = gf
 
-        if 0:
-            SuperGraph.write_ht(gf, path)
-
         # Create a hatchet.GraphFrame using the calculated graph and graphframe.
         super().__init__(
             gf.graph, gf.dataframe, gf.exc_metrics, gf.inc_metrics
         )  # Initialize here so that we don't drop index levels.
 
         if bool(m2c) or bool(m2m):
-            reMatcher = RegexModuleMatcher(m2c=m2c, m2m=m2m)
+            reMatcher = RegexModuleMatcher(
+                m2c=m2c, m2m=m2m, policy=module_policy, cache_path=module_cache
+            )
             module_callsite_map = reMatcher.match(gf=gf)
 
             reMatcher.update_df(gf.dataframe, module_callsite_map, "module")
@@ -367,34 +483,29 @@ class SuperGraph(ht.GraphFrame):
         # runtime.
         # Note: contains all unfiltered roots as well.
         self.roots = SuperGraph.hatchet_get_roots(gf.graph)
-        self.nxg = self.hatchet_graph_to_nxg(self.graph)
+
+        # A single traversal of the graph gives the edges of the nxg, and the
+        # paths, callers and callees of the callsites.
+        nodes, names, edges = SuperGraph.hatchet_graph_traverse(self.graph)
+        self.nxg = nx.DiGraph()
+        self.nxg.add_edges_from(edges)
         LOGGER.debug(
             f"[{self.name}] Found {len(self.roots)} graph roots; and converted to nxg"
         )
 
-        _csidx = lambda _: self.get_idx(_, "callsite")  # noqa E731
-        for node in self.graph.traverse():
-            node_name = Sanitizer.from_htframe(node.frame)
-            cs_idx = _csidx(node_name)
-            self.paths[cs_idx] = [
-                _csidx(Sanitizer.from_htframe(_)) for _ in node.paths()[0]
-            ]
-            self.callers[cs_idx] = [
-                _csidx(Sanitizer.from_htframe(_.frame)) for _ in node.parents
-            ]
-            self.callees[cs_idx] = [
-                _csidx(Sanitizer.from_htframe(_.frame)) for _ in node.children
-            ]
+        idx = {k: self.get_idx(v, "callsite") for k, v in names.items()}
+        first_paths = {}
+        paths, callers, callees = {}, {}, {}
+        for node in nodes:
+            cs_idx = idx[id(node)]
+            paths[cs_idx] = SuperGraph._hatchet_first_path(node, idx, first_paths)
+            callers[cs_idx] = [idx[id(_)] for _ in node.parents]
+            callees[cs_idx] = [idx[id(_)] for _ in node.children]
 
         # ----------------------------------------------------------------------
-        self.df_add_column(
-            "callees", apply_dict=self.callees, dict_default=[], apply_on="name"
-        )
-        self.df_add_column(
-            "callers", apply_dict=self.callers, dict_default=[], apply_on="name"
-        )
-        self.df_add_column(
-            "path", apply_dict=self.paths, dict_default=[], apply_on="name"
+        # The paths are stored once per callsite (not per row of the dataframe).
+        self.paths = PathTable.from_dicts(
+            {"path": paths, "callers": callers, "callees": callees}
         )
 
         LOGGER.info(f"[{self.name}] Successfully created supergraph")
@@ -407,6 +518,7 @@ class SuperGraph(ht.GraphFrame):
         read_graph=False,
         read_parameter=False,
         read_maps=True,
+        lazy=False,
     ) -> None:
         """
         Load the SuperGraph class from reading .callflow data.
@@ -415,12 +527,25 @@ class SuperGraph(ht.GraphFrame):
         :param read_graph: (bool) Read the graph, default is False.
         :param read_parameter: (bool) Read parameters, default is False.
         :param read_aux: (bool) Read auxiliary data, default is True.
+        :param lazy: (bool) Defer reading the dataframe (memory-mapped) and
+        computing the auxiliary dictionaries until they are accessed.
         :return:
         """
         LOGGER.info(f"[{self.name}] Reading SuperGraph from ({path})")
 
-        if True:
+        if lazy:
+            self._load_path = path
+            self.dataframe = None
+            columns = columnar.read_columns(
+                os.path.join(path, SuperGraph._FILENAMES["df"])
+            )
+            unique_callsites = SuperGraph.read_df(path, columns=["name"], mmap=True)
+        else:
             self.dataframe = SuperGraph.read_df(path)
+            columns = self.dataframe.columns
+            unique_callsites = self.dataframe
+
+        unique_callsites = set(df_unique(unique_callsites, "name").tolist())
 
         if True:
             self.nxg = SuperGraph.read_nxg(path)
@@ -431,6 +556,8 @@ class SuperGraph(ht.GraphFrame):
         if read_parameter:
             self.parameters = SuperGraph.read_env_params(path)
 
+        self.paths = SuperGraph.read_paths(path)
+
         if read_maps:
             maps = SuperGraph.read_module_callsite_maps(path)
             self.module2idx = maps["m2idx"]
@@ -444,7 +571,6 @@ class SuperGraph(ht.GraphFrame):
         self.idx2module = {v: k for k, v in self.module2idx.items()}
         self.idx2callsite = {v: k for k, v in self.callsite2idx.items()}
 
-        unique_callsites = self.df_unique("name").tolist()
         self.callsite2module = {_: -1 for _ in unique_callsites}
         for mcode, mname in enumerate(self.module2callsite.keys()):
             clist = self.module2callsite[mname]
@@ -453,48 +579,184 @@ class SuperGraph(ht.GraphFrame):
                     self.callsite2module[c] = mname
 
         # ----------------------------------------------------------------------
-        self.add_time_proxies()
+        self.add_time_proxies(columns)
         self.time_columns = [self.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
 
-        # ----------------------------------------------------------------------
-        LOGGER.debug(
-            f"[{self.name}] Calculating callsite and module auxiliary dictionaries"
-        )
+        self.stats = SuperGraph.read_stats(path)
+        self.filter_thresholds = SuperGraph.read_thresholds(path)
+        self.sankey = SuperGraph.read_sankey(path)
 
         self.roots = self.nxg_get_roots()
 
-        self.callsite_aux_dict = df_bi_level_group(
-            self.dataframe,
-            group_attrs=["name"],
-            cols=self.time_columns,
-            group_by=["rank"],
-            apply_func=lambda _: _.mean(),
+        if lazy:
+            self._release()
+        else:
+            self._load_aux_dicts()
+
+        LOGGER.info(f"[{self.name}] Successfully loaded supergraph")
+
+    def _load_aux_dicts(self):
+        """
+        Calculate the callsite and module auxiliary dictionaries.
+        """
+        LOGGER.debug(
+            f"[{self.name}] Calculating callsite and module auxiliary dictionaries"
+        )
+        self._callsite_aux_dict = df_group_slices(
+            self.dataframe, "name", cols=self.time_columns, group_by=["rank"]
         )
-        self.module_aux_dict = df_bi_level_group(
-            self.dataframe,
-            group_attrs=["module", "name"],
-            cols=self.time_columns,
-            group_by=["rank"],
-            apply_func=lambda _: _.mean(),
+        self._module_aux_dict = df_group_slices(
+            self.dataframe, "module", cols=self.time_columns, group_by=["rank"]
         )
 
         if self.name == "ensemble" and "dataset" in self.dataframe.columns:
-            self.rel_callsite_aux_dict = df_bi_level_group(
+            self.rel_callsite_aux_dict = df_group_slices(
                 self.dataframe,
-                group_attrs=["name"],
+                "name",
                 cols=self.time_columns,
                 group_by=["dataset", "rank"],
-                apply_func=lambda _: _.mean(),
             )
-            self.rel_module_aux_dict = df_bi_level_group(
+            self.rel_module_aux_dict = df_group_slices(
                 self.dataframe,
-                group_attrs=["module", "name"],
+                "module",
                 cols=self.time_columns,
                 group_by=["dataset", "rank"],
-                apply_func=lambda _: _.mean(),
             )
 
-        LOGGER.info(f"[{self.name}] Successfully loaded supergraph")
+    # --------------------------------------------------------------------------
+    # Lazy loading
+    # A SuperGraph loaded with lazy=True memory-maps its dataframe and computes
+    # the auxiliary dictionaries on the first access. The loaded SuperGraphs are
+    # kept in an LRU, which releases the cold ones when the budget (number of
+    # SuperGraphs or bytes) set by SuperGraph.set_load_budget is exceeded.
+    # --------------------------------------------------------------------------
+    _LOADED = OrderedDict()  # id(sg) -> (sg, nbytes)
+    _LOADED_LOCK = threading.RLock()
+    _LOAD_BUDGET = {"runs": 0, "bytes": 0}
+
+    @staticmethod
+    def set_load_budget(runs=0, nbytes=0):
+        """
+        Set the budget of lazily loaded SuperGraphs kept in memory.
+
+        :param runs: (int) maximum number of SuperGraphs (0 is unbounded)
+        :param nbytes: (int) maximum size of the dataframes (0 is unbounded)
+        """
+        assert runs >= 0 and nbytes >= 0
+        with SuperGraph._LOADED_LOCK:
+            SuperGraph._LOAD_BUDGET = {"runs": int(runs), "bytes": int(nbytes)}
+            SuperGraph._evict()
+
+    @staticmethod
+    def _evict(keep=None):
+        """
+        Release the least recently used SuperGraphs until the budget is met.
+
+        :param keep: (int) id of a SuperGraph that should not be released
+        """
+        max_runs = SuperGraph._LOAD_BUDGET["runs"]
+        max_bytes = SuperGraph._LOAD_BUDGET["bytes"]
+
+        _over = lambda: (max_runs > 0 and len(SuperGraph._LOADED) > max_runs) or (
+            max_bytes > 0
+            and sum(_[1] for _ in SuperGraph._LOADED.values()) > max_bytes
+        )
+        for key in list(SuperGraph._LOADED.keys()):
+            if not _over():
+                break
+            if key == keep:
+                continue
+            sg, _ = SuperGraph._LOADED.pop(key)
+            LOGGER.debug(f"[{sg.name}] Releasing the lazily loaded dataframe")
+            sg._release()
+
+    def _release(self):
+        self._dataframe = None
+        self._callsite_aux_dict = None
+        self._module_aux_dict = None
+        for _ in ["rel_callsite_aux_dict", "rel_module_aux_dict"]:
+            self.__dict__.pop(_, None)
+
+    def unload(self):
+        """
+        Release the dataframe (and the auxiliary dictionaries) of a lazily
+        loaded SuperGraph, e.g., one loaded for a single use. They are read
+        again on the next access.
+        """
+        with SuperGraph._LOADED_LOCK:
+            SuperGraph._LOADED.pop(id(self), None)
+            self._release()
+
+    def _touch(self, attr):
+        """
+        Load the dataframe (and the auxiliary dictionaries) of a lazily loaded
+        SuperGraph, and mark it as most recently used.
+
+        :param attr: (str) attribute to return (_dataframe, _callsite_aux_dict
+        or _module_aux_dict); it is read under the lock, as another thread may
+        release this SuperGraph right after.
+        :return: value of attr
+        """
+        with SuperGraph._LOADED_LOCK:
+            key = id(self)
+            is_loaded = self._dataframe is not None
+            has_aux = attr == "_dataframe" or self._callsite_aux_dict is not None
+            if is_loaded and has_aux and key in SuperGraph._LOADED:
+                SuperGraph._LOADED.move_to_end(key)
+                return getattr(self, attr)
+
+            if not is_loaded:
+                LOGGER.debug(f"[{self.name}] Loading the dataframe (memory-mapped)")
+                self._dataframe = SuperGraph.read_df(self._load_path, mmap=True)
+
+            if not has_aux:
+                self._load_aux_dicts()
+
+            nbytes = int(self._dataframe.memory_usage(index=True).sum())
+            SuperGraph._LOADED[key] = (self, nbytes)
+            SuperGraph._LOADED.move_to_end(key)
+            SuperGraph._evict(keep=key)
+            return getattr(self, attr)
+
+    @property
+    def dataframe(self):
+        if self._load_path is not None:
+            return self._touch("_dataframe")
+        return self._dataframe
+
+    @dataframe.setter
+    def dataframe(self, df):
+        self._dataframe = df
+
+    @property
+    def callsite_aux_dict(self):
+        if self._load_path is not None:
+            return self._touch("_callsite_aux_dict")
+        return self._callsite_aux_dict
+
+    @callsite_aux_dict.setter
+    def callsite_aux_dict(self, aux_dict):
+        self._callsite_aux_dict = aux_dict
+
+    @property
+    def module_aux_dict(self):
+        if self._load_path is not None:
+            return self._touch("_module_aux_dict")
+        return self._module_aux_dict
+
+    @module_aux_dict.setter
+    def module_aux_dict(self, aux_dict):
+        self._module_aux_dict = aux_dict
+
+    def __getstate__(self):
+        # a lazily loaded SuperGraph is pickled without its dataframe.
+        state = self.__dict__.copy()
+        if self._load_path is not None:
+            for _ in ["_dataframe", "_callsite_aux_dict", "_module_aux_dict"]:
+                state[_] = None
+            for _ in ["rel_callsite_aux_dict", "rel_module_aux_dict"]:
+                state.pop(_, None)
+        return state
 
     def callsite2module_from_indexmaps(self, callsite2idx, module2idx):
 
@@ -702,20 +964,25 @@ class SuperGraph(ht.GraphFrame):
         self.modules_idx = self.dataframe["module"].unique().tolist()
 
     # --------------------------------------------------------------------------
-    def add_time_proxies(self):
+    def add_time_proxies(self, columns=None):
         """
         Add time proxies for the metric columns from the metrics.py file.
         Assigns the self.proxy_columns.
 
         TODO: we should use ht.gf.exc_metric and ht.gf.inc_metric for this
 
+        :param columns: (list) columns of the dataframe, default reads them
+        from self.dataframe.
         :return: None
         """
+        if columns is None:
+            columns = self.dataframe.columns
+
         for key, proxies in METRIC_PROXIES.items():
-            if key in self.dataframe.columns:
+            if key in columns:
                 continue
             for _ in proxies:
-                if _ in self.dataframe.columns:
+                if _ in columns:
                     self.proxy_columns[key] = _
                     break
             assert key in self.proxy_columns.keys()
@@ -725,7 +992,16 @@ class SuperGraph(ht.GraphFrame):
 
     # --------------------------------------------------------------------------
     def write(
-        self, path, write_df=True, write_graph=False, write_nxg=True, write_maps=True
+        self,
+        path,
+        write_df=True,
+        write_graph=False,
+        write_nxg=True,
+        write_maps=True,
+        write_stats=True,
+        write_paths=True,
+        write_thresholds=True,
+        write_sankey=True,
     ):
         """
         Write the SuperGraph (refer _FILENAMES for file name mapping).
@@ -735,6 +1011,12 @@ class SuperGraph(ht.GraphFrame):
         :param write_graph: (bool) write hatchet graph
         :param write_nxg: (bool) write networkX graph
         :param write_maps: (bool) write callsite-module maps
+        :param write_stats: (bool) write node statistics (if computed)
+        :param write_paths: (bool) write the path table
+        :param write_thresholds: (bool) write the filter thresholds (if
+        computed)
+        :param write_sankey: (bool) write the default Sankey layout (a stale
+        layout is removed, if not computed)
         :return:
         """
         if not write_df and not write_nxg and not write_maps:
@@ -760,6 +1042,18 @@ class SuperGraph(ht.GraphFrame):
                 },
             )
 
+        if write_stats and self.stats is not None:
+            SuperGraph.write_stats(path, self.stats)
+
+        if write_paths and self.paths is not None:
+            SuperGraph.write_paths(path, self.paths)
+
+        if write_thresholds and self.filter_thresholds is not None:
+            SuperGraph.write_thresholds(path, self.filter_thresholds)
+
+        if write_sankey:
+            SuperGraph.write_sankey(path, self.sankey)
+
     # --------------------------------------------------------------------------
     # SuperGraph API functions
     # These functions are used by the endpoints.
@@ -903,8 +1197,8 @@ class SuperGraph(ht.GraphFrame):
             LOGGER.debug(
                 f'[{self.name}] {action} column "{column_name}" = (dict); default=({dict_default})'
             )
-            self.dataframe[column_name] = self.dataframe[apply_on].apply(
-                lambda _: apply_dict.get(_, dict_default)
+            self.dataframe[column_name] = df_map_dict(
+                self.dataframe, apply_on, apply_dict, dict_default
             )
 
     def df_unique(self, column):
@@ -954,6 +1248,35 @@ class SuperGraph(ht.GraphFrame):
         df = self.dataframe.loc[self.dataframe[column] > value]
         return df[df["name"].isin(df["name"].unique())]
 
+    def df_callsite_max_node_mean(self, column):
+        """
+        Maximum over the nodes of each call site of their mean runtime (over
+        the ranks). A call site is matched by the hatchet query
+        [("*", {column: "> value"})] if this maximum is greater than value.
+        The means are computed once per node, instead of matching the query
+        on the graph.
+
+        :param column: (str) Column name
+        :return: (pd.Series) callsite index -> maximum, in the order of the
+        dataframe
+        """
+        column = self.df_get_proxy(column)
+        df = self.dataframe
+        if "node" in df.columns:
+            nodes = df["node"]
+        else:
+            nodes = df.index.get_level_values("node")
+
+        # group the rows by the identity of the hatchet nodes, which avoids
+        # hashing the nodes.
+        codes, _ = pd.factorize(
+            np.fromiter(map(id, nodes), dtype=np.int64, count=len(df))
+        )
+        mean = df[column].groupby(codes).mean().to_numpy()
+        _, first = np.unique(codes, return_index=True)
+        names = df["name"].to_numpy()[first]
+        return pd.Series(mean).groupby(names, sort=False).max()
+
     def df_filter_by_name(self, values):
         """
         Wrapper to filter a dataframe by a list of names on the "name" column.
@@ -1102,33 +1425,76 @@ class SuperGraph(ht.GraphFrame):
         :param ht_graph: (hatchet.Graph) Hatchet Graph
         :return: (NetworkX.nxg) NetworkX graph
         """
-        assert isinstance(ht_graph, ht.graph.Graph)
+        _, _, edges = SuperGraph.hatchet_graph_traverse(ht_graph)
 
         nxg = nx.DiGraph()
-        for root in ht_graph.roots:
-            node_gen = root.traverse()
-            node = root
+        nxg.add_edges_from(edges)
+        return nxg
 
-            try:
-                while node:
+    @staticmethod
+    def hatchet_graph_traverse(ht_graph):
+        """
+        Depth-first (preorder) traversal of a hatchet graph, in the order of
+        hatchet.Graph.traverse, without recursion. Each frame is sanitized
+        once, so the traversal is linear in the nodes and edges of the graph
+        (unlike hatchet.Node.paths, which enumerates all the paths).
 
-                    # Get all node paths from hatchet.
-                    node_paths = node.paths()
+        :param ht_graph: (hatchet.Graph) Hatchet Graph
+        :return: (list, dict, list) nodes in traversal order; id(node) ->
+        sanitized name; and edges (source name, target name), i.e., from each
+        parent of the nodes in traversal order.
+        """
+        assert isinstance(ht_graph, ht.graph.Graph)
 
-                    # Loop through all the node paths.
-                    for node_path in node_paths:
-                        if len(node_path) >= 2:
-                            src_name = Sanitizer.from_htframe(node_path[-2])
-                            trg_name = Sanitizer.from_htframe(node_path[-1])
-                            nxg.add_edge(src_name, trg_name)
-                    node = next(node_gen)
+        names = {}
 
-            except StopIteration:
-                pass
-            finally:
-                del root
+        def _name(node):
+            key = id(node)
+            if key not in names:
+                names[key] = Sanitizer.from_htframe(node.frame)
+            return names[key]
 
-        return nxg
+        nodes, edges, visited = [], [], set()
+        stack = [iter(sorted(ht_graph.roots, key=traversal_order))]
+        while len(stack) > 0:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                continue
+            if id(node) in visited:
+                continue
+
+            visited.add(id(node))
+            nodes.append(node)
+            edges.extend((_name(_), _name(node)) for _ in node.parents)
+            stack.append(iter(sorted(node.children, key=traversal_order)))
+
+        return nodes, names, edges
+
+    @staticmethod
+    def _hatchet_first_path(node, idx, first_paths):
+        """
+        Callsite indexes along the first path from a root to a node (i.e.,
+        node.paths()[0]), extended from the first path of its first parent.
+
+        :param node: (hatchet.Node) node
+        :param idx: (dict) id(node) -> callsite index
+        :param first_paths: (dict) id(node) -> first path (memoized)
+        :return: (list) callsite indexes
+        """
+        chain = []
+        while id(node) not in first_paths and len(node.parents) > 0:
+            chain.append(node)
+            node = node.parents[0]
+
+        if id(node) not in first_paths:
+            first_paths[id(node)] = [idx[id(node)]]
+
+        path = first_paths[id(node)]
+        for _ in reversed(chain):
+            path = path + [idx[id(_)]]
+            first_paths[id(_)] = path
+        return path
 
     @staticmethod
     def hatchet_get_roots(ht_graph):
@@ -1192,12 +1558,15 @@ class SuperGraph(ht.GraphFrame):
     # Create GraphFrame methods
     # --------------------------------------------------------------------------
     @staticmethod
-    def from_config(data_path, profile_format):
+    def from_config(data_path, profile_format, ingest_cache=""):
         """
         Create a GraphFrame directly from the data_path and profile_format.
 
         :param data_path: path to data
         :param profile_format: Profile format
+        :param ingest_cache: directory of the ingestion cache, i.e., the
+        GraphFrames of the unchanged profiles are not read again (disabled if
+        empty)
         :return gf: GraphFrame
         """
         if profile_format not in FILE_FORMATS:
@@ -1207,17 +1576,69 @@ class SuperGraph(ht.GraphFrame):
         if gf is not None:
             return gf
 
+        if len(ingest_cache) == 0 or not IngestCache.is_cacheable(
+            data_path, profile_format
+        ):
+            return SuperGraph._read_profile(data_path, profile_format)
+
+        cache = IngestCache(ingest_cache)
+        key = IngestCache.key(data_path, profile_format)
+        gf = cache.get(key)
+        if gf is not None:
+            LOGGER.info(f"Read the GraphFrame of ({data_path}) from the ingest cache")
+            return gf
+
+        # a .cali file is read from its json-split file (converted by
+        # SuperGraph.convert_caliper, or here).
+        fjson = None
+        if profile_format == "caliper":
+            fjson = cache.convert_caliper(
+                {data_path: key}, SuperGraph._CALI_QUERY, nworkers=1
+            ).get(data_path)
+
+        if fjson is not None:
+            gf = ht.GraphFrame.from_caliper(fjson)
+        else:
+            gf = SuperGraph._read_profile(data_path, profile_format)
+
+        try:
+            cache.put(key, gf, data_path, profile_format)
+        except Exception as e:
+            LOGGER.warning(f"Failed to cache the GraphFrame of ({data_path}): {e}")
+        return gf
+
+    @staticmethod
+    def convert_caliper(paths, ingest_cache, nworkers=0):
+        """
+        Convert .cali files to the json-split format in parallel (with a pool
+        of cali-query processes), so that SuperGraph.from_config reads them
+        from the ingestion cache.
+
+        :param paths: (list) .cali files
+        :param ingest_cache: directory of the ingestion cache
+        :param nworkers: number of cali-query processes (0 uses all cores)
+        :return: (dict) .cali file -> json-split file
+        """
+        paths = [_ for _ in paths if IngestCache.is_cacheable(_, "caliper")]
+        if len(paths) == 0:
+            return {}
+
+        cache = IngestCache(ingest_cache)
+        keys = {_: IngestCache.key(_, "caliper") for _ in paths}
+        return cache.convert_caliper(keys, SuperGraph._CALI_QUERY, nworkers)
+
+    @staticmethod
+    def _read_profile(data_path, profile_format):
+        """
+        Read a GraphFrame from a profile using hatchet.
+        """
         if profile_format == "hpctoolkit":
-            gf = ht.GraphFrame.from_hpctoolkit(data_path)
+            # same GraphFrame as ht.GraphFrame.from_hpctoolkit, streaming the
+            # metric-db files (i.e., for large rank counts).
+            gf = HPCToolkitStreamReader(data_path).read()
 
         elif profile_format == "caliper":
-            grouping_attribute = "function"
-            default_metric = "sum(sum#time.duration), inclusive_sum(sum#time.duration)"
-            query = "select function,%s group by %s format json-split" % (
-                default_metric,
-                grouping_attribute,
-            )
-            gf = ht.GraphFrame.from_caliper(data_path, query=query)
+            gf = ht.GraphFrame.from_caliper(data_path, query=SuperGraph._CALI_QUERY)
 
         elif profile_format == "caliper_json":
             gf = ht.GraphFrame.from_caliper(data_path)
@@ -1284,33 +1705,41 @@ class SuperGraph(ht.GraphFrame):
     @staticmethod
     def write_df(path, df):
         """
+        Write the dataframe as a columnar store.
 
-        :param path:
-        :param df:
+        :param path: path to the .callflow directory of the SuperGraph
+        :param df: dataframe
         :return:
         """
         fname = os.path.join(path, SuperGraph._FILENAMES["df"])
         LOGGER.debug(f"Writing ({fname})")
-
-        ext = os.path.splitext(SuperGraph._FILENAMES["df"])[-1]
-        if ".csv" == ext:
-            df.to_csv(fname)
-        elif ".pkl" == ext:
-            df.to_pickle(fname)
+        columnar.write_df(fname, df)
 
     @staticmethod
     def write_nxg(path, nxg):
         """
+        Write the networkX graph as a columnar store of nodes and an edge array.
 
-        :param path:
-        :param nxg:
+        :param path: path to the .callflow directory of the SuperGraph
+        :param nxg: networkX graph
         :return:
         """
         fname = os.path.join(path, SuperGraph._FILENAMES["nxg"])
         LOGGER.debug(f"Writing ({fname})")
-        nxg_json = nx.readwrite.json_graph.node_link_data(nxg)
-        with open(fname, "w") as fptr:
-            json.dump(nxg_json, fptr, indent=2)
+
+        nodes = list(nxg.nodes())
+        node2pos = {n: i for i, n in enumerate(nodes)}
+        edges = np.array(
+            [(node2pos[u], node2pos[v]) for u, v in nxg.edges()], dtype=np.int64
+        ).reshape(-1, 2)
+
+        is_int = all(isinstance(_, (int, np.integer)) for _ in nodes)
+        nodes = np.array(nodes, dtype=np.int64 if is_int else str)
+        columnar.write_arrays(
+            fname,
+            {"nodes": nodes, "edges": edges},
+            meta={"directed": nxg.is_directed()},
+        )
 
     @staticmethod
     def write_graph(path, graph_str):
@@ -1329,32 +1758,109 @@ class SuperGraph(ht.GraphFrame):
     def write_module_callsite_maps(path, data):
         """
         Write the callsite-idx, module-idx, callsite-module mappings into a
-        pickle file.
+        columnar store.
 
         :param path: Path to where the maps should be written.
+        :param data: (dict) {"c2idx": dict, "m2idx": dict, "m2c": dict}
         """
         fname = os.path.join(path, SuperGraph._FILENAMES["maps"])
         LOGGER.debug(f"Writing ({fname})")
-        with open(fname, "w") as handle:
-            json.dump(data, handle)
+
+        arrays = {}
+        for key in ["c2idx", "m2idx"]:
+            names = list(data[key].keys())
+            arrays[f"{key}/names"] = np.array(
+                ["" if _ is None else _ for _ in names], dtype=str
+            )
+            arrays[f"{key}/is_none"] = np.array([_ is None for _ in names], dtype=bool)
+            arrays[f"{key}/idx"] = np.array(list(data[key].values()), dtype=np.int64)
+
+        m2c = data["m2c"]
+        arrays["m2c/keys"] = np.array([int(_) for _ in m2c.keys()], dtype=np.int64)
+        arrays["m2c/offsets"], arrays["m2c/values"] = columnar.pack_lists(
+            list(m2c.values())
+        )
+        columnar.write_arrays(fname, arrays)
 
     @staticmethod
-    def read_df(path):
+    def write_stats(path, stats):
         """
+        Write the node statistics table as a columnar store.
 
-        :param path:
+        :param path: path to the .callflow directory of the SuperGraph
+        :param stats: (NodeStats) node statistics
+        :return:
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["stats"])
+        LOGGER.debug(f"Writing ({fname})")
+        columnar.write_df(fname, stats.table)
+
+    @staticmethod
+    def write_paths(path, paths):
+        """
+        Write the path table as a columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :param paths: (PathTable) path table
+        :return:
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["paths"])
+        LOGGER.debug(f"Writing ({fname})")
+        columnar.write_arrays(fname, paths.to_arrays())
+
+    @staticmethod
+    def write_thresholds(path, thresholds):
+        """
+        Write the filter thresholds as a columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :param thresholds: (pd.DataFrame) filter thresholds
+        :return:
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["thresholds"])
+        LOGGER.debug(f"Writing ({fname})")
+        columnar.write_df(fname, thresholds)
+
+    @staticmethod
+    def write_sankey(path, data):
+        """
+        Write the node-link data of the default Sankey layout as json.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :param data: (dict) node-link data, None removes the written layout
         :return:
         """
+        fname = os.path.join(path, SuperGraph._FILENAMES["sankey"])
+        if data is None:
+            if os.path.isfile(fname):
+                LOGGER.debug(f"Removing ({fname})")
+                os.remove(fname)
+            return
+
+        LOGGER.debug(f"Writing ({fname})")
+        with open(fname, "w") as fptr:
+            json.dump(data, fptr, cls=NumpyEncoder)
+
+    @staticmethod
+    def read_df(path, columns=None, mmap=False):
+        """
+        Read the dataframe from the columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :param columns: (list) columns to read, default reads all (except the
+        list columns of the dataframes processed before the path table).
+        :param mmap: (bool) memory-map the numeric columns
+        :return: dataframe
+        """
         fname = os.path.join(path, SuperGraph._FILENAMES["df"])
-        LOGGER.debug(f"Reading ({fname}) [{get_file_size(fname)}]")
+        LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
 
-        df = None
-        ext = os.path.splitext(SuperGraph._FILENAMES["df"])[-1]
-        if ".csv" == ext:
-            df = pd.read_csv(fname)
-        elif ".pkl" == ext:
-            df = pd.read_pickle(fname)
+        if columns is None:
+            columns = [
+                _ for _ in columnar.read_columns(fname) if _ not in PathTable.COLUMNS
+            ]
 
+        df = columnar.read_df(fname, columns=columns, mmap=mmap)
         if df is None or df.empty:
             raise ValueError(f"Did not find a valid dataframe in ({fname}).")
         return df
@@ -1362,19 +1868,92 @@ class SuperGraph(ht.GraphFrame):
     @staticmethod
     def read_nxg(path):
         """
+        Read the networkX graph from the columnar store.
 
-        :param path:
-        :return:
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: networkX graph
         """
         fname = os.path.join(path, SuperGraph._FILENAMES["nxg"])
-        LOGGER.debug(f"Reading ({fname}) [{get_file_size(fname)}]")
-        with open(fname, "r") as nxg_file:
-            graph = json.load(nxg_file)
-            nxg = nx.readwrite.json_graph.node_link_graph(graph)
-        if nxg is None:
-            raise ValueError(f"Did not find a valid nxg in ({fname}).")
+        LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
+
+        arrays, meta = columnar.read_arrays(fname)
+        nodes, edges = arrays["nodes"], arrays["edges"]
+
+        nxg = nx.DiGraph() if meta.get("directed", True) else nx.Graph()
+        nxg.add_nodes_from(nodes.tolist())
+        nxg.add_edges_from(nodes[edges].tolist())
         return nxg
 
+    @staticmethod
+    def read_stats(path):
+        """
+        Read the node statistics table from the columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (NodeStats) node statistics, None if they were not computed.
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["stats"])
+        if not columnar.columnar_exists(fname):
+            return None
+
+        LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
+        return NodeStats(columnar.read_df(fname))
+
+    @staticmethod
+    def read_paths(path):
+        """
+        Read the path table from the columnar store. The dataframes processed
+        before the path table store the paths as list columns, from which the
+        path table is computed.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (PathTable) path table
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["paths"])
+        if columnar.columnar_exists(fname):
+            LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
+            arrays, _ = columnar.read_arrays(fname)
+            return PathTable.from_arrays(arrays)
+
+        fname = os.path.join(path, SuperGraph._FILENAMES["df"])
+        columns = [_ for _ in columnar.read_columns(fname) if _ in PathTable.COLUMNS]
+        LOGGER.debug(f"Reading the path columns {columns} of ({fname})")
+        return PathTable.from_dataframe(
+            columnar.read_df(fname, columns=["name"] + columns)
+        )
+
+    @staticmethod
+    def read_thresholds(path):
+        """
+        Read the filter thresholds from the columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (pd.DataFrame) filter thresholds, None if they were not
+        computed.
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["thresholds"])
+        if not columnar.columnar_exists(fname):
+            return None
+
+        LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
+        return columnar.read_df(fname)
+
+    @staticmethod
+    def read_sankey(path):
+        """
+        Read the node-link data of the default Sankey layout.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (dict) node-link data, None if it was not computed.
+        """
+        fname = os.path.join(path, SuperGraph._FILENAMES["sankey"])
+        if not os.path.isfile(fname):
+            return None
+
+        LOGGER.debug(f"Reading ({fname}) [{get_file_size(fname)}]")
+        with open(fname, "r") as fptr:
+            return json.load(fptr)
+
     @staticmethod
     def read_graph(path):
         """
@@ -1411,16 +1990,167 @@ class SuperGraph(ht.GraphFrame):
 
     @staticmethod
     def read_module_callsite_maps(path):
+        """
+        Read the callsite-idx, module-idx, callsite-module mappings from the
+        columnar store.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (dict) {"c2idx": dict, "m2idx": dict, "m2c": dict}
+        """
         fname = os.path.join(path, SuperGraph._FILENAMES["maps"])
-        LOGGER.debug(f"Reading ({fname}) [{get_file_size(fname)}]")
-        with open(fname, "r") as f:
-            data = json.load(f)
+        LOGGER.debug(f"Reading ({fname}) [{columnar.store_size(fname)}]")
+        arrays, _ = columnar.read_arrays(fname)
 
+        data = {}
+        for key in ["c2idx", "m2idx"]:
+            names = arrays[f"{key}/names"].astype(object)
+            names[arrays[f"{key}/is_none"]] = None
+            data[key] = dict(zip(names.tolist(), arrays[f"{key}/idx"].tolist()))
+
+        m2c = columnar.unpack_lists(arrays["m2c/offsets"], arrays["m2c/values"])
+        data["m2c"] = {
+            k: v.tolist() for k, v in zip(arrays["m2c/keys"].tolist(), m2c)
+        }
         return data
 
+    # --------------------------------------------------------------------------
+    # legacy format (df.pkl, nxg.json, maps.json)
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def has_store(path, f_types=["df", "nxg", "maps"]):
+        """
+        Check if the columnar stores exist for a SuperGraph.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :param f_types: (list) keys of _FILENAMES to check
+        :return: (bool)
+        """
+        return all(
+            columnar.columnar_exists(os.path.join(path, SuperGraph._FILENAMES[_]))
+            for _ in f_types
+        )
+
+    @staticmethod
+    def has_legacy_store(path):
+        """
+        Check if the legacy (pickle and json) files exist for a SuperGraph.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (bool)
+        """
+        return all(
+            os.path.isfile(os.path.join(path, SuperGraph._FILENAMES[f"{_}-legacy"]))
+            for _ in ["df", "nxg", "maps"]
+        )
+
+    @staticmethod
+    def convert_legacy_store(path):
+        """
+        One-shot conversion of the legacy files (df.pkl, nxg.json, maps.json)
+        into the columnar stores. The legacy files are left untouched.
+
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (bool) True if the directory was converted.
+        """
+        if SuperGraph.has_store(path) or not SuperGraph.has_legacy_store(path):
+            return False
+
+        LOGGER.info(f"Converting ({path}) to the columnar format")
+        _fname = lambda _: os.path.join(path, SuperGraph._FILENAMES[f"{_}-legacy"])
+
+        df = pd.read_pickle(_fname("df"))
+        SuperGraph.write_paths(path, PathTable.from_dataframe(df))
+        SuperGraph.write_df(
+            path, df.drop(columns=[_ for _ in PathTable.COLUMNS if _ in df.columns])
+        )
+
+        with open(_fname("nxg"), "r") as fptr:
+            nxg = nx.readwrite.json_graph.node_link_graph(json.load(fptr))
+        SuperGraph.write_nxg(path, nxg)
+
+        # json stores the None keys as "null" and the integer keys as strings.
+        with open(_fname("maps"), "r") as fptr:
+            maps = json.load(fptr)
+        _key = lambda _: None if _ == "null" else _
+        SuperGraph.write_module_callsite_maps(
+            path,
+            {
+                "c2idx": {_key(k): v for k, v in maps["c2idx"].items()},
+                "m2idx": {_key(k): v for k, v in maps["m2idx"].items()},
+                "m2c": {int(k): v for k, v in maps["m2c"].items()},
+            },
+        )
+        return True
+
     # --------------------------------------------------------------------------
     # Supergraph.nxg methods
     # --------------------------------------------------------------------------
+    def nxg_filter(self, callsites, filter_by):
+        """
+        NetworkX graph of the call sites retained by a filter. For "time
+        (inc)", the graph has the edges of nxg between the retained call
+        sites, and for "time", it is the union of their paths.
+
+        The retained call sites are a boolean mask over the callsite indexes,
+        and the edges are selected from arrays, without a lookup per edge.
+
+        :param callsites: (array-like) indexes of the retained call sites
+        :param filter_by: (str) "time" or "time (inc)"
+        :return: (nx.DiGraph) filtered graph
+        """
+        callsites = np.asarray(callsites, dtype=np.int64)
+        nxg = nx.DiGraph()
+
+        if filter_by == "time (inc)":
+            # the last entry of the mask is for the index -1.
+            keep = np.zeros(max(self.idx2callsite, default=-1) + 2, dtype=bool)
+            keep[callsites] = True
+
+            edges = list(self.nxg.edges())
+            idx = np.fromiter(
+                (self.callsite2idx[_] for edge in edges for _ in edge),
+                dtype=np.int64,
+                count=2 * len(edges),
+            ).reshape(-1, 2)
+            mask = keep[idx[:, 0]] & keep[idx[:, 1]]
+            nxg.add_edges_from(edges[_] for _ in np.flatnonzero(mask))
+
+        elif filter_by == "time":
+            offsets, path = self.paths.take("path", callsites)
+            names = np.empty(path.shape[0], dtype=object)
+            names[:] = [self.get_name(_, "callsite") for _ in path.tolist()]
+
+            # same as nx.add_path for each path: the nodes in the order of
+            # their first occurrence, and the consecutive pairs of each path.
+            _, first = np.unique(path, return_index=True)
+            nxg.add_nodes_from(names[np.sort(first)])
+
+            is_pair = np.ones(max(path.shape[0] - 1, 0), dtype=bool)
+            starts = offsets[1:-1]
+            is_pair[starts[(starts > 0) & (starts < path.shape[0])] - 1] = False
+            pairs = np.flatnonzero(is_pair)
+            nxg.add_edges_from(zip(names[pairs], names[pairs + 1]))
+
+        return nxg
+
+    def filter_callsites(self, filter_by, filter_perc):
+        """
+        Call sites retained by Filter at a filter percentage, from the
+        thresholds computed at process time (i.e., without filtering the
+        dataframe again).
+
+        :param filter_by: (str) "time" or "time (inc)"
+        :param filter_perc: (float) filter percentage
+        :return: (np.array) callsite indexes, None if the thresholds were not
+        computed.
+        """
+        if self.filter_thresholds is None:
+            return None
+
+        thresholds = self.filter_thresholds
+        mask = thresholds[filter_by].to_numpy() > filter_perc
+        return thresholds["name"].to_numpy()[mask]
+
     def filter_sg(self, filter_by, filter_val) -> None:
         """
         In-place filtering on the NetworkX Graph.
@@ -1433,25 +2163,10 @@ class SuperGraph(ht.GraphFrame):
             f'[{self.name}] Filtering {self.__str__()}: "{filter_by}" <= {filter_val}'
         )
         self.dataframe = self.df_filter_by_value(filter_by, filter_val)
+        self.stats = None
 
         callsites = self.dataframe["name"].unique()
-        nxg = nx.DiGraph()
-
-        if filter_by == "time (inc)":
-            for edge in self.nxg.edges():
-                # If source is present in the callsites list
-                if edge[0] in callsites and edge[1] in callsites:
-                    nxg.add_edge(edge[0], edge[1])
-                else:
-                    LOGGER.debug(f"[{self.name}] Removing the edge: {edge}")
-
-        elif filter_by == "time":
-            for callsite in callsites:
-                path = self.df_lookup_with_column("name", callsite)["path"].tolist()[0]
-                path = make_list(path)
-                nxg.add_path(path)
-
-        self.nxg = nxg
+        self.nxg = self.nxg_filter(callsites, filter_by)
 
     def filter_by_datasets(self, selected_runs):
         """
@@ -1464,6 +2179,7 @@ class SuperGraph(ht.GraphFrame):
         if selected_runs is not None:
             runs = selected_runs
             self.dataframe = self.df_filter_by_search_string("dataset", runs)
+            self.stats = None
 
         else:
             runs = [self.name]
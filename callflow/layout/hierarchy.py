@@ -10,7 +10,8 @@ import networkx as nx
 
 # CallFlow imports
 import callflow
-from callflow.utils.df import df_as_dict
+from callflow.utils.df import df_unique
+from callflow.utils.nxg import nxg_remove_back_edges
 
 LOGGER = callflow.get_logger(__name__)
 
@@ -43,12 +44,7 @@ class HierarchyLayout:
             df=module_df, path="component_path", nbins=nbins
         )
 
-        # TODO: Need to verify it is always a Tree.
-        cycles = HierarchyLayout._check_cycles(self.nxg)
-        while len(cycles) != 0:
-            self.nxg = HierarchyLayout._remove_cycles(self.nxg, cycles)
-            cycles = HierarchyLayout._check_cycles(self.nxg)
-            LOGGER.debug(f"cycles: {cycles}")
+        self.nxg = HierarchyLayout._remove_cycles(self.nxg, self.node)
 
     def create_nxg_tree_from_paths(self, df, path, nbins):
         """
@@ -60,7 +56,7 @@ class HierarchyLayout:
         """
 
         nxg = nx.DiGraph()
-        cp_dict = df_as_dict(df, "name", "component_path")
+        cp_dict = self.esg.paths.as_dict(path, df_unique(df, "name"))
 
         for c_name, path in cp_dict.items():
             path_list = list(map(lambda p: self.esg.get_name(p, "callsite"), path))
@@ -136,36 +132,16 @@ class HierarchyLayout:
         return nxg
 
     @staticmethod
-    def _check_cycles(G):
+    def _remove_cycles(G, root):
         """
-        Checks if there are cycles.
+        Removes the cycles (also the undirected ones) from the networkX Graph,
+        i.e., keeps the depth-first spanning tree from the module.
 
-        Return:
-            The cycles in the graph.
+        :param G: networkX graph (updated in place)
+        :param root: root of the hierarchy (i.e., the module)
+        :return: networkX graph
         """
-        try:
-            cycles = list(nx.find_cycle(G, orientation="ignore"))
-        except Exception:
-            cycles = []
-
-        return cycles
-
-    @staticmethod
-    def _remove_cycles(G, cycles):
-        """
-        Removes cycles from the networkX Graph.
-        TODO: Improve the logic here.
-        """
-        for cycle in cycles:
-            source = cycle[0]
-            target = cycle[1]
-            LOGGER.debug("Removing edge:", source, target)
-            if source == target:
-                G.remove_edge(source, target)
-                G.remove_node(source)
-                G.remove_node
-
-            if cycle[2] == "reverse":
-                LOGGER.debug("Removing edge:", source, target)
-                G.remove_edge(source, target)
+        sources = [root] if G.has_node(root) else None
+        edges = nxg_remove_back_edges(G, sources=sources, spanning_tree=True)
+        LOGGER.debug(f"Removed {len(edges)} edges of the cycles")
         return G
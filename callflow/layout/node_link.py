@@ -7,11 +7,15 @@
 CallFlow's layout API.
 """
 import networkx as nx
+import numpy as np
 
 # CallFlow imports
 import callflow
 from callflow.utils.timer import Timer
 from callflow.utils.sanitizer import Sanitizer
+from callflow.utils.nxg import nxg_back_edges
+
+LOGGER = callflow.get_logger(__name__)
 
 
 class NodeLinkLayout:
@@ -21,11 +25,13 @@ class NodeLinkLayout:
 
     _COLUMNS = ["time (inc)", "time", "name", "module"]
 
-    def __init__(self, sg, selected_runs=None):
+    def __init__(self, sg, selected_runs=None, max_nodes=0):
         """
         Constructor for node link layout.
         :param sg: SuperGraph
         :param selected_runs: Array of SuperGraphs to consider
+        :param max_nodes: (int) maximum number of nodes; the nodes with the
+        largest mean inclusive time are kept (0 keeps all the nodes)
         """
         assert isinstance(sg, (callflow.SuperGraph, callflow.EnsembleGraph))
 
@@ -44,8 +50,12 @@ class NodeLinkLayout:
         self.runs = selected_runs
         self.nxg = sg.nxg
 
+        means = self._node_means()
+        if max_nodes > 0 and self.nxg.number_of_nodes() > max_nodes:
+            self.nxg = self._top_nodes(self.nxg, means, max_nodes)
+
         # Add node and edge attributes.
-        self._add_node_attributes()
+        self._add_node_attributes(means)
         self._add_edge_attributes()
 
         # print(self.nxg.nodes(data=True))
@@ -55,67 +65,74 @@ class NodeLinkLayout:
         #     self.nxg.cycles = NodeLinkLayout._detect_cycle(self.nxg)
 
     # --------------------------------------------------------------------------
-    @staticmethod
-    def _mean(df, metric):
-        import math
+    def _node_means(self):
+        """
+        Mean runtimes of the nodes (i.e., over all the rows of their
+        callsites), computed in a single groupby.
 
-        time = df[metric].mean()
-        if math.isnan(time):
-            time = 0
-        return time
+        :return: (pd.DataFrame) time (inc) and time of the nodes, indexed by
+        the node (0 for the callsites not in the dataframe)
+        """
+        columns = [self.time_inc, self.time_exc]
+        df = self.sg.dataframe
+        means = df.groupby("name", observed=True)[columns].mean()
 
-    def _add_node_attributes(self):  # noqa: C901
+        nodes = list(self.nxg.nodes())
+        means = means.reindex([self.sg.get_idx(_, "callsite") for _ in nodes])
+        means.index = nodes
+        return means.fillna(0)
+
+    def _top_nodes(self, nxg, means, max_nodes):
+        """
+        Prune the graph to the nodes with the largest mean inclusive time.
+
+        :param nxg: networkX graph
+        :param means: (pd.DataFrame) mean runtimes of the nodes (see
+        _node_means)
+        :param max_nodes: (int) number of nodes to keep
+        :return: networkX graph of the kept nodes (a copy)
+        """
+        inc = means[self.time_inc].to_numpy()
+        order = np.argsort(-inc, kind="stable")[:max_nodes]
+        keep = set(means.index[order].tolist())
+
+        LOGGER.info(f"Pruned the graph to {len(keep)} of {len(nxg)} nodes")
+        return nxg.subgraph([_ for _ in nxg.nodes() if _ in keep]).copy()
+
+    def _add_node_attributes(self, means):
         """
         Add node attributes to the nxg.
+
+        :param means: (pd.DataFrame) mean runtimes of the nodes (see
+        _node_means)
         :return: None
         """
-        # compute data map
-        datamap = {}
-        for callsite in self.nxg.nodes():
-            for column in NodeLinkLayout._COLUMNS:
-                if column not in datamap:
-                    datamap[column] = {}
-
-                callsite_idx = self.sg.get_idx(callsite, "callsite")
-                _df = self.sg.df_lookup_with_column("name", callsite_idx)
-
-                if column == "time (inc)":
-                    datamap[column][callsite] = NodeLinkLayout._mean(_df, self.time_inc)
-                elif column == "time":
-                    datamap[column][callsite] = NodeLinkLayout._mean(_df, self.time_exc)
-                elif column == "name":
-                    datamap[column][callsite] = callsite
-                elif column == "module":
-                    datamap[column][callsite] = self.sg.get_module(callsite_idx)
+        nodes = list(self.nxg.nodes())
+        means = means.loc[nodes]
+
+        datamap = {
+            "time (inc)": dict(zip(nodes, means[self.time_inc].tolist())),
+            "time": dict(zip(nodes, means[self.time_exc].tolist())),
+            "name": {_: _ for _ in nodes},
+            "module": {
+                _: self.sg.get_module(self.sg.get_idx(_, "callsite")) for _ in nodes
+            },
+        }
 
         # ----------------------------------------------------------------------
-        for idx, key in enumerate(datamap):
+        for key in NodeLinkLayout._COLUMNS:
             nx.set_node_attributes(self.nxg, name=key, values=datamap[key])
 
     # --------------------------------------------------------------------------
     def _add_edge_attributes(self):
         """
-        Add edge attributes to nxg.
+        Add edge attributes to nxg, i.e., the number of times an edge is in
+        the edge array of the graph. An edge is in the edge array of a DiGraph
+        once, so the count is always 1 (a self-loop too, which used to count
+        the nodes that could reach it).
         :return: None
         """
-        source = None
-        orientation = None
-        is_directed = self.nxg.is_directed()
-
-        edge_counter = {}
-
-        for start_node in self.nxg.nbunch_iter(source):
-            for edge in nx.edge_dfs(self.nxg, start_node, orientation):
-
-                tail, head = NodeLinkLayout._tailhead(edge, is_directed, orientation)
-
-                if edge not in edge_counter:
-                    edge_counter[edge] = 0
-
-                if tail == head:
-                    edge_counter[edge] += 1
-                else:
-                    edge_counter[edge] = 1
+        edge_counter = dict.fromkeys(self.nxg.edges(), 1)
 
         # ----------------------------------------------------------------------
         nx.set_edge_attributes(self.nxg, name="count", values=edge_counter)
@@ -123,95 +140,18 @@ class NodeLinkLayout:
     # --------------------------------------------------------------------------
     # Reports the number of cycles in the callpaths.
     @staticmethod
-    def _detect_cycle(G, source=None, orientation=None):
+    def _detect_cycle(G, source=None):
         """
         Detect cycles in the CCT.
 
         :param G: nxg Graph
-        :param source: source node to start searching
-        :param orientation: orientation of edges to consider
-        :return: Array of cycles [(source, target), ...]
+        :param source: source node(s) to start searching, default is the roots
+        :return: Array of the edges closing the cycles [(source, target), ...]
+        (see callflow.utils.nxg.nxg_back_edges)
         """
-        explored = set()
-        cycle = []
-        count = 0
-        final_node = None
-        is_directed = G.is_directed()
-        for start_node in G.nbunch_iter(source):
-            if start_node in explored:
-                # No loop is possible.
-                continue
-
-            edges = []
-            # All nodes seen in this iteration of edge_dfs
-            seen = {start_node}
-            # Nodes in active path.
-            active_nodes = {start_node}
-            previous_head = None
-
-            for edge in nx.edge_dfs(G, start_node, orientation):
-                # Determine if this edge is a continuation of the active path.
-                tail, head = NodeLinkLayout._tailhead(edge, is_directed, orientation)
-                if head in explored:
-                    # Then we've already explored it. No loop is possible.
-                    continue
-                if previous_head is not None and tail != previous_head:
-                    # This edge results from backtracking.
-                    # Pop until we get a node whose head equals the current tail.
-                    # So for example, we might have:
-                    #  (0, 1), (1, 2), (2, 3), (1, 4)
-                    # which must become:
-                    #  (0, 1), (1, 4)
-                    while True:
-                        try:
-                            popped_edge = edges.pop()
-                        except IndexError:
-                            edges = []
-                            active_nodes = {tail}
-                            break
-                        else:
-                            popped_head = NodeLinkLayout._tailhead(
-                                popped_edge, is_directed, orientation
-                            )[1]
-                            active_nodes.remove(popped_head)
-
-                        if edges:
-                            # how can you pass a single element into tailhead?
-                            last_head = NodeLinkLayout._tailhead(
-                                edges[-1], is_directed, orientation
-                            )[1]
-                            if tail == last_head:
-                                break
-                edges.append(edge)
-
-                if head in active_nodes:
-                    # We have a loop!
-                    cycle.extend(edges)
-                    final_node = head
-                    break
-                else:
-                    seen.add(head)
-                    active_nodes.add(head)
-                    previous_head = head
-
-            if cycle:
-                count += 1
-                break
-            else:
-                explored.update(seen)
-
-        else:
-            assert len(cycle) == 0
-            # raise nx.exception.NetworkXNoCycle('No cycle found.')
-
-        # We now have a list of edges which ends on a cycle.
-        # So we need to remove from the beginning edges that are not relevant.
-        i = 0
-        for i, edge in enumerate(cycle):
-            tail, head = NodeLinkLayout._tailhead(edge, is_directed, orientation)
-            if tail == final_node:
-                break
-        return cycle[i:]
+        if source is not None:
+            source = list(G.nbunch_iter(source))
+        return nxg_back_edges(G, sources=source)
 
     # --------------------------------------------------------------------------
     @staticmethod
@@ -8,8 +8,8 @@ CallFlow's layout - Sankey.
 """
 import networkx as nx
 import numpy as np
-from ast import literal_eval as make_list
-from callflow.utils.df import df_as_dict
+from callflow.utils.df import df_unique
+from callflow.utils.nxg import nxg_remove_back_edges
 
 # CallFlow imports
 import callflow
@@ -34,6 +34,9 @@ class SankeyLayout:
         reveal_callsites=[],
         split_entry_module="",
         split_callee_module="",
+        filter_by="time (inc)",
+        filter_perc=0.0,
+        nxg=None,
     ):
         """
         Construct the Sankey layout.
@@ -44,6 +47,12 @@ class SankeyLayout:
         :param reveal_callsites: array of callsites to reveal
         :param split_entry_module: array of entry modules to split
         :param split_callee_module: array of callees to split
+        :param filter_by: filter mode, "time" or "time (inc)"
+        :param filter_perc: filter percentage; the callsites are masked with
+        the thresholds computed at process time (see SuperGraph.filter_callsites)
+        :param nxg: networkX graph of the default layout (i.e., without the
+        reveal and split interactions) to apply the interactions to, instead
+        of constructing it from the paths
         """
         assert isinstance(sg, (callflow.SuperGraph, callflow.EnsembleGraph))
         if esg is not None:
@@ -70,10 +79,38 @@ class SankeyLayout:
 
         self.df = self.sg.dataframe
 
-        self.gp_dict = df_as_dict(self.df, "name", grp_column)
-        self.cp_dict = df_as_dict(self.df, "name", "component_path")
+        # paths of the callsites in the dataframe.
+        callsites = df_unique(self.df, "name")
+        self.callsite_nxg = self.sg.nxg
+
+        # the callsites retained at filter_perc, and their graph (as Filter).
+        self.retained = None
+        if filter_perc > 0:
+            retained = self.sg.filter_callsites(filter_by, filter_perc)
+            if retained is not None:
+                callsites = np.intersect1d(callsites, retained)
+                self.callsite_nxg = self.sg.nxg_filter(callsites, filter_by)
+                self.retained = set(callsites.tolist())
+            else:
+                LOGGER.warning(
+                    f"No filter thresholds for {self.sg.name}; ignoring filter_perc."
+                )
+
+        self.gp_dict = self.sg.paths.as_dict(grp_column, callsites)
+        self.cp_dict = self.sg.paths.as_dict("component_path", callsites)
 
-        self.nxg = self._create_nxg_from_paths()
+        # attributes of the nodes, computed for all the nodes of the graph at
+        # once (see _prepare_nodes).
+        self._runtimes = {}
+        self._module_callsites = None
+        self._entry_functions = {}
+        self._hists = {}
+        self._gradients = {}
+
+        if nxg is None:
+            self.nxg = self._create_nxg_from_paths()
+        else:
+            self.nxg = nxg
 
         if len(self.reveal_callsites) > 0:
             self.add_reveal_paths(self.reveal_callsites)
@@ -124,17 +161,15 @@ class SankeyLayout:
         """
         Get callsite path information
 
-        :param callsites:
+        :param callsites: callsite indexes
         :return:
         """
         paths = []
         for callsite in callsites:
-            df = self.primary_group_df.get_group(callsite)
             paths.append(
                 {
-                    "group_path": make_list(df["group_path"].unique()[0]),
-                    "path": make_list(df["path"].unique()[0]),
-                    "component_path": make_list(df["component_path"].unique()[0]),
+                    _: self.sg.paths.get(_, callsite)
+                    for _ in ["group_path", "path", "component_path"]
                 }
             )
         return paths
@@ -343,7 +378,7 @@ class SankeyLayout:
 
         unique_paths = {}
 
-        for callsite in self.sg.nxg.nodes():
+        for callsite in self.callsite_nxg.nodes():
             cs_idx = self.sg.get_idx(callsite, "callsite")
 
             if cs_idx not in self.gp_dict:
@@ -359,7 +394,10 @@ class SankeyLayout:
             if len(cp_path) == 1:
                 unique_paths[tuple(path)].append(cp_path[0])
 
-        flow_mapping = {}
+        nodes = {}  # node name -> node whose attributes are set
+        names = {}  # node name -> index
+        keys = {}  # (type, id) -> index of the runtime
+        edges = []  # (source name, target name, target runtime) indexes
         # TODO: Convert the unique paths to a graph. (by breaking the cycles)
         for path in unique_paths.keys():
             if len(path) > 2:
@@ -372,63 +410,153 @@ class SankeyLayout:
                     src_name = self.sg.get_name(src.get("id"), src.get("type"))
                     tgt_name = self.sg.get_name(tgt.get("id"), tgt.get("type"))
 
-                    if not nxg.has_node(src_name):
-                        src_dict = self.sg_node_construct(src)
-                        nxg.add_node(src_name, attr_dict=src_dict)
+                    # the attributes of a target are set from its last path.
+                    if src_name not in nodes:
+                        nodes[src_name] = src
+                    nodes[tgt_name] = tgt
 
-                    if not nxg.has_node(tgt):
-                        tgt_dict = self.sg_node_construct(tgt)
-                        nxg.add_node(tgt_name, attr_dict=tgt_dict)
+                    tgt_key = (tgt.get("type"), tgt.get("id"))
+                    edges.append(
+                        (
+                            names.setdefault(src_name, len(names)),
+                            names.setdefault(tgt_name, len(names)),
+                            keys.setdefault(tgt_key, len(keys)),
+                        )
+                    )
 
-                    has_callback_edge = nxg.has_edge(src_name, tgt_name)
+        nxg.add_nodes_from(nodes)
+
+        # the weight of a super edge is the sum of the runtimes of its
+        # targets, over all the paths through it.
+        if len(edges) > 0:
+            edges = np.array(edges, dtype=np.int64)
+            runtimes = np.array(
+                [
+                    self._get_runtime({"type": _[0], "id": _[1]}, self.time_inc)
+                    for _ in keys
+                ],
+                dtype=np.float64,
+            )
+            names = np.array(list(names), dtype=object)
+            for src, tgt, weight in zip(
+                *SankeyLayout._reduce_edges(
+                    edges[:, 0], edges[:, 1], runtimes[edges[:, 2]]
+                )
+            ):
+                nxg.add_edge(
+                    names[src],
+                    names[tgt],
+                    attr_dict={"edge_type": "caller", "weight": float(weight)},
+                )
 
-                    if has_callback_edge:
-                        edge_type = "callback"
-                    else:
-                        edge_type = "caller"
+        self._prepare_nodes(list(nodes.values()))
+        for name, node in nodes.items():
+            nxg.nodes[name]["attr_dict"] = self.sg_node_construct(node)
 
-                    super_edge = (src_name, tgt_name)
+        return nxg
 
-                    if super_edge not in flow_mapping:
-                        flow_mapping[super_edge] = {
-                            "edge_type": edge_type,
-                            "weight": 0,
-                        }
+    @staticmethod
+    def _reduce_edges(src, tgt, weights):
+        """
+        Sum the weights of the repeated edges.
 
-                    flow_mapping[super_edge]["weight"] += self.sg.get_runtime(
-                        tgt, self.time_inc
-                    )
+        :param src: (np.array) source of each edge
+        :param tgt: (np.array) target of each edge
+        :param weights: (np.array) weight of each edge (non-negative)
+        :return: (np.array, np.array, np.array) source, target and weight of
+        the edges with a positive weight, in the order of their first positive
+        weight (i.e., the order the edges are added to the graph)
+        """
+        n = max(src.max(), tgt.max()) + 1
+        codes, inverse = np.unique(src * n + tgt, return_inverse=True)
+        inverse = inverse.reshape(-1)
 
-                    if (
-                        not nxg.has_edge(src_name, tgt_name)
-                        and flow_mapping[super_edge]["weight"] > 0
-                    ):
-                        nxg.add_edge(
-                            src_name, tgt_name, attr_dict=flow_mapping[super_edge]
-                        )
+        total = np.zeros(codes.shape[0], dtype=np.float64)
+        np.add.at(total, inverse, weights)
 
-        return nxg
+        first = np.full(codes.shape[0], src.shape[0], dtype=np.int64)
+        positive = np.flatnonzero(weights > 0)
+        np.minimum.at(first, inverse[positive], positive)
+
+        kept = np.flatnonzero(first < src.shape[0])
+        kept = kept[np.argsort(first[kept], kind="stable")]
+        return codes[kept] // n, codes[kept] % n, total[kept]
+
+    def _prepare_nodes(self, nodes):
+        """
+        Compute the histograms (and the gradients of an ensemble) of the nodes
+        at once, i.e., in a grouped pass over the dataframe instead of a
+        lookup per node.
+
+        :param nodes: (list) nodes (e.g., {"id": 0, "type": "module"})
+        """
+        nodes = [_ for _ in nodes if (_.get("type"), _.get("id")) not in self._hists]
+        if len(nodes) == 0:
+            return
+
+        self._hists.update(self.sg.get_all_histograms(nodes, nbins=20))
+        if self.sg.name == "ensemble":
+            self._gradients.update(self.sg.get_all_gradients(nodes, self.nbins))
 
     def sg_node_construct(self, node):
         name = self.sg.get_name(node.get("id"), node.get("type"))
+        key = (node.get("type"), node.get("id"))
+        self._prepare_nodes([node])
 
         ret = {
             "name": name,
             "type": node.get("type"),
             "level": node.get("level"),
             # "cp_path": self.cp_dict[self.sg.get_id(node)],
-            "time (inc)": self.sg.get_runtime(node, self.time_inc),
-            "time": self.sg.get_runtime(node, self.time_exc),
-            "hists": self.sg.get_histograms(node, nbins=20),
-            "entry_functions": self.sg.get_entry_functions(node),
+            "time (inc)": self._get_runtime(node, self.time_inc),
+            "time": self._get_runtime(node, self.time_exc),
+            "hists": self._hists[key],
+            "entry_functions": self._get_entry_functions(node),
             "idx": node.get("id"),
         }
 
         if self.sg.name == "ensemble":
-            ret["gradients"] = self.sg.get_gradients(node, self.nbins)
+            ret["gradients"] = self._gradients[key]
 
         return ret
 
+    def _get_entry_functions(self, node):
+        """
+        Entry functions of a node, without the callsites masked by the filter
+        percentage.
+        """
+        key = (node.get("type"), node.get("id"))
+        if key not in self._entry_functions:
+            callsites = None
+            if node.get("type") == "module":
+                if self._module_callsites is None:
+                    self._module_callsites = self.sg.get_module_callsites()
+                callsites = self._module_callsites.get(node.get("id"), [])
+
+            ret = self.sg.get_entry_functions(node, callsites)
+            if self.retained is not None:
+                ret = [_ for _ in ret if _["id"] in self.retained]
+            self._entry_functions[key] = ret
+        return self._entry_functions[key]
+
+    def _get_runtime(self, node, metric):
+        """
+        Runtime of a node, where the callsites masked by the filter percentage
+        have no runtime (as in a SuperGraph filtered at that percentage). The
+        runtimes of all the callsites are looked up at once.
+        """
+        if metric not in self._runtimes:
+            self._runtimes[metric] = self.sg.get_callsite_runtimes(metric)
+        runtimes = self._runtimes[metric]
+
+        if node.get("type") == "callsite":
+            if self.retained is not None and node.get("id") not in self.retained:
+                return 0.0
+            return runtimes.get(node.get("id"), 0.0)
+
+        runtimes = [runtimes.get(_["id"], 0.0) for _ in self._get_entry_functions(node)]
+        return max(runtimes) if len(runtimes) > 0 else 0.0
+
     def _break_cycles_in_paths(self, cs_idx, path):
         """
         Breaks cycles in the call graph, if present.
@@ -538,44 +666,11 @@ class SankeyLayout:
             exit_functions[edge_tuple].append(edge_dict["source_callsite"])
         return exit_functions
 
-    def dfs_visit_recursively(self, g, node, nodes_color, edges_to_be_removed):
-
-        nodes_color[node] = 1
-        nodes_order = list(g.successors(node))
-        nodes_order = np.random.permutation(nodes_order)
-        for child in nodes_order:
-            if nodes_color[child] == 0:
-                self.dfs_visit_recursively(g, child, nodes_color, edges_to_be_removed)
-            elif nodes_color[child] == 1:
-                edges_to_be_removed.append((node, child))
-
-        nodes_color[node] = 2
-
-    def dfs_remove_back_edges(self, g, nodetype=int):
+    def dfs_remove_back_edges(self, g):
         """
-        0: white, not visited
-        1: grey, being visited
-        2: black, already visited
+        Remove the back edges of a depth-first search, so that the graph is
+        acyclic (see callflow.utils.nxg.nxg_back_edges).
         """
-
-        nodes_color = {}
-        edges_to_be_removed = []
-        for node in g.nodes():
-            nodes_color[node] = 0
-
-        nodes_order = list(g.nodes())
-        nodes_order = np.random.permutation(nodes_order)
-        num_dfs = 0
-        for node in nodes_order:
-
-            if nodes_color[node] == 0:
-                num_dfs += 1
-                self.dfs_visit_recursively(g, node, nodes_color, edges_to_be_removed)
-
-        print("number of nodes to start dfs: %d" % num_dfs)
-        print(f"number of back edges: {edges_to_be_removed}")
-
-        for edge in edges_to_be_removed:
-            g.remove_edge(edge[0], edge[1])
-
+        edges = nxg_remove_back_edges(g)
+        LOGGER.debug(f"Removed {len(edges)} back edges")
         return g
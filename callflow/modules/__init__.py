@@ -12,6 +12,7 @@ from .gradients import Gradients
 from .scatterplot import Scatterplot
 from .parameter_projection import ParameterProjection
 from .diff_view import DiffView
+from .node_stats import NodeStats
 
 __all__ = [
     "BoxPlot",
@@ -20,4 +21,5 @@ __all__ = [
     "Scatterplot",
     "ParameterProjection",
     "DiffView",
+    "NodeStats",
 ]
@@ -13,6 +13,7 @@ from scipy.stats import kurtosis, skew
 import callflow
 from callflow.utils.df import df_count
 from callflow.utils.utils import outliers
+from callflow.modules.node_stats import NodeStats
 from callflow.datastructures.metrics import TIME_COLUMNS
 
 LOGGER = callflow.get_logger(__name__)
@@ -26,7 +27,7 @@ class BoxPlot:
     Boxplot computation for a dataframe segment
     """
 
-    def __init__(self, sg, rel_sg=None, name="", ntype="", iqr_scale=1.5):
+    def __init__(self, sg, rel_sg=None, name="", ntype="", iqr_scale=1.5, max_points=0):
         """
         Boxplot for callsite or module
 
@@ -35,11 +36,14 @@ class BoxPlot:
         :param name: (str) Node name
         :param ntype: (str) Node type (e.g., "callsite" or "module")
         :param proxy_columns: (dict) Proxy for names.
+        :param max_points: (int) Sketch mode if > 0, i.e., the quantile sketch
+        of the distribution is added (the outliers are always exact)
         """
         assert isinstance(sg, callflow.SuperGraph)
         assert isinstance(name, str)
         assert ntype in ["callsite", "module"]
         assert isinstance(iqr_scale, float)
+        assert isinstance(max_points, int)
 
         self.time_columns = [sg.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
         self.idx = sg.get_idx(name, ntype)
@@ -54,6 +58,7 @@ class BoxPlot:
         }
         self.ntype = ntype
         self.iqr_scale = iqr_scale
+        self.max_points = max_points
 
         if ntype == "callsite":
             self.result["module"] = sg.get_module(sg.get_idx(name, ntype))
@@ -62,13 +67,13 @@ class BoxPlot:
 
         self.box_types = ["tgt"]
         df = BoxPlot.get_aux_dict(sg, ntype, self.idx)
-        self.result["tgt"] = self.compute(sg, df)
+        self.result["tgt"] = self.compute(sg, df, self.idx)
 
         self.rel_c_path = None
         if rel_sg is not None:
             self.rel_idx = rel_sg.get_idx(name, ntype)
             rel_df = BoxPlot.get_aux_dict(rel_sg, ntype, self.rel_idx)
-            self.result["bkg"] = self.compute(rel_sg, rel_df)
+            self.result["bkg"] = self.compute(rel_sg, rel_df, self.rel_idx)
             self.box_types = ["tgt", "bkg"]
 
     @staticmethod
@@ -83,11 +88,15 @@ class BoxPlot:
 
         return aux_dict[idx]
 
-    def compute(self, sg, df):
+    def compute(self, sg, df, idx):
         """
-        Compute boxplot related information.
+        Compute boxplot related information. The statistics are read from
+        the SuperGraph's node statistics, if available; only the outliers
+        are computed from the dataframe.
 
+        :param sg: (callflow.SuperGraph) SuperGraph of the dataframe.
         :param df: Dataframe to calculate the boxplot information.
+        :param idx: (int) Index of the node in the SuperGraph.
         :return:
         """
 
@@ -99,8 +108,25 @@ class BoxPlot:
 
         ret = {_: {} for _ in TIME_COLUMNS}
         for tk, tv in zip(TIME_COLUMNS, self.time_columns):
-            q = np.percentile(df[tv], [0.0, 25.0, 50.0, 75.0, 100.0])
-            mask = outliers(df[tv], scale=self.iqr_scale)
+            _data = df[tv].to_numpy()
+            stats = sg.get_node_stats(idx, self.ntype, tv)
+
+            if stats is not None:
+                q = np.array([stats[f"q{int(_)}"] for _ in NodeStats.QUANTILES])
+                _min, _mean, _max = stats["q0"], stats["mean"], stats["q100"]
+                _var, _imb = stats["var"], stats["imb"]
+                _skew, _kurt = stats["skew"], stats["kurt"]
+                quartiles = (stats["q25"], stats["q75"])
+            else:
+                q = np.percentile(df[tv], NodeStats.QUANTILES)
+                _min, _mean, _max = _data.min(), _data.mean(), _data.max()
+                _var = _data.var() if _data.shape[0] > 0 else 0.0
+                _imb = (_max - _mean) / _mean if not np.isclose(_mean, 0.0) else _max
+                _skew = skew(_data)
+                _kurt = kurtosis(_data)
+                quartiles = None
+
+            mask = outliers(_data, scale=self.iqr_scale, quartiles=quartiles)
             mask = np.where(mask)[0]
 
             if "rank" in df.columns:
@@ -108,16 +134,9 @@ class BoxPlot:
             else:
                 rank = np.zeros(mask.shape[0], dtype=int)
 
-            _data = df[tv].to_numpy()
-            _min, _mean, _max = _data.min(), _data.mean(), _data.max()
-            _var = _data.var() if _data.shape[0] > 0 else 0.0
-            _imb = (_max - _mean) / _mean if not np.isclose(_mean, 0.0) else _max
-            _skew = skew(_data)
-            _kurt = kurtosis(_data)
-
             ret[tk] = {
                 "q": q,
-                "oval": df[tv].to_numpy()[mask],
+                "oval": _data[mask],
                 "orank": rank,
                 "d": _data,
                 "rng": (_min, _max),
@@ -129,6 +148,9 @@ class BoxPlot:
             if "dataset" in df.columns:
                 ret[tk]["odset"] = df["dataset"].to_numpy()[mask]
 
+            if self.max_points > 0:
+                ret[tk]["qs"] = NodeStats.sketch(_data, stats)
+
             ret[tk]["cpath"] = sg.get_component_path(self.node)
 
         return ret
@@ -170,6 +192,10 @@ class BoxPlot:
                 if "cpath" in box:
                     result[box_type][metric]["cpath"] = box["cpath"]
 
+                if "qs" in box:
+                    result[box_type][metric]["qs"] = box["qs"]
+                    result[box_type][metric]["npoints"] = box["d"].shape[0]
+
         return result
 
 
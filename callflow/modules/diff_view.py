@@ -10,9 +10,10 @@ CallFlow operation for the comparing two or more dataset members from an ensembl
 import numpy as np
 
 import callflow
-from callflow.utils.utils import histogram
+from callflow.utils.utils import histogram, sample_points
 from callflow.utils.df import df_count, df_lookup_by_column, df_lookup_and_list
 from .histogram import Histogram
+from .node_stats import NodeStats
 
 LOGGER = callflow.get_logger()
 
@@ -22,17 +23,22 @@ class DiffView:
     Calculate differences from sections of dataframe
     """
 
-    def __init__(self, esg, dataset1, dataset2, col):
+    def __init__(self, esg, dataset1, dataset2, col, max_points=0):
         """
         Constructor for the class.
         :param esg: (callflow.EnsembleSuperGraph) Ensemble supergraph
         :param dataset1: (str) 1st dataset name
         :param dataset2: (str) 2nd dataset name
         :param col: (str) column to compare. (e.g., time or time (inc))
+        :param max_points: (int) Maximum number of ranks of the per-rank
+        differences (i.e., sketch mode: the outliers, extrema and a sample of
+        the ranks, and a quantile sketch of the differences), 0 returns all
+        the ranks
         """
         assert isinstance(esg, callflow.EnsembleGraph)
         assert isinstance(dataset1, str) and isinstance(dataset2, str)
         assert isinstance(col, str)
+        assert isinstance(max_points, int)
 
         self.sg = esg
 
@@ -41,6 +47,7 @@ class DiffView:
         self.dataset1 = dataset1
         self.dataset2 = dataset2
         self.col = col
+        self.max_points = max_points
 
         # Calculate the max_rank.
         self.max_rank = max(df_count(self.df1, "rank"), df_count(self.df2, "rank"))
@@ -156,6 +163,13 @@ class DiffView:
             "mean": mean,
             "diff": diff,
         }
+
+        if self.max_points > 0:
+            pos = sample_points(diff, np.arange(diff.shape[0]), self.max_points)
+            result["mean"], result["diff"] = mean[pos], diff[pos]
+            result["ranks"] = pos
+            result["npoints"] = diff.shape[0]
+            result["qs"] = NodeStats.sketch(diff)
         return result
 
 
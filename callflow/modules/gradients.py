@@ -29,7 +29,7 @@ class Gradients:
     Computes the ensemble gradients for the a given dictionary of dataframes.
     """
 
-    def __init__(self, sg, node, bins: int = 20, proxy_columns={}):
+    def __init__(self, sg, node, bins: int = 20, proxy_columns={}, means=None):
         """
         Constructor function for the class
 
@@ -37,6 +37,8 @@ class Gradients:
         :param node: Super node or node
         :param bins: Number of bins to distribute the runtime information.
         :param proxy_columns: Proxy columns
+        :param means: Mean runtime of the node per dataset, if precomputed
+        (see Gradients.dataset_means).
         """
         assert isinstance(sg, callflow.SuperGraph)
         assert node.get("type") in ["callsite", "module"]
@@ -47,6 +49,19 @@ class Gradients:
         self.node = node
         self.name = sg.get_name(node.get("id"), node.get("type"))
 
+        self.bins = bins
+        self.proxy_columns = proxy_columns
+        self.time_columns = [self.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
+
+        if means is not None:
+            self.result = self.compute_from_means(means)
+            return
+
+        # use the per-dataset means of the node statistics, if available.
+        if sg.stats is not None:
+            self.result = self.compute_from_stats(sg)
+            return
+
         indexers = ["dataset"]
         if node.get("type") == "callsite":
             indexers.append("name")
@@ -61,11 +76,6 @@ class Gradients:
         self.datasets = list(self.df.index.levels[0])
         assert len(self.datasets) >= 1
 
-        self.bins = bins
-
-        self.proxy_columns = proxy_columns
-        self.time_columns = [self.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
-
         self.max_ranks = max(df_unique(self.df, "rank"))
         self.result = self.compute()
 
@@ -148,6 +158,89 @@ class Gradients:
                 else:
                     dists[tk][dataset] = dict(zip(node_df["rank"], node_df[tv]))
 
+        return self.compute_from_means(
+            {tk: Gradients.convert_dictmean_to_dict(dists[tk]) for tk in TIME_COLUMNS}
+        )
+
+    def compute_from_stats(self, sg):
+        """
+        Compute the required results from the node statistics of the
+        ensemble.
+
+        :param sg: (callflow.EnsembleGraph) Ensemble SuperGraph
+        :return: (JSON) data
+        """
+        nid, ntype = self.node.get("id"), self.node.get("type")
+        datasets = sorted(_ for _ in set(sg.stats.columns["dataset"]) if _ != sg.name)
+
+        means = {tk: {} for tk in TIME_COLUMNS}
+        for tk, tv in zip(TIME_COLUMNS, self.time_columns):
+            for dataset in datasets:
+                stats = sg.get_node_stats(nid, ntype, tv, dataset)
+                if stats is not None:
+                    means[tk][dataset] = stats["mean"]
+
+        return self.compute_from_means(means)
+
+    @staticmethod
+    def dataset_means(sg, ntype, nids, proxy_columns={}):
+        """
+        Mean runtime of several nodes per dataset, in one pass over the node
+        statistics of the ensemble (or the per-dataset auxiliary dictionaries,
+        if the statistics are not available).
+
+        :param sg: (callflow.EnsembleGraph) Ensemble SuperGraph
+        :param ntype: (str) type of the nodes (i.e., callsite or module)
+        :param nids: (list) node indexes
+        :param proxy_columns: Proxy columns
+        :return: (dict) node index -> { "time": { "dataset_name": mean } }
+        """
+        time_columns = [proxy_columns.get(_, _) for _ in TIME_COLUMNS]
+        metric = dict(zip(time_columns, TIME_COLUMNS))
+
+        if sg.stats is not None:
+            table = sg.stats.table
+            table = table[
+                (table["ntype"] == ntype)
+                & (table["dataset"] != sg.name)
+                & table["metric"].isin(time_columns)
+                & table["nid"].isin(nids)
+            ]
+            table = table[["nid", "metric", "dataset", "mean"]]
+        else:
+            if ntype == "callsite":
+                aux_dict = sg.rel_callsite_aux_dict
+            elif ntype == "module":
+                aux_dict = sg.rel_module_aux_dict
+
+            _nids = [_ for _ in dict.fromkeys(nids) if _ in aux_dict]
+            offsets, rows = aux_dict.take(_nids)
+            df = aux_dict.df.take(rows)
+            df.insert(0, "nid", np.repeat(_nids, np.diff(offsets)))
+            df = df.groupby(["nid", "dataset"])[time_columns].mean().reset_index()
+            table = df.melt(
+                id_vars=["nid", "dataset"],
+                value_vars=time_columns,
+                var_name="metric",
+                value_name="mean",
+            )
+
+        ret = {_: {tk: {} for tk in TIME_COLUMNS} for _ in nids}
+        table = table.sort_values(["nid", "metric", "dataset"], kind="stable")
+        for nid, tv, dataset, mean in zip(
+            *[table[_].to_numpy() for _ in ["nid", "metric", "dataset", "mean"]]
+        ):
+            ret[nid][metric[tv]][dataset] = mean
+        return ret
+
+    def compute_from_means(self, means):
+        """
+        Compute the histogram of the per-dataset means.
+
+        :param means: (dict) mean runtime of the node per dataset for each
+        time column, e.g., { "time": { "dataset_name": mean } }.
+        :return: (JSON) data
+        """
         # Calculate appropriate number of bins automatically.
         # num_of_bins = min(self.freedman_diaconis_bins(np.array(dist_list)),
         num_of_bins = self.bins
@@ -156,9 +249,9 @@ class Gradients:
         results = {}
         for tk, tv in zip(TIME_COLUMNS, self.time_columns):
 
-            dists_list = np.array(Gradients.convert_dictmean_to_list(dists[tk]))
-            datasets_dict = Gradients.convert_dictmean_to_dict(dists[tk])
-            dists_dict = Gradients.convert_dictmean_to_dict(dists[tk])
+            dists_list = np.array(list(means[tk].values()))
+            datasets_dict = means[tk]
+            dists_dict = means[tk]
             hist_grid = histogram(dists_list, bins=num_of_bins)
             # kde_grid = kde(dists_list, gridsize=num_of_bins)
 
@@ -7,13 +7,15 @@
 """
 CallFlow's operation to calculate the rank and dataset histograms.
 """
+import numpy as np
 import pandas as pd
 import itertools
 from callflow.utils.df import df_count
 
 import callflow
-from callflow.utils.utils import histogram
+from callflow.utils.utils import histogram, sample_points
 from callflow.datastructures.metrics import TIME_COLUMNS
+from callflow.modules.node_stats import NodeStats
 
 LOGGER = callflow.get_logger(__name__)
 
@@ -34,6 +36,7 @@ class Histogram:
         ntype="",
         bins=20,
         histo_types=[],
+        max_points=0,
     ):
         """
         Constructor for the histogram computation.
@@ -44,12 +47,16 @@ class Histogram:
         :param ntype: (str) type of node (i.e., callsite or module)
         :param histo_types: (list) Histogram types (e.g., name, rank, and dataset)
         :param bins: (int) Number of bins in the histogram
+        :param max_points: (int) Maximum number of per-rank values returned
+        (i.e., sketch mode: the outliers, extrema and a sample of the ranks,
+        and a quantile sketch of the distribution), 0 returns all the values
         """
         assert isinstance(sg, callflow.SuperGraph)
         if rel_sg is not None:
             assert isinstance(rel_sg, callflow.SuperGraph)
         assert isinstance(bins, int)
         assert isinstance(histo_types, list)
+        assert isinstance(max_points, int)
         assert bins > 0
         assert ntype in ["callsite", "module"]
 
@@ -59,6 +66,7 @@ class Histogram:
 
         self.time_columns = [sg.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
         self.result = {_: {} for _ in TIME_COLUMNS}
+        self.max_points = max_points
 
         if len(histo_types) == 0:
             self.histo_types = Histogram.HISTO_TYPES
@@ -72,6 +80,27 @@ class Histogram:
 
             # compute the range of the actual data
             df = self._get_data_by_histo_type(dataframe, h)[tv]
+
+            # use the precomputed histogram of the node, if available.
+            precomputed, stats = None, None
+            if rel_sg is None and h == "rank" and sg.stats is not None:
+                precomputed = sg.stats.histogram(
+                    sg.get_idx(name, ntype), ntype, tv, sg.name, bins
+                )
+                stats = sg.get_node_stats(sg.get_idx(name, ntype), ntype, tv)
+
+            if precomputed is not None:
+                edges, centers, counts = precomputed
+                self.result[tk][h] = {
+                    "abs": counts,
+                    "rel": None,
+                    "rng": centers,
+                    "dig": np.digitize(df, edges),
+                }
+                self.result[tk]["d"] = self._get_node_data(df, ntype)
+                self._sample(tk, h, df, stats)
+                continue
+
             drng = [df.min(), df.max()]
 
             # compute the range df relative to the provided relative_to_df.
@@ -110,14 +139,51 @@ class Histogram:
                 "dig": dhist[2],
             }
 
-            if ntype == "callsite":
-                _data = df.to_numpy()
-            elif ntype == "module":
-                _data = df.groupby(["rank"]).mean().to_numpy()
-            else:
-                assert False
+            self.result[tk]["d"] = self._get_node_data(df, ntype)
+            self._sample(tk, h, df)
+
+    def _sample(self, tk, h, df, stats=None):
+        """
+        Sketch mode: keep the digitized and per-rank values of a sample of
+        the points (see callflow.utils.utils.sample_points), and add the
+        quantile sketch of the distribution.
+
+        :param tk: (str) time column
+        :param h: (str) histogram type
+        :param df: (pd.Series) data of the histogram
+        :param stats: (dict) statistics of the node, if available
+        """
+        if self.max_points <= 0:
+            return
+
+        result = self.result[tk]
+        result[h]["qs"] = NodeStats.sketch(df, stats)
+        result[h]["npoints"] = len(df)
+        result[h]["pos"] = sample_points(
+            df.to_numpy(), Histogram._get_ranks(df), self.max_points
+        )
+
+        d = result["d"]
+        if len(d) == len(df):
+            pos = result[h]["pos"]
+        else:
+            pos = sample_points(d, np.arange(len(d)), self.max_points)
+        result["d"], result["dpos"] = d[pos], pos
+
+    @staticmethod
+    def _get_ranks(df):
+        # rank of each value, if the data is indexed by rank
+        if df.index.names == ["rank"]:
+            return df.index.to_numpy()
+        return np.arange(len(df))
 
-            self.result[tk]["d"] = _data
+    @staticmethod
+    def _get_node_data(df, ntype):
+        if ntype == "callsite":
+            return df.to_numpy()
+        elif ntype == "module":
+            return df.groupby(["rank"]).mean().to_numpy()
+        assert False
 
     def unpack(self):
         """
@@ -137,8 +203,13 @@ class Histogram:
                     "x_max": float(data[histo_type]["rng"][-1]),
                     "y_min": float(data[histo_type]["abs"].min()),
                     "y_max": float(data[histo_type]["abs"].max()),
-                    "dig": Histogram._get_digs_as_dict_array(data[histo_type]["dig"]),
+                    "dig": Histogram._get_digs_as_dict_array(
+                        data[histo_type]["dig"], data[histo_type].get("pos")
+                    ),
                 }
+                if "qs" in data[histo_type]:
+                    for key in ["qs", "npoints"]:
+                        result[metric][histo_type][key] = data[histo_type][key]
                 if (
                     "rel" in data[histo_type].keys()
                     and data[histo_type]["rel"] is not None
@@ -154,17 +225,98 @@ class Histogram:
                     ].max()
 
                 result[metric]["d"] = data["d"].tolist()
+                if "dpos" in data:
+                    result[metric]["dpos"] = data["dpos"].tolist()
 
         return result
 
-    def _get_digs_as_dict_array(arr):
-        ret = {}
-        for x in zip(iter(arr), range(0, len(arr))):
-            bin_idx = int(x[0]) - 1
-            if bin_idx not in ret:
-                ret[bin_idx] = []
+    def _get_digs_as_dict_array(arr, pos=None):
+        """
+        Positions of the values in each bin.
 
-            ret[bin_idx].append(int(x[1]))
+        :param arr: (np.array) digitized values (see np.digitize)
+        :param pos: (np.array) positions of the sampled values (i.e., sketch
+        mode), default is all the values
+        :return: (dict) bin -> positions, the bins in the order of their first
+        value
+        """
+        arr = np.asarray(arr).astype(np.int64) - 1
+        if pos is None:
+            pos = np.arange(arr.shape[0])
+        else:
+            pos = np.asarray(pos)
+            arr = arr[pos]
+
+        keys, first, counts = np.unique(arr, return_index=True, return_counts=True)
+        groups = np.split(pos[np.argsort(arr, kind="stable")], np.cumsum(counts)[:-1])
+        return {int(keys[i]): groups[i].tolist() for i in np.argsort(first)}
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def batch(sg, ntype, nids, bins=20):
+        """
+        Rank histograms of several nodes in one pass over the auxiliary
+        dictionary of the SuperGraph, i.e., for each node, the same result as
+        Histogram(sg, name=name, ntype=ntype, histo_types=["rank"],
+        bins=bins).unpack().
+
+        :param sg: (CallFlow.SuperGraph) SuperGraph
+        :param ntype: (str) type of the nodes (i.e., callsite or module)
+        :param nids: (list) node indexes
+        :param bins: (int) Number of bins in the histograms
+        :return: (dict) node index -> histograms, {} for the nodes that are
+        not in the dataframe
+        """
+        assert isinstance(sg, callflow.SuperGraph)
+        assert ntype in ["callsite", "module"]
+        assert bins > 0
+
+        if ntype == "callsite":
+            aux_dict = sg.callsite_aux_dict
+        elif ntype == "module":
+            aux_dict = sg.module_aux_dict
+
+        ret = {_: {} for _ in nids}
+        nids = [_ for _ in ret if _ in aux_dict]
+        if len(nids) == 0:
+            return ret
+
+        offsets, rows = aux_dict.take(nids)
+        starts = offsets[:-1]
+        seg = np.repeat(np.arange(len(nids)), np.diff(offsets))
+
+        # the slices are sorted by rank, i.e., the per-rank data of the node.
+        hists = {}
+        time_columns = [sg.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
+        for tk, tv in zip(TIME_COLUMNS, time_columns):
+            values = aux_dict.df[tv].to_numpy(dtype=np.float64)[rows]
+            _min = np.minimum.reduceat(values, starts)
+            _max = np.maximum.reduceat(values, starts)
+            edges, idx = NodeStats.segment_bins(values, seg, _min, _max, bins)
+
+            counts = np.bincount(seg * bins + idx, minlength=len(nids) * bins)
+            centers = 0.5 * (edges[:, 1:] + edges[:, :-1])
+            # np.digitize(values, edges), i.e., the max is past the last bin
+            dig = idx + 1 + (values >= edges[seg, bins])
+            hists[tk] = (values, centers, counts.reshape(-1, bins), dig)
+
+        for i, nid in enumerate(nids):
+            _slice = slice(offsets[i], offsets[i + 1])
+            ret[nid] = {}
+            for tk in TIME_COLUMNS:
+                values, centers, counts, dig = hists[tk]
+                ret[nid][tk] = {
+                    "rank": {
+                        "x": centers[i].tolist(),
+                        "y": counts[i].tolist(),
+                        "x_min": float(centers[i][0]),
+                        "x_max": float(centers[i][-1]),
+                        "y_min": float(counts[i].min()),
+                        "y_max": float(counts[i].max()),
+                        "dig": Histogram._get_digs_as_dict_array(dig[_slice]),
+                    },
+                    "d": values[_slice].tolist(),
+                }
         return ret
 
     # --------------------------------------------------------------------------
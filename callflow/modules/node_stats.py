@@ -0,0 +1,375 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+
+"""
+CallFlow's module to precompute the summary statistics of the nodes.
+"""
+import numpy as np
+import pandas as pd
+
+import callflow
+from callflow.utils.df import df_group_slices
+from callflow.datastructures.metrics import METRIC_PROXIES, TIME_COLUMNS
+
+LOGGER = callflow.get_logger(__name__)
+
+
+# ------------------------------------------------------------------------------
+class NodeStats:
+    """
+    Summary statistics table with a row per (ntype, nid, metric, dataset).
+
+    The statistics are computed over the per-rank runtimes of a node (i.e.,
+    the SuperGraph's aux dictionaries) at process time, so that the requests
+    (boxplots, histograms, gradients and the sankey nodes) need not
+    recompute them from the dataframe.
+    """
+
+    QUANTILES = [0.0, 25.0, 50.0, 75.0, 100.0]
+    HIST_BINS = [10, 20, 50]
+
+    # quantile sketch of the distributions (returned by the sketch mode of the
+    # modules instead of the per-rank values).
+    SKETCH_QUANTILES = np.linspace(0.0, 100.0, 21).tolist()
+    KEYS = ["ntype", "nid", "metric", "dataset"]
+
+    def __init__(self, table):
+        """
+        Constructor to the statistics table.
+
+        :param table: (pd.DataFrame) table computed by NodeStats.from_supergraph
+        """
+        assert isinstance(table, pd.DataFrame)
+        assert all(_ in table.columns for _ in NodeStats.KEYS)
+
+        self.table = table
+        self.columns = {_: table[_].to_numpy() for _ in table.columns}
+        self._pos = {
+            k: i for i, k in enumerate(zip(*[self.columns[_] for _ in NodeStats.KEYS]))
+        }
+
+    def __len__(self):
+        return len(self._pos)
+
+    def has(self, nid, ntype, metric, dataset):
+        return (ntype, nid, metric, dataset) in self._pos
+
+    def lookup(self, nid, ntype, metric, dataset):
+        """
+        Statistics of a node.
+
+        :param nid: (int) callsite or module index
+        :param ntype: (str) node type (e.g., callsite, module)
+        :param metric: (str) metric column (e.g., time, time (inc))
+        :param dataset: (str) dataset name
+        :return: (dict) statistics, None if the node is not present.
+        """
+        i = self._pos.get((ntype, nid, metric, dataset))
+        if i is None:
+            return None
+        return {k: v[i] for k, v in self.columns.items()}
+
+    def histogram(self, nid, ntype, metric, dataset, bins):
+        """
+        Histogram of a node over its own range, equivalent to
+        callflow.utils.utils.histogram(data, bins=bins).
+
+        :return: (np.array, np.array, np.array) bin edges, centers and
+        counts, None if the number of bins was not precomputed.
+        """
+        stats = self.lookup(nid, ntype, metric, dataset)
+        if stats is None or bins not in NodeStats.HIST_BINS:
+            return None
+
+        first, last = NodeStats._hist_range(stats["q0"], stats["q100"])
+        edges = np.linspace(first, last, bins + 1)
+        return edges, 0.5 * (edges[1:] + edges[:-1]), stats[f"hist_{bins}"]
+
+    @staticmethod
+    def sketch(data, stats=None):
+        """
+        Quantile sketch of a distribution, read from the statistics of the
+        node if available (i.e., the tables computed before the sketch do
+        not have it).
+
+        :param data: (np.array) values
+        :param stats: (dict) statistics of the node (see NodeStats.lookup)
+        :return: (dict) {"q": quantiles, "v": values}
+        """
+        columns = [f"sketch_{int(_)}" for _ in NodeStats.SKETCH_QUANTILES]
+        if stats is not None and all(_ in stats for _ in columns):
+            values = np.array([stats[_] for _ in columns], dtype=np.float64)
+        elif len(data) > 0:
+            values = np.percentile(data, NodeStats.SKETCH_QUANTILES)
+        else:
+            values = np.array([])
+        return {"q": NodeStats.SKETCH_QUANTILES, "v": values.tolist()}
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def from_supergraph(sg):
+        """
+        Compute the statistics table for a SuperGraph.
+
+        :param sg: (callflow.SuperGraph) SuperGraph
+        :return: (NodeStats)
+        """
+        return NodeStats.from_dataframe(sg.dataframe, sg.name)
+
+    @staticmethod
+    def from_dataframe(df, name, overall=True, per_dataset=None):
+        """
+        Compute the statistics table for the dataframe of a SuperGraph.
+
+        :param df: (pd.DataFrame) dataframe of the SuperGraph
+        :param name: (str) name of the SuperGraph
+        :param overall: (bool) compute the rows of the SuperGraph (i.e., the
+        dataset column is name)
+        :param per_dataset: (bool) compute the rows of each dataset of an
+        ensemble, default is True for an ensemble.
+        :return: (NodeStats)
+        """
+        LOGGER.debug(f"[{name}] Computing the node statistics")
+        is_ensemble = name == "ensemble" and "dataset" in df.columns
+        if per_dataset is None:
+            per_dataset = is_ensemble
+        assert is_ensemble or not per_dataset
+
+        # the proxies are not yet set for an EnsembleGraph created by Unify.
+        _proxy = lambda c: next(p for p in METRIC_PROXIES[c] if p in df.columns)
+        time_columns = [_ if _ in df.columns else _proxy(_) for _ in TIME_COLUMNS]
+
+        groups = []
+        if overall:
+            groups.append((["rank"], name))
+        if per_dataset:
+            groups.append((["dataset", "rank"], None))
+
+        tables = []
+        for ntype, column in [("callsite", "name"), ("module", "module")]:
+            rows_mean = df.groupby(column)[time_columns].mean()
+
+            for group_by, dataset in groups:
+                slices = df_group_slices(
+                    df, column, cols=time_columns, group_by=group_by
+                )
+                for metric in time_columns:
+                    _t = NodeStats._from_slices(slices, metric, dataset)
+                    _t["rows_mean"] = np.where(
+                        _t["dataset"] == name,
+                        rows_mean[metric].reindex(_t["nid"]).to_numpy(),
+                        np.nan,
+                    )
+                    _t.insert(0, "ntype", ntype)
+                    tables.append(_t)
+
+        table = pd.concat(tables, ignore_index=True)
+        LOGGER.info(f"[{name}] Computed the node statistics ({len(table)} rows)")
+        return NodeStats(table)
+
+    def append(self, df, df_new, name):
+        """
+        Statistics of an ensemble after appending datasets: the rows of the
+        new datasets are computed from their rows only, and the rows of the
+        ensemble are recomputed.
+
+        :param df: (pd.DataFrame) ensemble's dataframe including the new rows
+        (only the name, module, rank, dataset and time columns are needed)
+        :param df_new: (pd.DataFrame) rows of the new datasets
+        :param name: (str) name of the ensemble
+        :return: (NodeStats)
+        """
+        datasets = df_new["dataset"].unique().tolist()
+        kept = ~self.table["dataset"].isin(datasets + [name])
+
+        table = pd.concat(
+            [
+                self.table[kept],
+                NodeStats.from_dataframe(df_new, name, overall=False).table,
+                NodeStats.from_dataframe(df, name, per_dataset=False).table,
+            ],
+            ignore_index=True,
+        )
+        return NodeStats(table)
+
+    @staticmethod
+    def _from_slices(slices, metric, dataset=None):
+        """
+        Compute the statistics of each group in a DFGroupSlices.
+
+        :param slices: (DFGroupSlices) per-rank runtimes of the nodes
+        :param metric: (str) metric column
+        :param dataset: (str) dataset name of all groups, if None, the groups
+        are further split by the "dataset" column.
+        :return: (pd.DataFrame)
+        """
+        df = slices.df
+        keys = np.array(list(slices), dtype=np.int64)
+        nrows = np.diff(slices.offsets)
+        nids = np.repeat(keys, nrows)
+
+        # split the groups by datasets (rows are sorted by dataset within
+        # each group).
+        if dataset is None:
+            codes, datasets = pd.factorize(df["dataset"], sort=True)
+            datasets = np.asarray(datasets, dtype=object)
+        else:
+            codes, datasets = np.zeros(len(df), dtype=np.int64), np.array([dataset])
+
+        is_start = np.ones(len(df), dtype=bool)
+        is_start[1:] = (nids[1:] != nids[:-1]) | (codes[1:] != codes[:-1])
+        starts = np.flatnonzero(is_start)
+        offsets = np.append(starts, len(df))
+
+        values = df[metric].to_numpy(dtype=np.float64)
+        if "rank" in df.columns:
+            ranks = df["rank"].to_numpy()
+        else:
+            ranks = np.zeros(len(df), dtype=np.int64)
+
+        ret = NodeStats.segment_stats(values, offsets, ranks)
+        ret = pd.DataFrame(ret)
+        ret.insert(0, "nid", nids[starts])
+        ret.insert(1, "metric", metric)
+        ret.insert(2, "dataset", datasets[codes[starts]])
+        return ret
+
+    @staticmethod
+    def segment_stats(values, offsets, ranks):
+        """
+        Vectorized statistics of contiguous segments of an array. The
+        results match np.percentile, np.mean, np.var, scipy.stats.skew,
+        scipy.stats.kurtosis and np.histogram computed on each segment.
+
+        :param values: (np.array) values
+        :param offsets: (np.array) segment offsets (nsegments + 1)
+        :param ranks: (np.array) rank of each value
+        :return: (dict) column -> np.array of nsegments
+        """
+        n = np.diff(offsets)
+        starts, ends = offsets[:-1], offsets[1:] - 1
+        seg = np.repeat(np.arange(n.shape[0]), n)
+
+        order = np.lexsort((values, seg))
+        sorted_values = values[order]
+
+        # the quantiles are a subset of the sketch quantiles.
+        quantiles = NodeStats._segment_quantiles(
+            sorted_values,
+            starts,
+            ends,
+            n,
+            sorted(set(NodeStats.QUANTILES) | set(NodeStats.SKETCH_QUANTILES)),
+        )
+        ret = {"count": n}
+        for q in NodeStats.QUANTILES:
+            ret[f"q{int(q)}"] = quantiles[q]
+        _min, _max = ret["q0"], ret["q100"]
+
+        for q in NodeStats.SKETCH_QUANTILES:
+            ret[f"sketch_{int(q)}"] = quantiles[q]
+
+        mean = np.add.reduceat(values, starts) / n
+        dev = values - mean[seg]
+        m2 = np.add.reduceat(dev ** 2, starts) / n
+        m3 = np.add.reduceat(dev ** 3, starts) / n
+        m4 = np.add.reduceat(dev ** 4, starts) / n
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            is_const = m2 <= (np.finfo(np.float64).resolution * mean) ** 2
+            ret["mean"] = mean
+            ret["var"] = m2
+            ret["skew"] = np.where(is_const, np.nan, m3 / m2 ** 1.5)
+            ret["kurt"] = np.where(is_const, np.nan, m4 / m2 ** 2 - 3.0)
+            ret["imb"] = np.where(
+                np.isclose(mean, 0.0), _max, (_max - mean) / np.where(mean, mean, 1)
+            )
+
+        # first occurrence of the min and the max (as np.argmin, np.argmax)
+        ret["rank_min"] = ranks[order][starts]
+        ret["rank_max"] = ranks[np.lexsort((-values, seg))][starts]
+
+        for bins in NodeStats.HIST_BINS:
+            ret[f"hist_{bins}"] = list(
+                NodeStats._segment_histogram(values, seg, _min, _max, bins)
+            )
+        return ret
+
+    @staticmethod
+    def _segment_quantiles(sorted_values, starts, ends, n, qs):
+        """
+        Percentiles of each segment of a segment-wise sorted array (as
+        np.percentile with the linear interpolation).
+
+        :param sorted_values: (np.array) values, sorted within each segment
+        :param starts: (np.array) first position of each segment
+        :param ends: (np.array) last position of each segment
+        :param n: (np.array) length of each segment
+        :param qs: (list) percentiles in [0, 100]
+        :return: (dict) percentile -> np.array of nsegments
+        """
+        ret = {}
+        for q in qs:
+            pos = starts + (q / 100.0) * (n - 1)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.minimum(lo + 1, ends)
+            ret[q] = NodeStats._lerp(sorted_values[lo], sorted_values[hi], pos - lo)
+        return ret
+
+    @staticmethod
+    def _lerp(a, b, t):
+        # same as numpy's interpolation of percentiles
+        diff = b - a
+        return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+    @staticmethod
+    def _hist_range(first, last):
+        # same as np.histogram for an empty range
+        if first == last:
+            return first - 0.5, last + 0.5
+        return first, last
+
+    @staticmethod
+    def _segment_histogram(values, seg, _min, _max, bins):
+        """
+        Histogram counts of each segment over its [min, max] range, with the
+        bin edge rules of np.histogram.
+        """
+        _, idx = NodeStats.segment_bins(values, seg, _min, _max, bins)
+        counts = np.bincount(seg * bins + idx, minlength=_min.shape[0] * bins)
+        return counts.reshape(-1, bins)
+
+    @staticmethod
+    def segment_bins(values, seg, _min, _max, bins):
+        """
+        Histogram bin of each value over the [min, max] range of its segment,
+        with the bin edge rules of np.histogram.
+
+        :param values: (np.array) values
+        :param seg: (np.array) segment of each value
+        :param _min: (np.array) min of each segment
+        :param _max: (np.array) max of each segment
+        :param bins: (int) number of bins
+        :return: (np.array, np.array) bin edges of each segment (nsegments x
+        bins + 1) and the bin of each value
+        """
+        is_empty = _min == _max
+        first = np.where(is_empty, _min - 0.5, _min)
+        last = np.where(is_empty, _max + 0.5, _max)
+        edges = np.linspace(first, last, bins + 1, axis=1)
+
+        _first, _last = first[seg], last[seg]
+        idx = (((values - _first) * bins) / (_last - _first)).astype(np.int64)
+        idx[idx == bins] -= 1
+
+        decrement = values < edges[seg, idx]
+        idx[decrement] -= 1
+        increment = (values >= edges[seg, idx + 1]) & (idx != bins - 1)
+        idx[increment] += 1
+        return edges, idx
+
+
+# ------------------------------------------------------------------------------
@@ -12,7 +12,9 @@ import pandas as pd
 import numpy as np
 
 import callflow
+from callflow.utils.utils import sample_points
 from callflow.datastructures.metrics import TIME_COLUMNS
+from callflow.modules.node_stats import NodeStats
 
 LOGGER = callflow.get_logger()
 
@@ -22,7 +24,9 @@ class Scatterplot:
     Scatterplot plotting Inclusive vs Exclusive runtime.
     """
 
-    def __init__(self, sg, rel_sg=None, name="", ntype="", orientation=[]):
+    def __init__(
+        self, sg, rel_sg=None, name="", ntype="", orientation=[], max_points=0
+    ):
         """
         Calculate Scatterplot for the callsite/module dataframe.
 
@@ -31,6 +35,9 @@ class Scatterplot:
         :param name: (str) Node's name
         :param ntype: (str) Node's type (e.g., module or callsite)
         :param orientation: (list(str, str)) Orientation of data (e.g., time vs time (inc))
+        :param max_points: (int) Maximum number of points returned (i.e.,
+        sketch mode: the outliers, extrema and a sample of the ranks, and the
+        quantile sketches of the distributions), 0 returns all the points
         """
         assert isinstance(sg, callflow.SuperGraph)
         assert ntype in ["callsite", "module"]
@@ -38,6 +45,7 @@ class Scatterplot:
             assert isinstance(rel_sg, callflow.SuperGraph)
         assert isinstance(orientation, list)
         assert all([o in TIME_COLUMNS for o in orientation])
+        assert isinstance(max_points, int)
 
         self.time_columns = [sg.proxy_columns.get(_, _) for _ in TIME_COLUMNS]
         SCAT_TYPES = ["tgt"]
@@ -46,15 +54,18 @@ class Scatterplot:
         self.result = {_: {} for _ in SCAT_TYPES}
         self.orientation = [sg.proxy_columns.get(_, _) for _ in orientation]
         self.node_type = ntype
+        self.max_points = max_points
 
         df = sg.get_aux_df(name, ntype)
-        self.result["tgt"] = self.compute(df)
+        self.result["tgt"] = self.compute(df, sg, sg.get_idx(name, ntype))
 
         if rel_sg is not None:
             rel_df = rel_sg.get_aux_df(name, ntype)
-            self.result["bkg"] = self.compute(rel_df)
+            self.result["bkg"] = self.compute(
+                rel_df, rel_sg, rel_sg.get_idx(name, ntype)
+            )
 
-    def compute(self, df):
+    def compute(self, df, sg, idx):
         assert isinstance(df, pd.DataFrame)
 
         ret = {_: {} for _ in TIME_COLUMNS}
@@ -63,22 +74,38 @@ class Scatterplot:
             if self.node_type == "callsite":
                 _data = df[tv].to_numpy()
             elif self.node_type == "module":
-                _data = df.groupby(["rank"])[tv].mean().to_numpy()
+                _grouped = df.groupby(["rank"])[tv].mean()
+                _data = _grouped.to_numpy()
 
-            _min, _mean, _max = _data.min(), _data.mean(), _data.max()
+            stats = sg.get_node_stats(idx, self.node_type, tv)
+            if stats is not None:
+                _min, _mean, _max = stats["q0"], stats["mean"], stats["q100"]
+            else:
+                _min, _mean, _max = _data.min(), _data.mean(), _data.max()
 
             if "rank" in df.columns:
                 _ranks = df["rank"].to_numpy()
             else:
                 _ranks = np.array([])
 
+            # rank of each value of _data
+            if self.node_type == "module":
+                _dranks = _grouped.index.to_numpy()
+            elif _ranks.shape[0] == _data.shape[0]:
+                _dranks = _ranks
+            else:
+                _dranks = np.arange(_data.shape[0])
+
             ret[tv] = {
                 "d": _data,
                 "ranks": _ranks,
+                "dranks": _dranks,
                 "min": _min,
                 "max": _max,
                 "mean": _mean,
             }
+            if self.max_points > 0:
+                ret[tv]["qs"] = NodeStats.sketch(_data, stats)
 
         return ret
 
@@ -103,4 +130,15 @@ class Scatterplot:
                 "yMax": y["max"],
                 "orientation": self.orientation,
             }
+
+            if self.max_points > 0:
+                pos = sample_points(
+                    np.stack([x["d"], y["d"]], axis=1), x["dranks"], self.max_points
+                )
+                ret[scat_type]["x"] = x["d"][pos].tolist()
+                ret[scat_type]["y"] = y["d"][pos].tolist()
+                ret[scat_type]["ranks"] = x["dranks"][pos].tolist()
+                ret[scat_type]["xqs"] = x["qs"]
+                ret[scat_type]["yqs"] = y["qs"]
+                ret[scat_type]["npoints"] = x["d"].shape[0]
         return ret
@@ -8,10 +8,10 @@ CallFlow's operation API.
 """
 from .filter import Filter
 from .group import Group
-from .unify import Unify
+from .unify import Unify, UnifyAppend
 from .config import Config
 from .regex_module_matcher import RegexModuleMatcher
 
-__all__ = ["Filter", "Group", "Unify", "Config", "RegexModuleMatcher"]
+__all__ = ["Filter", "Group", "Unify", "UnifyAppend", "Config", "RegexModuleMatcher"]
 
 # ------------------------------------------------------------------------------
@@ -24,9 +24,22 @@ JSONSCHEMA_CONFIG = {
         "filter_by": {"type": "string"},
         "group_by": {"type": "string"},
         "module_callsite_map": {"type": "object"},
+        "module_match_policy": {"type": "string"},
+        "module_map_cache": {"type": "string"},
         "chunk_idx": {"type": "integer"},
         "chunk_size": {"type": "integer"},
         "ensemble_process": {"type": "boolean"},
+        "eager_load": {"type": "boolean"},
+        "load_budget_runs": {"type": "integer"},
+        "load_budget_bytes": {"type": "integer"},
+        "response_cache_bytes": {"type": "integer"},
+        "response_cache_disk": {"type": "boolean"},
+        "response_cache_disk_bytes": {"type": "integer"},
+        "process_workers": {"type": "integer"},
+        "process_memory_limit": {"type": "integer"},
+        "ensemble_incremental": {"type": "boolean"},
+        "ingest_cache": {"type": "boolean"},
+        "cali_query_workers": {"type": "integer"},
         "experiment": {"type": "string"},
     },
 }
@@ -45,6 +58,8 @@ class Config:
         'filter_perc': (float),
         'filter_by': (str),
         'group_by': (str),
+        'module_match_policy': (str),
+        'module_map_cache': (str),
         'read_parameter': (bool),
         'save_path': (str),
         'verbose': (bool),
@@ -54,7 +69,18 @@ class Config:
         'end_date': (timestamp),
         'chunk_idx': (int),
         'chunk_size': (int),
-        'ensemble_process': (bool)
+        'ensemble_process': (bool),
+        'eager_load': (bool),
+        'load_budget_runs': (int),
+        'load_budget_bytes': (int),
+        'response_cache_bytes': (int),
+        'response_cache_disk': (bool),
+        'response_cache_disk_bytes': (int),
+        'process_workers': (int),
+        'process_memory_limit': (int),
+        'ensemble_incremental': (bool),
+        'ingest_cache': (bool),
+        'cali_query_workers': (int)
     }
      1. Determine the read_mode from the arguments passed.
      2. Generate the config object containing the dataset information based on
@@ -218,8 +244,24 @@ class Config:
         """
         Wrapper function to ensure the scheme properties match their assigned type.
         """
-        bools = ["ensemble_process"]
-        ints = ["chunk_idx", "chunk_size"]
+        bools = [
+            "ensemble_process",
+            "eager_load",
+            "response_cache_disk",
+            "ensemble_incremental",
+            "ingest_cache",
+        ]
+        ints = [
+            "chunk_idx",
+            "chunk_size",
+            "load_budget_runs",
+            "load_budget_bytes",
+            "response_cache_bytes",
+            "response_cache_disk_bytes",
+            "process_workers",
+            "process_memory_limit",
+            "cali_query_workers",
+        ]
         floats = ["filter_perc"]
 
         if key in bools:
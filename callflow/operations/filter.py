@@ -7,9 +7,8 @@
 """
 CallFlow's operation to filter a super graph using runtime threshold's.
 """
-from ast import literal_eval as make_list
 import numpy as np
-import networkx as nx
+import pandas as pd
 
 import callflow
 from callflow.utils.df import df_info
@@ -54,22 +53,23 @@ class Filter:
             self.sg.roots, "time (inc)"
         )
 
-        # Formulate the hatchet query.
-        query = [
-            (
-                "*",
-                {
-                    f"{self.sg.df_get_proxy(filter_by)}": f"> {filter_perc * 0.01 * self.mean_root_inctime}"
-                },
-            )
-        ]
-
-        LOGGER.info(f"Filtering GraphFrame by Hatchet Query :{query}")
-        LOGGER.debug(f"Number of callsites before QueryMatcher: {len(self.callsites)}")
-
-        self.callsites = self.sg.hatchet_filter_callsites_by_query(query)
-
-        LOGGER.debug(f"Number of callsites after QueryMatcher: {len(self.callsites)}")
+        # Filter the callsites by the mean runtime of their nodes (i.e., the
+        # hatchet query [("*", {filter_by: "> threshold"})]).
+        threshold = filter_perc * 0.01 * self.mean_root_inctime
+        LOGGER.info(f'Filtering callsites by mean "{filter_by}" > {threshold}')
+        LOGGER.debug(f"Number of callsites before filtering: {len(self.callsites)}")
+
+        # The node and rank indexes are kept as columns of the filtered
+        # dataframe.
+        if "node" not in self.sg.dataframe.columns:
+            self.sg.df_reset_index()
+        max_means = {
+            mode: self.sg.df_callsite_max_node_mean(mode) for mode in Filter.VALID_MODES
+        }
+        _max = max_means[filter_by]
+        self.callsites = _max.index[_max > threshold].to_numpy()
+
+        LOGGER.debug(f"Number of callsites after filtering: {len(self.callsites)}")
         LOGGER.info(
             f"Removed {len(self.sg.callsites_idx) - len(self.callsites)} callsites."
         )
@@ -77,22 +77,43 @@ class Filter:
         self.compute()
         LOGGER.info(f'Filtered graph: "{nxg_info(self.nxg)}"')
         self.sg.nxg = self.nxg
+        self.sg.filter_thresholds = Filter.thresholds(
+            max_means, self.mean_root_inctime, self.callsites
+        )
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def thresholds(max_means, mean_root_inctime, callsites):
+        """
+        Largest filter percentage at which each call site is retained, for
+        each filter mode. The SuperGraph can then be filtered at any
+        percentage on request (see SuperGraph.filter_callsites).
+
+        :param max_means: (dict) mode -> pd.Series of the maximum node mean of
+        each call site (see SuperGraph.df_callsite_max_node_mean)
+        :param mean_root_inctime: (float) mean runtime of the root
+        :param callsites: (np.array) retained callsite indexes
+        :return: (pd.DataFrame) name, time and time (inc) columns
+        """
+        ret = {"name": np.asarray(callsites, dtype=np.int64)}
+        for mode, max_mean in max_means.items():
+            _max = max_mean.reindex(callsites).to_numpy(dtype=np.float64)
+            # retained at any percentage if the root's runtime is 0
+            if mean_root_inctime > 0:
+                ret[mode] = 100.0 * _max / mean_root_inctime
+            else:
+                ret[mode] = np.where(_max > 0, np.inf, 0.0)
+        return pd.DataFrame(ret)
 
     # --------------------------------------------------------------------------
     def compute(self):
         """
         Filter the SuperGraph based on {filter_by} attribute and {filter_perc} percentage.
         """
-        # compute the min/max
-        min_vals = {}
-        max_vals = {}
-        for mode in Filter.VALID_MODES:
-            _mn, _mx = self.sg.df_minmax(mode)
-            min_vals[mode] = np.array([_mn])
-            max_vals[mode] = np.array([_mx])
-            LOGGER.debug(f"{mode}:  min = {_mn}, max = {_mx}")
-
-        value = self.filter_perc * 0.01 * np.max(max_vals[self.filter_by])
+        _mn, _mx = self.sg.df_minmax(self.filter_by)
+        LOGGER.debug(f"{self.filter_by}:  min = {_mn}, max = {_mx}")
+
+        value = self.filter_perc * 0.01 * _mx
         self._filter_sg(self.filter_by, value)
 
     # --------------------------------------------------------------------------
@@ -110,29 +131,10 @@ class Filter:
             self.sg.dataframe = self.sg.dataframe[
                 self.sg.dataframe["name"].isin(self.callsites)
             ]
+            self.sg.paths = self.sg.paths.subset(self.callsites)
         LOGGER.info(f'Filtered dataframe: "{df_info(self.sg.dataframe)}"')
 
-        nxg = nx.DiGraph()
-
-        if filter_by == "time (inc)":
-            for edge in self.sg.nxg.edges():
-                edge0_idx = self.sg.get_idx(edge[0], "callsite")
-                edge1_idx = self.sg.get_idx(edge[1], "callsite")
-                # If source is present in the callsites list
-                if (edge0_idx in self.callsites) and (edge1_idx in self.callsites):
-                    nxg.add_edge(edge[0], edge[1])
-                # else:
-                #    LOGGER.debug(f"Removing the edge: {edge}")
-
-        elif filter_by == "time":
-            for callsite in self.callsites:
-                path = self.sg.df_lookup_with_column("name", callsite)["path"].tolist()[
-                    0
-                ]
-                path = make_list(path)
-                nxg.add_path(path)
-
-        self.nxg = nxg
+        self.nxg = self.sg.nxg_filter(self.callsites, filter_by)
 
 
 # ------------------------------------------------------------------------------
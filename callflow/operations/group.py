@@ -47,7 +47,7 @@ class Group:
     # --------------------------------------------------------------------------
     def compute(self):
         """
-        In-place Group by operation. Appends the following columns to the SuperGraph.dataframe.
+        In-place Group by operation. Appends the following columns to the SuperGraph.paths.
 
         Columns appended: group_path, component_path, component_level, entry_functions
 
@@ -65,144 +65,84 @@ class Group:
             f"Nodes: {len(self.sg.nxg.nodes())}, Edges: {len(self.sg.nxg.edges())}"
         )
 
-        group_path = {}
-        component_path = {}
-
-        # construct group and component paths
-        def _construct_paths(path, debug=False):
-
-            # LOGGER.warning(f' >>> parsing [{path}]')
-            # cs_path = self.sg.callsites[path]
-            # print('path callsites =', type(cs_path), len(cs_path), cs_path)
-
-            if debug:
-                for _ in path:
-                    # _m = self.sg.new_callsite2module[_]
-                    _m = self.sg.callsite_module_map[_]
-                    print(
-                        "\t:",
-                        _,
-                        "::",
-                        self.sg.get_name(_, "callsite"),
-                        "--",
-                        _m,
-                        "::",
-                        self.sg.get_name(_m, "module"),
-                    )
-
-            # extract the modules in the path
-            # mod_path = np.array([self.sg.new_callsite2module[_] for _ in path])
-            mod_path = np.array([self.sg.callsite2module[_] for _ in path])
-
-            if debug:
-                print("path modules =", type(mod_path), mod_path.shape, mod_path)
-
-            # callsite-to-module map stores a vector and that is a problem
-            if debug:
-                if any([len(_) > 1 for _ in mod_path]):
-                    LOGGER.warning("need to fix this problem")
-
-            # TODO: seeing some empty list here for "loops"
-            if debug:
-                mod_path = np.array([_[0] if len(_) > 0 else None for _ in mod_path])
-                print("path modules:", type(mod_path), mod_path.shape, mod_path)
-
-            # root
-            if len(path) == 1:
-                return mod_path, path
-
-            # if there is an unknown module (= -1), get rid of that
-            if True:
-                mod_path = mod_path[np.where(mod_path != -1)[0]]
-
-            # remove all entries where the module is repeated
-            mods_diff = [True] + [
-                mod_path[i] != mod_path[i - 1] for i in range(1, len(mod_path))
-            ]
-            mods_diff = np.where(np.array(mods_diff, dtype=bool))[0]
-
-            # the resulting list will be the group path
-            gpath = mod_path[mods_diff]
-
-            # from the right, figure out how many times the same module appears
-            mods_diff = mod_path != mod_path[-1]
-
-            # last element in the path must be true
-            assert not mods_diff[-1]
-
-            # the last module that is different
-            mods_diff = np.where(mods_diff)[0]
-            last_diff_mod = mods_diff[-1] if len(mods_diff) > 0 else -1
-
-            # the last set of the same modules will form the component path
-            cpath = path[last_diff_mod + 1 :]
-
-            # ------------------------------------------------------------------
-            if debug:
-                snode = path[-1]
-                print("--> snode", snode, "::", self.sg.get_name(snode, "callsite"))
-                print("--> path")
-                for _ in path:
-                    _m = self.sg.callsite_module_map[_]
-                    print(
-                        "\t:",
-                        _,
-                        "::",
-                        self.sg.get_name(_, "callsite"),
-                        "--",
-                        _m,
-                        "::",
-                        self.sg.get_name(_m, "module"),
-                    )
-                print("--> gpath")
-                for _ in gpath:
-                    print("\t:", _, "::", self.sg.get_name(_, "module"))
-                print("--> cpath")
-                for _ in cpath:
-                    print("\t:", _, "::", self.sg.get_name(_, "callsite"))
-
-            # ------------------------------------------------------------------
-            return gpath, cpath
-
-        # ----------------------------------------------------------------------
-        for idx, edge in enumerate(self.sg.nxg.edges()):
-
-            snode = self.sg.get_idx(edge[0], "callsite")
-            tnode = self.sg.get_idx(edge[1], "callsite")
-
-            assert snode in self.sg.paths
-            assert tnode in self.sg.paths
-
-            # should remove this condition. this should always be true?
-            # TODO: adding this here ensures that the source and target nodes are present in the map. Might have to reconsider if this needs to be here.
-            # TODO: Some of the nodes have no inverse mappings (i.e., inv_callsite and inv_modules) so we filter them out here.
-            if (
-                snode in self.sg.paths
-                and tnode in self.sg.paths
-                and snode is not None
-                and tnode is not None
-            ):
-                spath = self.sg.paths[snode]
-                tpath = self.sg.paths[tnode]
-
-                group_path[snode], component_path[snode] = _construct_paths(spath)
-                # --------------------------------------------------------------
-                # no need to reprocess if this has already been added
-                if tnode in group_path:
-                    continue
-
-                group_path[tnode], component_path[tnode] = _construct_paths(tpath)
-
-        # update the dataframe
-        self.sg.df_add_column(
-            "group_path", apply_dict=group_path, dict_default="", apply_on="name"
+        # the paths of the callsites in the nxg (i.e., the endpoints of its
+        # edges) are grouped all at once.
+        callsites = set()
+        for edge in self.sg.nxg.edges():
+            callsites.add(self.sg.get_idx(edge[0], "callsite"))
+            callsites.add(self.sg.get_idx(edge[1], "callsite"))
+        assert all(_ in self.sg.paths for _ in callsites)
+
+        paths = self.sg.paths.subset(callsites)
+        offsets, path = paths.columns["path"]
+
+        # callsite -> module lookup (-1 for the unknown modules).
+        cs2m = {k: v for k, v in self.sg.callsite2module.items() if k >= 0}
+        lut = np.full(max(list(cs2m.keys()) + [-1]) + 2, -1, dtype=np.int64)
+        lut[list(cs2m.keys())] = list(cs2m.values())
+
+        gp_offsets, gp_values, cp_offsets, cp_values = Group._construct_paths(
+            offsets, path, np.take(lut, path)
         )
-        self.sg.df_add_column(
-            "component_path",
-            apply_dict=component_path,
-            dict_default="",
-            apply_on="name",
+
+        # update the path table
+        self.sg.paths.add_csr_column("group_path", paths.keys, gp_offsets, gp_values)
+        self.sg.paths.add_csr_column(
+            "component_path", paths.keys, cp_offsets, cp_values
         )
 
+    @staticmethod
+    def _construct_paths(offsets, path, mod_path):
+        """
+        Construct the group and component paths of a batch of call paths.
+
+        For each path, the unknown modules (= -1) are removed from its
+        modules (except for the root, i.e., a path of length 1); the group
+        path is the modules without repetitions, and the component path is
+        the trailing callsites of the last module. As before, the component
+        path starts after the position (among the known modules) of the last
+        module that differs from the last one.
+
+        :param offsets: (np.array) offsets of the paths (npaths + 1)
+        :param path: (np.array) flat callsites of the paths
+        :param mod_path: (np.array) module of each callsite in path
+        :return: (np.array, np.array, np.array, np.array) offsets and values
+        of the group paths, and offsets and values of the component paths.
+        """
+        npaths = offsets.shape[0] - 1
+        lengths = np.diff(offsets)
+        seg = np.repeat(np.arange(npaths), lengths)
+
+        # drop the unknown modules
+        valid = (mod_path != -1) | (lengths[seg] == 1)
+        mods, seg = mod_path[valid], seg[valid]
+        counts = np.bincount(seg, minlength=npaths)
+        starts = np.zeros(npaths + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        pos = np.arange(mods.shape[0]) - starts[seg]
+
+        # group path: the first module of each run of the same module
+        is_start = np.ones(mods.shape[0], dtype=bool)
+        is_start[1:] = (seg[1:] != seg[:-1]) | (mods[1:] != mods[:-1])
+        gp_offsets = np.zeros(npaths + 1, dtype=np.int64)
+        np.cumsum(np.bincount(seg[is_start], minlength=npaths), out=gp_offsets[1:])
+        gp_values = mods[is_start]
+
+        # component path: after the last module that differs from the last one
+        has_mods = counts > 0
+        last_mod = np.full(npaths, -1, dtype=mods.dtype)
+        last_mod[has_mods] = mods[starts[1:][has_mods] - 1]
+        is_diff = mods != last_mod[seg]
+        last_diff = np.full(npaths, -1, dtype=np.int64)
+        np.maximum.at(last_diff, seg[is_diff], pos[is_diff])
+
+        cp_lengths = lengths - (last_diff + 1)
+        cp_offsets = np.zeros(npaths + 1, dtype=np.int64)
+        np.cumsum(cp_lengths, out=cp_offsets[1:])
+        cp_idx = np.repeat(offsets[:-1] + last_diff + 1 - cp_offsets[:-1], cp_lengths)
+        cp_values = path[cp_idx + np.arange(cp_offsets[-1], dtype=np.int64)]
+
+        return gp_offsets, gp_values, cp_offsets, cp_values
+
 
 # ------------------------------------------------------------------------------
@@ -1,18 +1,46 @@
 import os
 import re
+import json
 import math
+import hashlib
 import hatchet as ht
+import numpy as np
 
 import callflow
+from callflow.utils.df import df_map_dict
 
 LOGGER = callflow.get_logger(__name__)
 
 
 FRAME_KEYS = ["file", "name"]
 
+# policies to resolve the nodes with no or multiple matches.
+#   interactive: ask the user.
+#   unknown: assign to the Unknown module.
+#   first: assign to the module of the first matching pattern.
+#   longest: assign to the module of the longest match.
+# The nodes with no match are assigned to Unknown by all but interactive.
+MATCH_POLICIES = ["interactive", "unknown", "first", "longest"]
+
 
 class RegexModuleMatcher:
-    def __init__(self, m2c, m2m: dict = {}):
+    def __init__(self, m2c, m2m: dict = {}, policy="interactive", cache_path=""):
+        """
+        Constructor to the regex module matcher.
+
+        :param m2c: (dict) module -> {frame key -> list of patterns}
+        :param m2m: (dict) module of the dataframe -> module
+        :param policy: (str) policy for the nodes with no or multiple matches
+        (see MATCH_POLICIES)
+        :param cache_path: (str) JSON file of the callsite -> module
+        assignments reused across runs with the same m2c and policy (disabled
+        if empty)
+        """
+        assert policy in MATCH_POLICIES
+        self.policy = policy
+        self.cache_path = cache_path
+        self.fingerprint = RegexModuleMatcher.fingerprint_m2c(m2c, policy)
+
         self.re_map = {}
 
         for m, regex in m2c.items():
@@ -21,18 +49,75 @@ class RegexModuleMatcher:
                     re_pattern = re.compile(pattern)
                     self.re_map[re_pattern] = m
 
+        # the patterns of a module are combined into one alternation, so that
+        # a frame is searched once per module (instead of once per pattern).
+        self.re_modules = RegexModuleMatcher.combine_patterns(self.re_map)
+        self.matches = {}  # frame value -> matched modules
+
         self.m2c = {m: [] for m in m2c.keys()}
         self.m2m = m2m
         self.m2c["Unknown"] = []
+        self.assigned = {}  # module -> set of the callsites in m2c[module]
+
+        # sanitized callsite name -> assigned modules, of the previous runs
+        # (cached) and of this run (c2m).
+        self.cached = RegexModuleMatcher.read_cache(cache_path, self.fingerprint)
+        self.c2m = {}
+
+    @staticmethod
+    def combine_patterns(re_map):
+        """
+        Combine the patterns of each module into a single alternation. The
+        patterns with groups (e.g., backreferences) or that cannot be combined
+        (e.g., global flags) are kept as they are.
 
-        self.assign_unknown = False
+        :param re_map: (dict) compiled pattern -> module
+        :return: (list) (compiled pattern, module) pairs
+        """
+        patterns = {}
+        for reg, m in re_map.items():
+            patterns.setdefault(m, []).append(reg)
+
+        ret = []
+        for m, regs in patterns.items():
+            if len(regs) > 1 and all(_.groups == 0 for _ in regs):
+                try:
+                    combined = "|".join(f"(?:{_.pattern})" for _ in regs)
+                    ret.append((re.compile(combined), m))
+                    continue
+                except re.error:
+                    pass
+            ret.extend((reg, m) for reg in regs)
+        return ret
 
     def match_frame(self, ht_frame, ht_key):
-        return [
-            m
-            for reg, m in self.re_map.items()
-            if re.search(reg, ht_frame.get(ht_key)) is not None
-        ]
+        """
+        Modules whose patterns match a frame's key. The matches are memoized
+        by the value of the key, as the same names and files appear at many
+        nodes of a CCT.
+
+        :param ht_frame: (hatchet.frame.Frame) frame of a node
+        :param ht_key: (str) frame key (e.g., name, file)
+        :return: (list) matched modules
+        """
+        value = ht_frame.get(ht_key)
+        if value not in self.matches:
+            self.matches[value] = [
+                m for reg, m in self.re_modules if reg.search(value) is not None
+            ]
+        return self.matches[value]
+
+    def _assign(self, module, node_name, unique=False):
+        """
+        Append a callsite to a module of m2c.
+
+        :param unique: (bool) skip the callsite if the module has it already
+        """
+        assigned = self.assigned.setdefault(module, set(self.m2c.get(module, [])))
+        if unique and node_name in assigned:
+            return
+        assigned.add(node_name)
+        self.m2c.setdefault(module, []).append(node_name)
 
     def _get_percentage(self):
         return math.floor((self.counter / len(self.nodes) * 100))
@@ -60,25 +145,37 @@ class RegexModuleMatcher:
             return "Loop@" + RegexModuleMatcher.sanitize(_file) + ":" + _line
 
     @staticmethod
-    def module_in_dataframe(df, m2m, node):
-        if "module" not in df.columns:
-            return None
+    def modules_in_dataframe(df):
+        """
+        Module of each node in a dataframe (i.e., of its first row), computed
+        once for all the nodes.
 
-        node_df = df.loc[df["node"] == node]
+        :param df: (pd.DataFrame) hatchet dataframe
+        :return: (dict) id of the node -> module, empty if the dataframe has no
+        module column
+        """
+        if "module" not in df.columns:
+            return {}
 
-        if node_df.empty:
-            return None
+        if "node" in df.columns:
+            nodes = df["node"].to_numpy()
+        else:
+            nodes = df.index.get_level_values("node").to_numpy()
+        modules = df["module"].to_numpy()
 
-        module = node_df["module"].unique().tolist()
+        ids = np.fromiter(map(id, nodes), dtype=np.int64, count=len(nodes))
+        _, first = np.unique(ids, return_index=True)
+        return {ids[i]: modules[i] for i in first.tolist()}
 
-        if module[0] is None:
+    @staticmethod
+    def module_in_m2m(module, m2m):
+        if module is None:
             return None
 
-        if module[0] not in m2m.keys():
-            raise Exception(f"{module[0]} not found in m2m mapping.")
+        if module not in m2m.keys():
+            raise Exception(f"{module} not found in m2m mapping.")
 
-        if module[0] in m2m.keys():
-            return m2m[module[0]]
+        return m2m[module]
 
     def match(self, gf, nodes=None):
         assert isinstance(gf, ht.GraphFrame)
@@ -90,49 +187,113 @@ class RegexModuleMatcher:
         else:
             self.nodes = nodes
 
+        # the modules of the nodes in the dataframe (if any).
+        df_modules = RegexModuleMatcher.modules_in_dataframe(gf.dataframe)
+
         self.counter = 0
         notfound = 0
+        policy = self.policy
         for node in self.nodes:
             node_name = RegexModuleMatcher.from_htframe(node.frame)
 
-            module_in_df = RegexModuleMatcher.module_in_dataframe(
-                gf.dataframe.reset_index(), self.m2m, node
+            module_in_df = RegexModuleMatcher.module_in_m2m(
+                df_modules.get(id(node)), self.m2m
             )
             if module_in_df is not None:
-                if module_in_df not in self.m2c.keys():
-                    self.m2c[module_in_df] = []
-                self.m2c[module_in_df].append(node_name)
+                self._assign(module_in_df, node_name)
                 continue
 
-            for fk in FRAME_KEYS:
-                if node.frame.get(fk) is not None:
-                    matches = self.match_frame(node.frame, fk)
-
-                    if len(list(set(matches))) > 1:
-                        print(f"Multiple matches found for {node}: {matches}")
-                        self._get_input(node_name)
-                        continue
+            if node_name in self.cached:
+                modules = self.cached[node_name]
+            else:
+                modules = self._match_node(node, node_name)
+                # the assignments after the interactive policy falls back to
+                # "unknown" (see _get_input) are not cached for it.
+                if self.policy == policy:
+                    self.c2m.setdefault(node_name, modules)
 
-                    if len(matches) == 0:
-                        if node_name == "<unknown file>:0":
-                            self.m2c["libmonitor.so.0.0.0"].append(node_name)
-                            continue
-
-                        print(f"No matches found: {node}")
-                        self.print_m2c()
-                        self._get_input(node_name)
-                        continue
-
-                    if node_name not in self.m2c[matches[0]]:
-                        self.m2c[matches[0]].append(node_name)
+            for module in modules:
+                self._assign(module, node_name, unique=True)
 
             self.counter += 1
 
         LOGGER.info(f"Successfully assigned a module for {self.counter} nodes.")
         LOGGER.debug(f"Failed to assign a module for {notfound} nodes.")
 
+        if len(self.cache_path) > 0:
+            LOGGER.info(
+                f"Reused {len(self.cached)} and matched {len(self.c2m)} "
+                f"callsite assignments ({self.cache_path})"
+            )
+            RegexModuleMatcher.write_cache(self.cache_path, self.fingerprint, self.c2m)
+
         return self.m2c
 
+    def _match_node(self, node, node_name):
+        """
+        Match the frame keys of a node. The nodes with no or multiple matches
+        are resolved by the policy.
+
+        :param node: (hatchet.node.Node) node
+        :param node_name: (str) sanitized name of the node
+        :return: (list) modules, a module per matched frame key
+        """
+        ret = []
+        for fk in FRAME_KEYS:
+            if node.frame.get(fk) is None:
+                continue
+
+            matches = self.match_frame(node.frame, fk)
+            if len(list(set(matches))) > 1:
+                ret.append(self._resolve_multiple(node, node_name, fk, matches))
+
+            elif len(matches) == 0:
+                if node_name == "<unknown file>:0":
+                    ret.append("libmonitor.so.0.0.0")
+                else:
+                    ret.append(self._resolve_none(node, node_name))
+
+            else:
+                ret.append(matches[0])
+        return ret
+
+    def _resolve_multiple(self, node, node_name, fk, matches):
+        if self.policy == "first":
+            return matches[0]
+
+        if self.policy == "longest":
+            return self.longest_match(node.frame.get(fk))
+
+        if self.policy == "unknown":
+            LOGGER.debug(f"Multiple matches found for {node}: {matches}")
+            return "Unknown"
+
+        print(f"Multiple matches found for {node}: {matches}")
+        return self._get_input(node_name)
+
+    def _resolve_none(self, node, node_name):
+        if self.policy != "interactive":
+            LOGGER.debug(f"No matches found: {node}")
+            return "Unknown"
+
+        print(f"No matches found: {node}")
+        self.print_m2c()
+        return self._get_input(node_name)
+
+    def longest_match(self, value):
+        """
+        Module of the pattern with the longest match (the first one on a tie).
+
+        :param value: (str) value of a frame key
+        :return: (str) module
+        """
+        ret, longest = "Unknown", -1
+        for reg, m in self.re_map.items():
+            match = reg.search(value)
+            if match is not None and match.end() - match.start() > longest:
+                ret, longest = m, match.end() - match.start()
+        return ret
+
     def print_m2c(self):
         print("====================================")
         print("Current module-callsite map keys: \n")
@@ -141,26 +302,17 @@ class RegexModuleMatcher:
             print(k)
 
     def _get_input(self, node_name):
-        if self.assign_unknown:
-            self.m2c["Unknown"].append(node_name)
-            return
-
         print(f"====== {self._get_percentage()}% =======")
         module = input("Enter the module name (0 for Unknown): ")
         if module == "0":
-            self.m2c["Unknown"].append(node_name)
-            return
+            return "Unknown"
 
+        # -1 assigns Unknown to this and all the following nodes.
         if module == "-1":
-            self.assign_unknown = True
-            self.m2c["Unknown"].append(node_name)
-            return
-
-        if module not in self.m2c:
-            self.m2c[module] = []
+            self.policy = "unknown"
+            return "Unknown"
 
-        self.m2c[module].append(node_name)
-        return
+        return module
 
     def print_summary(self):
         print("======= Regex Matcher Summary =========")
@@ -217,9 +369,7 @@ class RegexModuleMatcher:
             LOGGER.debug(
                 f'{action} column "{column_name}" = (dict); default=({dict_default})'
             )
-            df[column_name] = df[apply_on].apply(
-                lambda _: apply_dict.get(_, dict_default)
-            )
+            df[column_name] = df_map_dict(df, apply_on, apply_dict, dict_default)
 
     @staticmethod
     def update_df(df, m2c={}, column_name="module"):
@@ -237,9 +387,67 @@ class RegexModuleMatcher:
             df, column_name, apply_dict=c2m, apply_on="name", update=True
         )
 
-    def dump_mapping(self, fname):
-        import json
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def fingerprint_m2c(m2c, policy):
+        """
+        Fingerprint of a module-callsite map and a match policy; a cache of
+        assignments is only valid for the map and policy it was matched with
+        (e.g., the "unknown" policy assigns Unknown to the multiple matches).
+        """
+        data = {"m2c": m2c, "policy": policy}
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def read_cache(fname, fingerprint):
+        """
+        Read the callsite -> modules assignments of a cache file.
+
+        :param fname: (str) cache file
+        :param fingerprint: (str) fingerprint of the module-callsite map and
+        the policy
+        :return: (dict) callsite -> list of modules, empty if there is no
+        cache or it was matched with another map or policy
+        """
+        if len(fname) == 0 or not os.path.isfile(fname):
+            return {}
+
+        try:
+            with open(fname, "r") as fptr:
+                data = json.load(fptr)
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Ignoring the module assignment cache ({fname}): {e}")
+            return {}
+
+        if data.get("fingerprint") != fingerprint:
+            LOGGER.info(
+                f"Module assignment cache ({fname}) is for another m2c map or policy"
+            )
+            return {}
+
+        return data["c2m"]
 
+    @staticmethod
+    def write_cache(fname, fingerprint, c2m):
+        """
+        Write the callsite -> modules assignments to a cache file. The entries
+        already in the file (e.g., written by another worker) are kept, and
+        the file is replaced atomically.
+
+        :param fname: (str) cache file
+        :param fingerprint: (str) fingerprint of the module-callsite map and
+        the policy
+        :param c2m: (dict) callsite -> list of modules
+        """
+        data = RegexModuleMatcher.read_cache(fname, fingerprint)
+        data.update(c2m)
+
+        ftmp = f"{fname}.{os.getpid()}.tmp"
+        with open(ftmp, "w") as fptr:
+            json.dump({"fingerprint": fingerprint, "c2m": data}, fptr)
+        os.replace(ftmp, fname)
+
+    def dump_mapping(self, fname):
         with open(fname, "w") as fptr:
             json.dump(self.m2c, fptr, indent=2)
 
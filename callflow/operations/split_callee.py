@@ -23,8 +23,9 @@ class SplitCallee:
         :param callsites:
         """
         assert isinstance(gf, callflow.GraphFrame)
-        assert "component_path" in gf.df.columns
+        assert "component_path" in gf.paths.columns
 
+        self.paths = gf.paths
         paths = self.callsite_paths(callsites)
 
         # module_group_df = gf.df.groupby(["module"])
@@ -113,19 +114,15 @@ class SplitCallee:
     def callsite_paths(self, callsites):
         """
 
-        :param callsites:
+        :param callsites: callsite indexes
         :return:
         """
-        from ast import literal_eval as make_list
-
         paths = []
         for callsite in callsites:
-            df = self.name_group_df.get_group(callsite)
             paths.append(
                 {
-                    "group_path": make_list(df["group_path"].unique()[0]),
-                    "path": make_list(df["path"].unique()[0]),
-                    "component_path": make_list(df["component_path"].unique()[0]),
+                    _: self.paths.get(_, callsite)
+                    for _ in ["group_path", "path", "component_path"]
                 }
             )
         return paths
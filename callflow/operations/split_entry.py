@@ -20,7 +20,7 @@ class SplitEntry:
         :param reveal_module:
         """
         assert isinstance(gf, callflow.GraphFrame)
-        assert "group_path" in gf.df.columns
+        assert "group_path" in gf.paths.columns
 
         entry_functions_map = self.module_entry_functions_map(gf.nxg)
 
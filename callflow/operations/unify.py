@@ -12,7 +12,7 @@ import networkx as nx
 from functools import reduce
 
 import callflow
-from callflow.utils.utils import create_reindex_map
+from callflow.datastructures.path_table import PathTable
 
 
 LOGGER = callflow.get_logger(__name__)
@@ -55,7 +55,6 @@ class Unify:
 
         self.compute()
         self.eg.add_time_proxies()
-        self.eg.df_reset_index()
 
     def _remove_none(self, arr):
         """
@@ -70,95 +69,155 @@ class Unify:
         return np.array([i for i in arr if i is not None])
 
     # --------------------------------------------------------------------------
-    def compute(self):
+    @staticmethod
+    def lookup_array(sg_map, eg_map):
         """
+        Lookup array from the indexes of a super graph to the ensemble's.
 
-        :return:
+        :param sg_map: (dict) super graph's key -> idx
+        :param eg_map: (dict) ensemble's key -> idx
+        :return: (np.array) lookup array; its last element is -1 so that the
+        index -1 maps to -1.
         """
-        n = len(self.eg.supergraphs)
-        LOGGER.info(f"Unifying {n} supergraphs")
-        if n == 1:
-            LOGGER.warning("Unifying should be used for 2 or more SuperGraphs")
+        size = max(list(sg_map.values()) + [-1]) + 2
+        lut = np.full(size, -1, dtype=np.int64)
+        for key, idx in sg_map.items():
+            if key is not None:
+                lut[idx] = eg_map[key]
+        return lut
+
+    @staticmethod
+    def concat_remapped(supergraphs, luts):
+        """
+        Concatenate the dataframes of the super graphs, and remap their index
+        columns (name and module) with lookup arrays.
 
-        self.eg.dataframe = pd.DataFrame([])
-        self.eg.nxg = nx.DiGraph()
+        The result is built one column at a time, so the peak memory is about
+        one copy of the result (instead of a copy per super graph).
 
-        for name, sg in self.eg.supergraphs.items():
-            # ------------------------------------------------------------------
-            # unify the dataframe
-            # remap the modules in this supergraph to the one in ensemble graph
-            sg_modules_list = self._remove_none(list(sg.module2idx.keys()))
-            sg_callsites_list = self._remove_none(list(sg.callsite2idx.keys()))
-            _mod_map = create_reindex_map(sg_modules_list, self.eg_modules_list)
-            _cs_map = create_reindex_map(sg_callsites_list, self.eg_callsites_list)
-
-            if 1:  # edit directly in the supergraph
-                sg.df_add_column("dataset", apply_value=sg.name)
-                sg.df_add_column(
-                    "module",
-                    update=True,
-                    apply_func=lambda _: self.eg_modules_list[_mod_map[_]]
-                    if _ is not -1
-                    else -1,
-                    apply_on="module",
-                )
-                sg.df_add_column(
-                    "name",
-                    update=True,
-                    apply_func=lambda _: self.eg_callsites_list[_cs_map[_]]
-                    if _ is not -1
-                    else -1,
-                    apply_on="name",
-                )
+        :param supergraphs: (dict) name -> SuperGraph
+        :param luts: (dict) name -> {"callsite": np.array, "module": np.array}
+        :return: (pd.DataFrame) the dataframes with their indexes as columns
+        (as reset_index), a "dataset" column, and the columns sorted by name
+        (as pd.concat(sort=True)).
+        """
+        dfs = {name: sg.dataframe for name, sg in supergraphs.items()}
+        first = next(iter(dfs.values()))
+
+        index = list(first.index.names)
+        if index == [None]:
+            index = ["index"]
+        index = [f"level_{i}" if _ is None else _ for i, _ in enumerate(index)]
+        columns = set(["dataset"])
+        for df in dfs.values():
+            columns.update(df.columns)
+        columns = sorted(columns)
+
+        # columns missing in a dataframe are filled with NaN (as pd.concat).
+        _get = lambda df, column: (
+            df[column].to_numpy() if column in df.columns else np.full(len(df), np.nan)
+        )
 
-                sg.df_add_column(
-                    "callers",
-                    update=True,
-                    apply_func=lambda _: [_cs_map[__] for __ in _],
-                    apply_on="callers",
-                )
+        data = {}
+        for i, column in enumerate(index):
+            data[column] = np.concatenate(
+                [df.index.get_level_values(i).to_numpy() for df in dfs.values()]
+            )
+
+        for column in columns:
+            if column == "dataset":
+                values = [
+                    np.full(len(df), name, dtype=object) for name, df in dfs.items()
+                ]
+
+            elif column in ["name", "module"]:
+                ntype = "callsite" if column == "name" else "module"
+                values = [
+                    np.take(luts[name][ntype], _get(df, column).astype(np.int64))
+                    for name, df in dfs.items()
+                ]
 
-                sg.df_add_column(
-                    "callees",
-                    update=True,
-                    apply_func=lambda _: [_cs_map[__] for __ in _],
-                    apply_on="callees",
-                )
+            else:
+                values = [_get(df, column) for df in dfs.values()]
 
-                sg.df_add_column(
-                    "path",
-                    update=True,
-                    apply_func=lambda _: [_cs_map[__] for __ in _],
-                    apply_on="path",
-                )
+            data[column] = np.concatenate(values)
 
-                sg.df_add_column(
-                    "group_path",
-                    update=True,
-                    apply_func=lambda _: [_mod_map[__] for __ in _],
-                    apply_on="group_path",
-                )
+        return pd.DataFrame(data, columns=index + columns, copy=False)
 
-                sg.df_add_column(
-                    "component_path",
-                    update=True,
-                    apply_func=lambda _: [_cs_map[__] for __ in _],
-                    apply_on="component_path",
-                )
+    @staticmethod
+    def remap_thresholds(table, lut):
+        """
+        Filter thresholds (see Filter.thresholds) with their callsite indexes
+        remapped.
 
-                self.eg.dataframe = pd.concat(
-                    [self.eg.dataframe, sg.dataframe], sort=True
-                )
+        :param table: (pd.DataFrame) filter thresholds, or None
+        :param lut: (np.array) callsite lookup array (see Unify.lookup_array)
+        :return: (pd.DataFrame) remapped filter thresholds, or None
+        """
+        if table is None:
+            return None
+        return table.assign(name=np.take(lut, table["name"].to_numpy(np.int64)))
 
-            else:  # create a new copy
-                _sg = sg.dataframe.assign(dataset=sg.name)
-                _sg["module"] = _sg["module"].apply(lambda _: _mod_map[_])
-                self.eg.dataframe = pd.concat([self.eg.dataframe, _sg], sort=True)
+    @staticmethod
+    def merge_thresholds(tables):
+        """
+        Merge filter thresholds of the same index space: a call site is
+        retained at a filter percentage if it is retained in any of them.
+
+        :param tables: (list) filter thresholds
+        :return: (pd.DataFrame) merged filter thresholds, None if the
+        thresholds of a super graph were not computed.
+        """
+        if any(_ is None for _ in tables):
+            return None
+        table = pd.concat(tables, ignore_index=True)
+        return table.groupby("name", as_index=False).max()
+
+    # --------------------------------------------------------------------------
+    def compute(self):
+        """
+
+        :return:
+        """
+        n = len(self.eg.supergraphs)
+        LOGGER.info(f"Unifying {n} supergraphs")
+        if n == 1:
+            LOGGER.warning("Unifying should be used for 2 or more SuperGraphs")
+
+        # Calculate the index maps for the ensemble mapping.
+        self.eg.callsite2idx = {
+            cs: idx for idx, cs in enumerate(self.eg_callsites_list)
+        }
+        self.eg.module2idx = {m: idx for idx, m in enumerate(self.eg_modules_list)}
+
+        # ----------------------------------------------------------------------
+        # unify the dataframe
+        # remap the callsites and modules of each supergraph to the ones in
+        # ensemble graph, and concatenate all of them at once.
+        luts = {
+            name: {
+                "callsite": Unify.lookup_array(sg.callsite2idx, self.eg.callsite2idx),
+                "module": Unify.lookup_array(sg.module2idx, self.eg.module2idx),
+            }
+            for name, sg in self.eg.supergraphs.items()
+        }
+        self.eg.dataframe = Unify.concat_remapped(self.eg.supergraphs, luts)
 
-            # TODO: *later*, avoid creating the concatenated dataframe
+        # a callsite gets the paths of the first supergraph it appears in.
+        self.eg.paths = PathTable.merge(
+            [sg.paths.remap(luts[name]) for name, sg in self.eg.supergraphs.items()]
+        )
+        self.eg.filter_thresholds = Unify.merge_thresholds(
+            [
+                Unify.remap_thresholds(sg.filter_thresholds, luts[name]["callsite"])
+                for name, sg in self.eg.supergraphs.items()
+            ]
+        )
 
-            # ------------------------------------------------------------------
-            # unify the graph
+        # ----------------------------------------------------------------------
+        # unify the graph
+        self.eg.nxg = nx.DiGraph()
+        for name, sg in self.eg.supergraphs.items():
             if not self.eg.nxg.is_multigraph() == sg.nxg.is_multigraph():
                 raise nx.NetworkXError("Both nxg instances be graphs or multigraphs.")
 
@@ -170,38 +229,123 @@ class Unify:
                     f"{list(set(self.eg.nxg) - set(sg.nxg))}"
                 )
 
-            if sg.nxg.is_multigraph():
-                new_edges = sg.nxg.edges(keys=True, data=True)
-            else:
-                new_edges = sg.nxg.edges(data=True)
-
-            # add nodes and edges.
-            self.eg.nxg.add_nodes_from(sg.nxg)
-            self.eg.nxg.add_edges_from(new_edges)
-
-            # ------------------------------------------------------------------
-        # Calculate the index maps for the updated ensemble mapping.
-        self.eg.callsite2idx = {
-            cs: idx for idx, cs in enumerate(self.eg_callsites_list)
-        }
-        self.eg.module2idx = {m: idx for idx, m in enumerate(self.eg_modules_list)}
-
+        # ----------------------------------------------------------------------
         self.eg.idx2callsite = {idx: cs for cs, idx in self.eg.callsite2idx.items()}
         self.eg.idx2module = {idx: m for m, idx in self.eg.module2idx.items()}
 
         self.eg.callsite2idx[None], self.eg.idx2callsite[-1] = -1, None
         self.eg.module2idx[None], self.eg.idx2module[-1] = -1, None
 
-        # Calculate the callsite2module mapping for the updated index maps.
+        # Calculate the callsite2module mapping for the updated index maps
+        # (the dataframe is already indexed, so the maps are identities).
         (
             self.eg.callsite2module,
             self.eg.module2callsite,
         ) = self.eg.callsite2module_from_indexmaps(
-            self.eg.callsite2idx, self.eg.module2idx
+            {_: _ for _ in self.eg.idx2callsite},
+            {_: _ for _ in self.eg.idx2module},
+        )
+
+        self.eg.callsites_idx = self.eg.dataframe["name"].unique().tolist()
+        self.eg.modules_idx = self.eg.dataframe["module"].unique().tolist()
+
+
+# ------------------------------------------------------------------------------
+class UnifyAppend:
+    """
+    Append super graphs to a unified (ensemble) super graph.
+
+    The new super graphs are remapped into the index space of the ensemble;
+    the callsites and modules that are not in the ensemble are appended to
+    its index maps, so the existing indexes (and the persisted ensemble
+    dataframe) remain valid. The remapped rows are stored in self.dataframe,
+    and the new callsites are added to the ensemble's path table.
+    """
+
+    def __init__(self, eg, supergraphs):
+        """
+        Constructor
+        :param eg: (EnsembleGraph) ensemble graph with its maps and nxg loaded
+        :param supergraphs: (dict) name -> SuperGraph to append
+        """
+        assert isinstance(eg, callflow.EnsembleGraph)
+        assert isinstance(supergraphs, dict)
+        for sg in supergraphs.values():
+            assert isinstance(sg, callflow.SuperGraph)
+
+        self.eg = eg
+        self.dataframe = self.compute(supergraphs)
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _extend_index(eg_map, sg_map):
+        """
+        Append the keys of sg_map that are not in eg_map to eg_map, and
+        compute the lookup array from the indexes of sg_map to eg_map.
+
+        :param eg_map: (dict) ensemble's key -> idx (updated in place)
+        :param sg_map: (dict) super graph's key -> idx
+        :return: (np.array) lookup array (see Unify.lookup_array)
+        """
+        next_idx = max(list(eg_map.values()) + [-1]) + 1
+        for key in sg_map:
+            if key is not None and key not in eg_map:
+                eg_map[key] = next_idx
+                next_idx += 1
+        return Unify.lookup_array(sg_map, eg_map)
+
+    # --------------------------------------------------------------------------
+    def compute(self, supergraphs):
+        """
+        Remap the super graphs, and update the maps and the nxg of the
+        ensemble in place.
+
+        :param supergraphs: (dict) name -> SuperGraph to append
+        :return: (pd.DataFrame) remapped rows of the super graphs
+        """
+        LOGGER.info(f"Appending {len(supergraphs)} supergraphs to ({self.eg.name})")
+        eg = self.eg
+
+        luts = {}
+        for name, sg in supergraphs.items():
+            luts[name] = {
+                "callsite": UnifyAppend._extend_index(eg.callsite2idx, sg.callsite2idx),
+                "module": UnifyAppend._extend_index(eg.module2idx, sg.module2idx),
+            }
+
+            if not eg.nxg.is_multigraph() == sg.nxg.is_multigraph():
+                raise nx.NetworkXError("Both nxg instances be graphs or multigraphs.")
+            eg.nxg.update(sg.nxg)
+            eg.supergraphs[name] = sg
+
+        df = Unify.concat_remapped(supergraphs, luts)
+        remapped = [sg.paths.remap(luts[name]) for name, sg in supergraphs.items()]
+        eg.paths = PathTable.merge([eg.paths] + remapped)
+        eg.filter_thresholds = Unify.merge_thresholds(
+            [eg.filter_thresholds]
+            + [
+                Unify.remap_thresholds(sg.filter_thresholds, luts[name]["callsite"])
+                for name, sg in supergraphs.items()
+            ]
         )
 
-        # Update the dataframe with the updated indexes.
-        self.eg.factorize_callsites_and_modules()
+        eg.idx2callsite = {idx: cs for cs, idx in eg.callsite2idx.items()}
+        eg.idx2module = {idx: m for m, idx in eg.module2idx.items()}
+
+        # map the new callsites to their modules.
+        for cidx, midx in df[["name", "module"]].drop_duplicates().to_numpy():
+            if cidx == -1 or midx == -1:
+                continue
+            assert eg.callsite2module.get(cidx, -1) in [-1, midx], (
+                f"Found 2 modules mapped to callsite ({cidx}): "
+                f"{[eg.callsite2module[cidx], midx]}"
+            )
+            eg.callsite2module[cidx] = midx
+            callsites = eg.module2callsite.setdefault(midx, [])
+            if cidx not in callsites:
+                callsites.append(cidx)
+
+        return df
 
 
 # ------------------------------------------------------------------------------
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from callflow.utils import columnar
+
+
+def _df():
+    return pd.DataFrame(
+        {
+            "int": np.arange(4, dtype=np.int64),
+            "float": [0.5, np.nan, 2.0, 3.5],
+            "str": ["a", "b", None, "a"],
+            "list": [[1, 2], [], None, [3]],
+            "none": [None, None, None, None],
+            "dict": [{"x": 1}, {"y": 2}, None, {}],
+            "mixed": ["s", 3, None, 1.5],
+            "floats": [[0.5], [1.5, 2.5], [], None],
+        }
+    )
+
+
+def _assert_equal(df, expected):
+    assert list(df.columns) == list(expected.columns)
+    assert len(df) == len(expected)
+    for column in expected.columns:
+        for x, y in zip(df[column], expected[column]):
+            if isinstance(y, (list, np.ndarray)):
+                assert list(x) == list(y), column
+            elif y is None or (isinstance(y, float) and np.isnan(y)):
+                assert x is None or (isinstance(x, float) and np.isnan(x)), column
+            else:
+                assert x == y, column
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_roundtrip(tmp_path, mmap):
+    df = _df()
+    columnar.write_df(str(tmp_path / "df"), df)
+
+    ret = columnar.read_df(str(tmp_path / "df"), mmap=mmap)
+    expected = df.copy()
+    expected["list"] = [[1, 2], [], [], [3]]
+    _assert_equal(ret, expected)
+
+    manifest = columnar.read_manifest(str(tmp_path / "df"))
+    kinds = {_["name"]: _["kind"] for _ in manifest["meta"]["columns"]}
+    assert kinds == {
+        "int": "numeric",
+        "float": "numeric",
+        "str": "category",
+        "list": "list",
+        "none": "pickle",
+        "dict": "pickle",
+        "mixed": "pickle",
+        "floats": "pickle",
+    }
+
+
+def test_roundtrip_columns(tmp_path):
+    columnar.write_df(str(tmp_path / "df"), _df())
+    ret = columnar.read_df(str(tmp_path / "df"), columns=["dict", "int"])
+    assert list(ret.columns) == ["int", "dict"]
+    assert ret["dict"].tolist() == [{"x": 1}, {"y": 2}, None, {}]
+
+
+def test_mmap_numeric(tmp_path):
+    columnar.write_df(str(tmp_path / "df"), _df())
+    ret = columnar.read_df(str(tmp_path / "df"), columns=["int"], mmap=True)
+    arrays, _ = columnar.read_arrays(str(tmp_path / "df"), mmap=True)
+    assert isinstance(arrays["int/data"], np.memmap)
+    assert ret["int"].tolist() == [0, 1, 2, 3]
+
+
+def test_append(tmp_path):
+    path = str(tmp_path / "df")
+    df = _df()
+    columnar.write_df(path, df)
+
+    new = pd.DataFrame(
+        {
+            "int": np.array([4, 5], dtype=np.int64),
+            "float": [4.5, 5.5],
+            "str": ["c", "a"],
+            "list": [None, [4, 5]],
+            "none": ["now", None],
+            "dict": [{"z": 3}, None],
+            "mixed": [2, "t"],
+            "floats": [[3.5], []],
+        }
+    )
+    columnar.append_df(path, new)
+
+    ret = columnar.read_df(path)
+    expected = pd.concat([df, new], ignore_index=True)
+    expected["list"] = [[1, 2], [], [], [3], [], [4, 5]]
+    _assert_equal(ret, expected)
+    assert columnar.read_manifest(path)["meta"]["nrows"] == 6
+
+
+def test_append_mismatch(tmp_path):
+    path = str(tmp_path / "df")
+    columnar.write_df(path, _df())
+
+    with pytest.raises(ValueError):
+        columnar.append_df(path, _df()[["int", "str"]])
+
+    new = _df()
+    new["int"] = ["x"] * len(new)
+    with pytest.raises(ValueError):
+        columnar.append_df(path, new)
+
+
+def test_lists():
+    lists = [[1, 2, 3], [], None, [-4]]
+    offsets, values = columnar.pack_lists(lists)
+    assert offsets.tolist() == [0, 3, 3, 3, 4]
+    assert [_.tolist() for _ in columnar.unpack_lists(offsets, values)] == [
+        [1, 2, 3],
+        [],
+        [],
+        [-4],
+    ]
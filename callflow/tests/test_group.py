@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from callflow.operations.group import Group
+from callflow.utils.columnar import pack_lists, unpack_lists
+
+
+def _construct_path(path, mod_path):
+    """
+    Group and component paths of a single path, as computed per path before
+    Group._construct_paths was vectorized.
+    """
+    # root
+    if len(path) == 1:
+        return mod_path, path
+
+    # drop the unknown modules
+    mod_path = mod_path[np.where(mod_path != -1)[0]]
+
+    mods_diff = [True] + [
+        mod_path[i] != mod_path[i - 1] for i in range(1, len(mod_path))
+    ]
+    gpath = mod_path[np.where(np.array(mods_diff, dtype=bool))[0]]
+
+    mods_diff = np.where(mod_path != mod_path[-1])[0]
+    last_diff_mod = mods_diff[-1] if len(mods_diff) > 0 else -1
+    cpath = path[last_diff_mod + 1 :]
+    return gpath, cpath
+
+
+def _random_paths(rng, npaths, nmodules, p_unknown):
+    paths, mod_paths = [], []
+    for _ in range(npaths):
+        length = 1 if rng.random() < 0.2 else int(rng.integers(2, 12))
+        path = rng.integers(0, 1000, size=length)
+        # few modules, so that the same module repeats along a path
+        mods = rng.integers(0, nmodules, size=length)
+        mods[rng.random(length) < p_unknown] = -1
+        if length > 1 and (mods == -1).all():
+            mods[rng.integers(0, length)] = rng.integers(0, nmodules)
+        paths.append(path)
+        mod_paths.append(mods)
+    return paths, mod_paths
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_construct_paths(seed):
+    rng = np.random.default_rng(seed)
+    p_unknown = [0.0, 0.3][seed % 2]
+    paths, mod_paths = _random_paths(rng, 40, 3, p_unknown)
+
+    offsets, path = pack_lists(paths)
+    _, mod_path = pack_lists(mod_paths)
+    gp_offsets, gp_values, cp_offsets, cp_values = Group._construct_paths(
+        offsets, path, mod_path
+    )
+
+    gpaths = unpack_lists(gp_offsets, gp_values)
+    cpaths = unpack_lists(cp_offsets, cp_values)
+    assert len(gpaths) == len(cpaths) == len(paths)
+    for i, (_path, _mod_path) in enumerate(zip(paths, mod_paths)):
+        gpath, cpath = _construct_path(_path, _mod_path)
+        assert gpaths[i].tolist() == gpath.tolist()
+        assert cpaths[i].tolist() == cpath.tolist()
+
+
+def test_construct_paths_roots():
+    # a root keeps its unknown module
+    paths = [np.array([4]), np.array([7]), np.array([4, 7, 9])]
+    mod_paths = [np.array([-1]), np.array([2]), np.array([-1, 2, 2])]
+
+    offsets, path = pack_lists(paths)
+    _, mod_path = pack_lists(mod_paths)
+    gp_offsets, gp_values, cp_offsets, cp_values = Group._construct_paths(
+        offsets, path, mod_path
+    )
+    assert [_.tolist() for _ in unpack_lists(gp_offsets, gp_values)] == [
+        [-1],
+        [2],
+        [2],
+    ]
+    assert [_.tolist() for _ in unpack_lists(cp_offsets, cp_values)] == [
+        [4],
+        [7],
+        [4, 7, 9],
+    ]
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from callflow.datastructures.path_table import PathTable
+from callflow.utils.columnar import pack_lists
+
+
+def _random_dicts(rng, keys, columns):
+    return {
+        column: {
+            int(k): rng.integers(0, 100, size=int(rng.integers(0, 6))).tolist()
+            for k in keys
+        }
+        for column in columns
+    }
+
+
+def _assert_table(table, data):
+    keys = sorted(set().union(*[_.keys() for _ in data.values()]))
+    assert table.keys.tolist() == keys
+    for column, _data in data.items():
+        for k in keys:
+            assert table.get(column, k).tolist() == _data.get(k, []), (column, k)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_merge(seed):
+    rng = np.random.default_rng(seed)
+    tables, data = [], []
+    for i in range(int(rng.integers(1, 5))):
+        keys = rng.choice(50, size=int(rng.integers(0, 20)), replace=False)
+        columns = [_ for _ in PathTable.COLUMNS if rng.random() < 0.7]
+        _data = _random_dicts(rng, keys, columns)
+        table = PathTable(keys)
+        for column, __data in _data.items():
+            table.add_column(column, __data)
+        tables.append(table)
+        data.append((keys, _data))
+
+    # a call site gets the paths of the first table it is in, and an empty
+    # path in the columns that table does not have.
+    expected = {}
+    columns = set().union(*[_data.keys() for _, _data in data])
+    for column in columns:
+        expected[column] = {}
+        for keys, _data in data:
+            for k in keys.tolist():
+                if k not in expected[column]:
+                    expected[column][k] = _data.get(column, {}).get(k, [])
+    keys = set().union(*[keys.tolist() for keys, _ in data])
+
+    merged = PathTable.merge(tables)
+    assert merged.keys.tolist() == sorted(keys)
+    assert set(merged.columns) == columns
+    for column in columns:
+        for k in keys:
+            assert merged.get(column, k).tolist() == expected[column][k]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_take(seed):
+    rng = np.random.default_rng(seed)
+    lists = [
+        rng.integers(0, 100, size=int(rng.integers(0, 6))).tolist()
+        for _ in range(int(rng.integers(1, 30)))
+    ]
+    offsets, values = pack_lists(lists)
+
+    # repeated rows, in any order
+    rows = rng.integers(0, len(lists), size=int(rng.integers(0, 40)))
+    _offsets, _values = PathTable._take({"path": (offsets, values)}, rows)["path"]
+    assert _offsets.shape[0] == rows.shape[0] + 1
+    assert [
+        _values[_offsets[i] : _offsets[i + 1]].tolist() for i in range(rows.shape[0])
+    ] == [lists[_] for _ in rows]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_add_csr_column(seed):
+    rng = np.random.default_rng(seed)
+    keys = rng.choice(100, size=int(rng.integers(1, 30)), replace=False)
+    data = _random_dicts(rng, keys, ["path"])
+    table = PathTable.from_dicts(data)
+
+    # a subset of the call sites, in any order
+    callsites = rng.permutation(keys)[: int(rng.integers(0, len(keys) + 1))]
+    lists = [
+        rng.integers(0, 100, size=int(rng.integers(0, 6))).tolist() for _ in callsites
+    ]
+    offsets, values = pack_lists(lists)
+    table.add_csr_column("group_path", callsites, offsets, values)
+
+    data["group_path"] = dict(zip(callsites.tolist(), lists))
+    _assert_table(table, data)
+    assert table.columns["group_path"][1].dtype == np.int32
+
+
+def test_subset_take_arrays():
+    rng = np.random.default_rng(0)
+    keys = rng.choice(100, size=30, replace=False)
+    data = _random_dicts(rng, keys, ["path", "callers", "group_path"])
+    table = PathTable.from_dicts(data)
+
+    _assert_table(PathTable.from_arrays(table.to_arrays()), data)
+
+    callsites = keys[::3]
+    subset = PathTable.from_arrays(table.subset(callsites).to_arrays())
+    _assert_table(
+        subset,
+        {c: {k: v for k, v in d.items() if k in callsites} for c, d in data.items()},
+    )
+
+    offsets, values = table.take("callers", callsites[::-1])
+    assert [
+        values[offsets[i] : offsets[i + 1]].tolist() for i in range(len(callsites))
+    ] == [data["callers"][k] for k in callsites[::-1].tolist()]
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from networkx.readwrite import json_graph
+
+from callflow.datastructures.supergraph import SuperGraph
+from callflow.utils.utils import NumpyEncoder
+from server.provider_base import BaseProvider
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def _config(save_path):
+    return {
+        "runs": [
+            {
+                "name": _,
+                "path": "hpctoolkit-cpi-database",
+                "profile_format": "hpctoolkit",
+            }
+            for _ in ["run-0", "run-1"]
+        ],
+        "data_path": DATA_PATH,
+        "save_path": save_path,
+        "read_parameter": False,
+        "chunk_size": 0,
+        "group_by": "module",
+        "filter_by": "time (inc)",
+        "filter_perc": 0.0,
+        "ensemble_process": True,
+    }
+
+
+@pytest.fixture(scope="module")
+def save_path(tmp_path_factory):
+    save_path = str(tmp_path_factory.mktemp("callflow"))
+    BaseProvider(_config(save_path)).process()
+    return save_path
+
+
+def test_load_budget_threads(save_path, monkeypatch):
+    supergraphs = []
+    for name in ["run-0", "run-1"]:
+        sg = SuperGraph(name)
+        sg.load(os.path.join(save_path, name), lazy=True)
+        supergraphs.append(sg)
+
+    # yield to the other thread after each load, which releases this
+    # SuperGraph (the budget is one run) before the caller reads it.
+    touch = SuperGraph._touch
+
+    def _touch(self, *args, **kwargs):
+        ret = touch(self, *args, **kwargs)
+        time.sleep(0.001)
+        return ret
+
+    monkeypatch.setattr(SuperGraph, "_touch", _touch)
+
+    errors = []
+
+    def _read(sg):
+        for _ in range(50):
+            for attr in ["dataframe", "callsite_aux_dict", "module_aux_dict"]:
+                if getattr(sg, attr) is None:
+                    errors.append((sg.name, attr))
+
+    SuperGraph.set_load_budget(runs=1)
+    try:
+        threads = [threading.Thread(target=_read, args=(_,)) for _ in supergraphs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        SuperGraph.set_load_budget()
+
+    assert errors == []
+
+
+@pytest.mark.parametrize("name", ["run-0", "ensemble"])
+def test_stored_sankey(save_path, name):
+    provider = BaseProvider(_config(save_path))
+    provider.load()
+
+    with open(os.path.join(save_path, name, "sankey.json"), "r") as fptr:
+        stored = fptr.read()
+
+    # a request with the default parameters, computed as the layout is not
+    # stored.
+    sg = provider.supergraphs[name]
+    sg.sankey = None
+    if name == "ensemble":
+        nxg = provider.request_sankey({}, provider.supergraphs["run-0"], sg)
+    else:
+        nxg = provider.request_sankey({}, sg)
+
+    assert json.dumps(json_graph.node_link_data(nxg), cls=NumpyEncoder) == stored
@@ -102,6 +102,24 @@ class ArgParser:
             "and grouping by 'module' produces a super graph)",
         )
 
+        parser.add_argument(
+            "--module_match_policy",
+            type=str,
+            default="interactive",
+            choices=["interactive", "unknown", "first", "longest"],
+            help="Policy for the call sites with no or multiple module matches "
+            "(interactive prompts the user; the others assign the unmatched "
+            "call sites to Unknown)",
+        )
+
+        parser.add_argument(
+            "--module_map_cache",
+            type=str,
+            default="",
+            help="JSON file of the callsite-module assignments, reused by "
+            "the runs processed with the same module map",
+        )
+
         parser.add_argument(
             "--read_parameter", action="store_true", help="Enable parameter analysis"
         )
@@ -171,6 +189,86 @@ class ArgParser:
             help="Enables ensemble SuperGraph construction",
         )
 
+        parser.add_argument(
+            "--ensemble_incremental",
+            action="store_true",
+            help="Append the new datasets to the processed ensemble SuperGraph "
+            "instead of processing it from scratch",
+        )
+
+        parser.add_argument(
+            "--eager_load",
+            action="store_true",
+            help="Load all dataframes into memory at startup "
+            "(default memory-maps each run's dataframe on first access)",
+        )
+
+        parser.add_argument(
+            "--load_budget_runs",
+            type=int,
+            default=0,
+            help="Maximum number of runs kept in memory (0 is unbounded)",
+        )
+
+        parser.add_argument(
+            "--load_budget_bytes",
+            type=int,
+            default=0,
+            help="Maximum bytes of run dataframes kept in memory (0 is unbounded)",
+        )
+
+        parser.add_argument(
+            "--response_cache_bytes",
+            type=int,
+            default=268435456,
+            help="Size of the in-memory cache of API responses (0 disables it)",
+        )
+
+        parser.add_argument(
+            "--response_cache_disk",
+            action="store_true",
+            help="Also cache the API responses on disk (under save_path)",
+        )
+
+        parser.add_argument(
+            "--response_cache_disk_bytes",
+            type=int,
+            default=0,
+            help="Size of the on-disk cache of API responses (0 is unbounded)",
+        )
+
+        parser.add_argument(
+            "--process_workers",
+            type=int,
+            default=1,
+            help="Number of worker processes to process the runs "
+            "(0 uses all cores, 1 processes the runs serially)",
+        )
+
+        parser.add_argument(
+            "--no_ingest_cache",
+            dest="ingest_cache",
+            action="store_false",
+            help="Do not cache the GraphFrames read from the profiles "
+            "(under save_path/ingest-cache)",
+        )
+
+        parser.add_argument(
+            "--cali_query_workers",
+            type=int,
+            default=0,
+            help="Number of cali-query processes converting the .cali files "
+            "into the ingest cache (0 uses all cores)",
+        )
+
+        parser.add_argument(
+            "--process_memory_limit",
+            type=int,
+            default=0,
+            help="RSS ceiling in bytes for the worker processes; new runs are "
+            "not started above it (0 is unbounded)",
+        )
+
         # -------------
         return parser
 
@@ -0,0 +1,402 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+"""
+CallFlow's columnar store.
+
+A store is a directory holding one ".npy" file per typed array and a
+"manifest.json" describing them. Each array can be loaded (or memory-mapped)
+independently, and list-valued columns are stored as offsets + values arrays.
+The other object columns (e.g., dicts, mixed types, or nulls) are pickled
+per value into offsets + bytes arrays.
+"""
+import os
+import json
+import pickle
+import itertools
+import numpy as np
+import pandas as pd
+from hatchet.node import Node
+
+import callflow
+
+LOGGER = callflow.get_logger(__name__)
+
+COLUMNAR_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+# ------------------------------------------------------------------------------
+# list <-> offsets + values
+# ------------------------------------------------------------------------------
+def _is_list_like(_):
+    return isinstance(_, (list, tuple, np.ndarray))
+
+
+def _is_null(_):
+    if isinstance(_, str):
+        return _ == ""
+    return _ is None or (isinstance(_, float) and np.isnan(_))
+
+
+def pack_lists(lists):
+    """
+    Pack a sequence of int lists into (offsets, values) arrays.
+    Null or empty-string entries are treated as empty lists.
+
+    :param lists: iterable of list-like elements
+    :return: (np.ndarray, np.ndarray) int64 offsets (n + 1) and flat values
+    """
+    lists = [_ if _is_list_like(_) else [] for _ in lists]
+    lengths = np.fromiter((len(_) for _ in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    values = np.fromiter(
+        itertools.chain.from_iterable(lists), dtype=np.int64, count=offsets[-1]
+    )
+    if values.shape[0] == 0 or (
+        values.min() >= np.iinfo(np.int32).min
+        and values.max() <= np.iinfo(np.int32).max
+    ):
+        values = values.astype(np.int32)
+    return offsets, values
+
+
+def unpack_lists(offsets, values):
+    """
+    Unpack (offsets, values) arrays into an object array of numpy views.
+
+    :param offsets: (np.ndarray) offsets (n + 1)
+    :param values: (np.ndarray) flat values
+    :return: (np.ndarray) object array of length n
+    """
+    ret = np.empty(offsets.shape[0] - 1, dtype=object)
+    ret[:] = np.split(np.asarray(values), np.asarray(offsets)[1:-1])
+    return ret
+
+
+# ------------------------------------------------------------------------------
+# generic store of arrays
+# ------------------------------------------------------------------------------
+def columnar_exists(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def store_size(path):
+    """
+    Human-readable size of a columnar store on disk.
+
+    :param path: (str) store directory
+    :return: (str) size of all files in the store
+    """
+    from .utils import format_bytes
+
+    if not os.path.isdir(path):
+        return format_bytes(0)
+    return format_bytes(
+        sum(os.path.getsize(os.path.join(path, _)) for _ in os.listdir(path))
+    )
+
+
+def write_arrays(path, arrays, meta={}):
+    """
+    Write a dictionary of numpy arrays into a columnar store.
+
+    :param path: (str) store directory
+    :param arrays: (dict) name -> np.ndarray
+    :param meta: (dict) JSON-serializable information stored in the manifest
+    """
+    assert isinstance(arrays, dict)
+    os.makedirs(path, exist_ok=True)
+
+    # the manifest is written last so that a partial store is never valid.
+    fmanifest = os.path.join(path, MANIFEST)
+    if os.path.isfile(fmanifest):
+        os.remove(fmanifest)
+    for _ in os.listdir(path):
+        if _.endswith(".npy"):
+            os.remove(os.path.join(path, _))
+
+    files = {}
+    for i, (key, arr) in enumerate(arrays.items()):
+        files[key] = f"{i}.npy"
+        np.save(os.path.join(path, files[key]), np.asarray(arr), allow_pickle=False)
+
+    manifest = {"version": COLUMNAR_VERSION, "arrays": files, "meta": meta}
+    ftmp = fmanifest + ".tmp"
+    with open(ftmp, "w") as fptr:
+        json.dump(manifest, fptr)
+    os.replace(ftmp, fmanifest)
+
+
+def read_manifest(path):
+    fname = os.path.join(path, MANIFEST)
+    if not os.path.isfile(fname):
+        raise ValueError(f"Did not find a columnar store in ({path}).")
+
+    with open(fname, "r") as fptr:
+        manifest = json.load(fptr)
+
+    if manifest.get("version") != COLUMNAR_VERSION:
+        raise ValueError(
+            f"Unsupported columnar store version ({manifest.get('version')}) "
+            f"in ({path}); expected ({COLUMNAR_VERSION})."
+        )
+    return manifest
+
+
+def read_arrays(path, keys=None, mmap=False):
+    """
+    Read the arrays of a columnar store.
+
+    :param path: (str) store directory
+    :param keys: (list) arrays to read, default reads all.
+    :param mmap: (bool) memory-map the arrays (copy-on-write) instead of
+    reading them.
+    :return: (dict, dict) arrays and meta information
+    """
+    manifest = read_manifest(path)
+    files = manifest["arrays"]
+    if keys is None:
+        keys = list(files.keys())
+
+    mmap_mode = "c" if mmap else None
+    arrays = {
+        k: np.load(
+            os.path.join(path, files[k]), mmap_mode=mmap_mode, allow_pickle=False
+        )
+        for k in keys
+    }
+    return arrays, manifest["meta"]
+
+
+# ------------------------------------------------------------------------------
+# dataframes
+# ------------------------------------------------------------------------------
+def _is_int_lists(values):
+    """
+    Check if the values are int lists (or nulls), i.e., can be packed.
+    """
+    if not all(_is_list_like(_) or _is_null(_) for _ in values):
+        return False
+    flat = itertools.chain.from_iterable(_ for _ in values if _is_list_like(_))
+    return all(isinstance(_, (int, np.integer)) for _ in flat)
+
+
+def _encode_pickle(values):
+    """
+    Pickle the values of an object column into (offsets, bytes) arrays.
+    """
+    values = [pickle.dumps(_, protocol=pickle.HIGHEST_PROTOCOL) for _ in values]
+    lengths = np.fromiter((len(_) for _ in values), dtype=np.int64, count=len(values))
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return {"offsets": offsets, "values": np.frombuffer(b"".join(values), np.uint8)}
+
+
+def _decode_pickle(offsets, values):
+    offsets, values = np.asarray(offsets), np.asarray(values)
+    ret = np.empty(offsets.shape[0] - 1, dtype=object)
+    for i in range(ret.shape[0]):
+        ret[i] = pickle.loads(values[offsets[i] : offsets[i + 1]].tobytes())
+    return ret
+
+
+def _encode_column(series, kind=None):
+    """
+    Encode a pandas column into typed arrays.
+
+    :param series: (pd.Series) column
+    :param kind: (str) kind to encode the column as (e.g., the kind of a
+    stored column), default infers it from the values.
+    :return: (str, dict) kind of the column and its arrays; kind is None for
+    columns of hatchet nodes, which are stored with the graph.
+    """
+    if series.dtype.kind in "biuf" and kind in [None, "numeric"]:
+        return "numeric", {"data": series.to_numpy()}
+
+    values = series.to_numpy(dtype=object)
+    first = next((_ for _ in values if not _is_null(_)), None)
+
+    if isinstance(first, Node):
+        return None, {}
+
+    if kind == "list" or (kind is None and _is_list_like(first)):
+        if _is_int_lists(values):
+            offsets, flat = pack_lists(values)
+            return "list", {"offsets": offsets, "values": flat}
+
+    if kind == "category" or (kind is None and isinstance(first, str)):
+        codes, categories = pd.factorize(values)
+        if all(isinstance(_, str) for _ in categories):
+            return "category", {
+                "codes": codes.astype(np.int32),
+                "categories": np.array(list(categories), dtype=str),
+            }
+
+    return "pickle", _encode_pickle(values)
+
+
+def _decode_column(kind, arrays):
+    if kind == "numeric":
+        return arrays["data"]
+
+    if kind == "list":
+        return unpack_lists(arrays["offsets"], arrays["values"])
+
+    if kind == "pickle":
+        return _decode_pickle(arrays["offsets"], arrays["values"])
+
+    if kind == "category":
+        codes = np.asarray(arrays["codes"])
+        categories = np.append(arrays["categories"].astype(object), None)
+        return categories[codes]
+
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def write_df(path, df):
+    """
+    Write a dataframe into a columnar store. Named indexes are stored as
+    columns.
+
+    :param path: (str) store directory
+    :param df: (pd.DataFrame) dataframe
+    """
+    assert isinstance(df, pd.DataFrame)
+    has_named_index = any(_ is not None for _ in df.index.names)
+    df = df.reset_index(drop=not has_named_index)
+
+    arrays, columns = {}, []
+    for column in df.columns:
+        kind, parts = _encode_column(df[column])
+        if kind is None:
+            LOGGER.debug(f'Skipping the column of hatchet nodes "{column}"')
+            continue
+
+        columns.append({"name": column, "kind": kind})
+        for part, arr in parts.items():
+            arrays[f"{column}/{part}"] = arr
+
+    write_arrays(path, arrays, meta={"nrows": len(df), "columns": columns})
+
+
+def read_df(path, columns=None, mmap=False):
+    """
+    Read a dataframe from a columnar store.
+
+    :param path: (str) store directory
+    :param columns: (list) columns to read, default reads all.
+    :param mmap: (bool) memory-map the numeric columns.
+    :return: (pd.DataFrame) dataframe
+    """
+    manifest = read_manifest(path)
+    stored = [
+        _
+        for _ in manifest["meta"]["columns"]
+        if columns is None or _["name"] in columns
+    ]
+    names = [_["name"] for _ in stored]
+
+    keys = [k for k in manifest["arrays"] if k.rsplit("/", 1)[0] in names]
+    arrays, _ = read_arrays(path, keys=keys, mmap=mmap)
+
+    parts = {name: {} for name in names}
+    for key, arr in arrays.items():
+        name, part = key.rsplit("/", 1)
+        parts[name][part] = arr
+
+    # copy=False keeps the memory-mapped columns backed by the store.
+    data = {_["name"]: _decode_column(_["kind"], parts[_["name"]]) for _ in stored}
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def append_df(path, df):
+    """
+    Append the rows of a dataframe to a columnar store. The stored arrays are
+    memory-mapped and concatenated with the new ones, so the stored columns
+    are not decoded (e.g., list columns are not unpacked).
+
+    :param path: (str) store directory
+    :param df: (pd.DataFrame) dataframe with the same columns as the store
+    """
+    assert isinstance(df, pd.DataFrame)
+    if len(df) == 0:
+        return
+
+    manifest = read_manifest(path)
+    stored = manifest["meta"]["columns"]
+
+    names = [_["name"] for _ in stored]
+    if set(names) != set(df.columns):
+        raise ValueError(
+            f"Cannot append columns {sorted(df.columns)} to the columnar store "
+            f"({path}) of columns {sorted(names)}."
+        )
+
+    arrays, _ = read_arrays(path, mmap=True)
+    merged = {}
+    for column in stored:
+        name, kind = column["name"], column["kind"]
+        new_kind, parts = _encode_column(df[name], kind)
+        if new_kind != kind:
+            raise ValueError(
+                f'Cannot append a "{new_kind}" column to the "{kind}" column '
+                f'"{name}" of the columnar store ({path}).'
+            )
+        old = {
+            k.rsplit("/", 1)[1]: v
+            for k, v in arrays.items()
+            if k.startswith(name + "/")
+        }
+        for part, arr in _append_column(kind, old, parts).items():
+            merged[f"{name}/{part}"] = arr
+
+    nrows = manifest["meta"]["nrows"] + len(df)
+    write_arrays(path, merged, meta={"nrows": nrows, "columns": stored})
+
+
+def _append_column(kind, old, new):
+    """
+    Concatenate the encoded arrays of a column.
+    """
+    if kind == "numeric":
+        return {"data": np.concatenate([old["data"], new["data"]])}
+
+    if kind in ["list", "pickle"]:
+        offsets = np.concatenate(
+            [old["offsets"], new["offsets"][1:] + old["offsets"][-1]]
+        )
+        return {
+            "offsets": offsets,
+            "values": np.concatenate([old["values"], new["values"]]),
+        }
+
+    if kind == "category":
+        # codes of the new rows are remapped to the merged categories (the
+        # null code -1 stays -1).
+        categories = pd.Index(old["categories"])
+        missing = [_ for _ in new["categories"] if _ not in categories]
+        categories = categories.append(pd.Index(missing, dtype=object))
+        remap = np.append(categories.get_indexer(new["categories"]), -1)
+        return {
+            "codes": np.concatenate(
+                [old["codes"], remap[new["codes"]].astype(np.int32)]
+            ),
+            "categories": np.array(list(categories), dtype=str),
+        }
+
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def read_columns(path):
+    """
+    Column names of a dataframe stored in a columnar store.
+
+    :param path: (str) store directory
+    :return: (list) column names
+    """
+    return [_["name"] for _ in read_manifest(path)["meta"]["columns"]]
@@ -6,6 +6,7 @@
 
 import numpy as np
 import pandas as pd
+from collections.abc import Mapping
 
 
 # ------------------------------------------------------------------------------
@@ -105,47 +106,132 @@ def df_group_by(df, columns, proxy={}):
         return df.groupby([columns])
 
 
-def df_bi_level_group(df, group_attrs, cols, group_by, apply_func, proxy={}):
+class DFGroupSlices(Mapping):
+    """
+    Read-only mapping from a group key to a contiguous slice of a dataframe
+    sorted by the key. The slices are views and are not copied on access.
+    """
+
+    def __init__(self, df, keys, offsets):
+        assert offsets.shape[0] == len(keys) + 1
+        self.df = df
+        self.offsets = offsets
+        self._pos = {k: i for i, k in enumerate(keys)}
+
+    def __getitem__(self, key):
+        i = self._pos[key]
+        return self.df.iloc[self.offsets[i] : self.offsets[i + 1]]
+
+    def __contains__(self, key):
+        return key in self._pos
+
+    def __iter__(self):
+        return iter(self._pos)
+
+    def __len__(self):
+        return len(self._pos)
+
+    def take(self, keys):
+        """
+        Rows of several groups at once.
+
+        :param keys: (list) group keys (present in the mapping)
+        :return: (np.array, np.array) offsets of the groups (len(keys) + 1)
+        and the row numbers of their slices in self.df
+        """
+        pos = np.array([self._pos[_] for _ in keys], dtype=np.int64)
+        starts = self.offsets[pos]
+        lengths = self.offsets[pos + 1] - starts
 
-    assert len(group_attrs) in [1, 2]
-    _cols = [proxy.get(_, _) for _ in cols] + group_by
+        offsets = np.zeros(pos.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        rows = np.repeat(starts - offsets[:-1], lengths)
+        rows += np.arange(offsets[-1], dtype=np.int64)
+        return offsets, rows
 
-    # Set the df.index as the group_attrs
-    _df = df.set_index(group_attrs)
-    _levels = _df.index.unique().tolist()
+
+def df_group_slices(df, group_attr, cols, group_by, proxy={}):
+    """
+    Group the dataframe by a column in a single pass.
+
+    The rows are aggregated by (group_attr, *group_by) using the mean and
+    sorted once; each value of group_attr is then served as a slice of the
+    aggregated dataframe. If the dataframe has a single rank, the rows are
+    not aggregated and only sorted by group_attr.
+
+    :param df: dataframe
+    :param group_attr: (str) column to group by (e.g., "name", "module")
+    :param cols: (list) columns to aggregate
+    :param group_by: (list) columns to aggregate over (e.g., ["rank"],
+    ["dataset", "rank"])
+    :param proxy: column proxies
+    :return: (DFGroupSlices) group_attr value -> dataframe of group_by + cols
+    """
+    cols = [proxy.get(_, _) for _ in cols]
 
     # If "rank" is present in the columns, we will group by "rank".
-    has_rank = "rank" in _df.columns
+    has_rank = "rank" in df.columns
     if has_rank:
         has_rank = df["rank"].unique().shape[0] > 1
 
-    # --------------------------------------------------------------------------
     if not has_rank:
-        _cols = [c for c in _cols if c != "rank"]
-        return {_: _df.xs(_)[_cols] for _ in _levels}
-
-    elif len(group_attrs) == 1:
-        if len(group_by) == 0:
-            _cols = _cols + ["rank"]
-            return {_: _df.xs(_)[_cols] for _ in _levels}
-        else:
-            return {
-                _: (_df.xs(_)[_cols].groupby(group_by).mean()).reset_index()
-                for _ in _levels
-            }
-
-    elif len(group_attrs) == 2:
-        if len(group_by) == 0:
-            _cols = _cols + ["rank"]
-            return {_: _df.xs(_)[_cols] for (_, __) in _levels}
-        else:
-            return {
-                _: (_df.xs(_)[_cols].groupby(group_by).mean()).reset_index()
-                for (_, __) in _levels
-            }
-
-    # --------------------------------------------------------------------------
-    assert False, "Invalid scenario"
+        group_by = [_ for _ in group_by if _ != "rank"]
+        order = np.argsort(df[group_attr].to_numpy(), kind="stable")
+        _df = df[cols + group_by].take(order).reset_index(drop=True)
+        _keys = df[group_attr].to_numpy()[order]
+    else:
+        _df = df.groupby([group_attr] + group_by, sort=True)[cols].mean()
+        _df = _df.reset_index()
+        _keys = _df[group_attr].to_numpy()
+        _df = _df[group_by + cols]
+
+    keys, starts = np.unique(_keys, return_index=True)
+    offsets = np.append(starts, _keys.shape[0]).astype(np.int64)
+    return DFGroupSlices(_df, keys.tolist(), offsets)
+
+
+def df_map_dict(df, column, apply_dict, default=None, proxy={}):
+    """
+    Map the values of a column with a dictionary, i.e., the equivalent of
+    df[column].apply(lambda _: apply_dict.get(_, default)).
+
+    The column is factorized so that the dictionary is looked up once per
+    unique value, and the result is gathered from a lookup array with the
+    codes. Columns of unhashable values (e.g., lists) fall back to the
+    row-wise apply.
+
+    :param df: dataframe
+    :param column: (str) column to map
+    :param apply_dict: (dict) mapping
+    :param default: value of the keys not in apply_dict
+    :param proxy: column proxies
+    :return: (pd.Series) mapped column
+    """
+    series = df[proxy.get(column, column)]
+    _get = lambda _: apply_dict.get(_, default)
+
+    try:
+        codes, uniques = pd.factorize(series, sort=False)
+    except TypeError:
+        return series.apply(_get)
+
+    # the null values (code -1) are looked up row-wise, since None and NaN
+    # may map differently.
+    is_null = codes == -1
+    nulls = series.to_numpy()[is_null]
+    if nulls.shape[0] > 0:
+        codes = codes.copy()
+        codes[is_null] = np.arange(len(uniques), len(uniques) + nulls.shape[0])
+
+    lut = np.empty(len(uniques) + nulls.shape[0], dtype=object)
+    for i, _ in enumerate(uniques):
+        lut[i] = _get(_)
+    for i, _ in enumerate(nulls):
+        lut[len(uniques) + i] = _get(_)
+
+    # infer the dtype of the lookup array as the row-wise apply does.
+    lut = pd.Series(lut, dtype=object).infer_objects().to_numpy()
+    return pd.Series(lut.take(codes), index=series.index, name=series.name)
 
 
 def df_column_mean(df, column, proxy={}):
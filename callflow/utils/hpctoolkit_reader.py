@@ -0,0 +1,183 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+"""
+CallFlow's streaming reader of the HPCToolkit databases.
+"""
+import os
+import re
+import glob
+
+import numpy as np
+import pandas as pd
+import hatchet as ht
+from hatchet.readers.hpctoolkit_reader import HPCToolkitReader
+
+import callflow
+
+LOGGER = callflow.get_logger(__name__)
+
+_METRICDB_RE = re.compile(r"\-(\d+)\-(\d+)\-([\w\d]+)\-(\d+)\-\d.metric-db$")
+
+
+# ------------------------------------------------------------------------------
+class HPCToolkitStreamReader(HPCToolkitReader):
+    """
+    Reader of an HPCToolkit database that produces the same GraphFrame as
+    hatchet.GraphFrame.from_hpctoolkit, with a lower peak memory for large
+    rank counts.
+
+    hatchet reads all the metric-db files into a shared array, and then
+    merges and sorts it with the nodes (i.e., several copies of the node x
+    rank frame). Here, the calling context tree is parsed by hatchet without
+    the metrics, and the metric-db files are read a chunk of ranks at a time
+    into an array per metric (in node x rank order), from which the dataframe
+    is built. Only a chunk of the metric-db files is held besides these
+    arrays, instead of the copies made by hatchet's merge and sort.
+    """
+
+    def __init__(self, dir_name, chunk_size=64):
+        """
+        Constructor to the streaming reader.
+
+        :param dir_name: (str) HPCToolkit database directory
+        :param chunk_size: (int) number of metric-db files read at a time
+        """
+        super().__init__(dir_name)
+        assert chunk_size > 0
+        self.chunk_size = chunk_size
+        self.statements = []  # (nid, parent nid) of the statement nodes
+
+    # --------------------------------------------------------------------------
+    # hatchet's graph construction, without the metrics
+    def read_all_metricdb_files(self):
+        metric_names = [self.metric_names[_] for _ in sorted(self.metric_names.keys())]
+        _rename = {
+            "CPUTIME (usec) (E)": "time",
+            "CPUTIME (sec) (E)": "time",
+            "CPUTIME (usec) (I)": "time (inc)",
+            "CPUTIME (sec) (I)": "time (inc)",
+        }
+        self.metric_columns = [_rename.get(_, _) for _ in metric_names]
+
+        columns = self.metric_columns + ["nid", "rank"]
+        if self.num_threads_per_rank > 1:
+            columns.append("thread")
+        self.df_metrics = pd.DataFrame({_: np.array([], dtype=float) for _ in columns})
+        self.df_metrics["nid"] = self.df_metrics["nid"].astype(int)
+
+        # no metrics to subtract while parsing (see read_metrics).
+        self.np_metrics = np.zeros((0, len(self.metric_columns)))
+        self.total_execution_threads = 0
+
+    def parse_xml_node(self, xml_node, parent_nid, parent_line, hparent):
+        if xml_node.tag == "S":
+            self.statements.append((int(xml_node.get("i")), parent_nid))
+        super().parse_xml_node(xml_node, parent_nid, parent_line, hparent)
+
+    # --------------------------------------------------------------------------
+    def read(self):
+        """
+        Read the HPCToolkit database.
+
+        :return: (hatchet.GraphFrame)
+        """
+        gf = super().read()
+        nodes = pd.DataFrame.from_dict(data=self.node_dicts)
+
+        # hatchet sorts the rows by node (i.e., its _hatchet_nid), then by
+        # rank and thread.
+        nodes["_order"] = [_._hatchet_nid for _ in nodes["node"]]
+        nodes = nodes.sort_values("_order", kind="stable").reset_index(drop=True)
+
+        files = self._metricdb_files()
+        with_threads = self.num_threads_per_rank > 1
+        metrics = self.read_metrics(files, nodes["nid"].to_numpy(dtype=np.int64))
+
+        LOGGER.debug(f"Building the dataframe of {len(nodes) * len(files)} rows")
+        data = {k: v.reshape(-1) for k, v in metrics.items()}
+        data["nid"] = np.repeat(nodes["nid"].to_numpy(dtype=np.int64), len(files))
+        for column in ["name", "type", "file", "line", "module"]:
+            data[column] = np.repeat(nodes[column].to_numpy(), len(files))
+        df = pd.DataFrame(data)
+        del data, metrics
+
+        _nodes = np.empty(len(nodes), dtype=object)
+        _nodes[:] = nodes["node"].tolist()
+        index = {
+            "node": np.repeat(_nodes, len(files)),
+            "rank": np.tile(
+                np.array([_[0] for _ in files], dtype=np.int64), len(nodes)
+            ),
+        }
+        if with_threads:
+            index["thread"] = np.tile(
+                np.array([_[1] for _ in files], dtype=np.int64), len(nodes)
+            )
+        df.index = pd.MultiIndex.from_arrays(list(index.values()), names=list(index))
+
+        return ht.GraphFrame(gf.graph, df, gf.exc_metrics, gf.inc_metrics)
+
+    def _metricdb_files(self):
+        """
+        Metric-db files sorted by (rank, thread).
+
+        :return: (list) (rank, thread, filename)
+        """
+        files = []
+        for fname in glob.glob(os.path.join(self.dir_name, "*.metric-db")):
+            match = _METRICDB_RE.search(fname)
+            files.append((int(match.group(1)), int(match.group(2)), fname))
+        return sorted(files)
+
+    def read_metrics(self, files, nids):
+        """
+        Read the metric-db files a chunk at a time into an array per metric.
+        The exclusive metrics of the statements are subtracted from their
+        parents (as hatchet does).
+
+        :param files: (list) (rank, thread, filename) in the order of the rows
+        :param nids: (np.array) nids of the rows, in order
+        :return: (dict) metric -> np.array of shape (len(nids), len(files))
+        """
+        is_exc = ["(inc)" not in _ and "(I)" not in _ for _ in self.metric_columns]
+        stmts = np.array(self.statements, dtype=np.int64).reshape(-1, 2) - 1
+        assert len(np.intersect1d(stmts[:, 0], stmts[:, 1])) == 0
+
+        metrics = {
+            column: np.empty((nids.shape[0], len(files)), dtype=np.float64)
+            for column in self.metric_columns
+        }
+
+        for start in range(0, len(files), self.chunk_size):
+            chunk = files[start : start + self.chunk_size]
+            values = np.empty(
+                (len(chunk), self.num_nodes, self.num_metrics), dtype=np.float64
+            )
+            for i, (rank, thread, fname) in enumerate(chunk):
+                with open(fname, "rb") as fptr:
+                    fptr.seek(32)
+                    values[i] = np.fromfile(
+                        fptr,
+                        dtype=np.dtype(">f8"),
+                        count=self.num_nodes * self.num_metrics,
+                    ).reshape(self.num_nodes, self.num_metrics)
+
+            for j, column in enumerate(self.metric_columns):
+                _values = values[:, :, j]
+                if is_exc[j] and stmts.shape[0] > 0:
+                    # the statements are never parents of statements, so the
+                    # subtractions are independent of each other.
+                    np.subtract.at(_values.T, stmts[:, 1], _values.T[stmts[:, 0]])
+                metrics[column][:, start : start + len(chunk)] = _values[:, nids - 1].T
+
+            LOGGER.debug(
+                f"Read {start + len(chunk)}/{len(files)} metric-db files of "
+                f"({self.dir_name})"
+            )
+        return metrics
+
+
+# ------------------------------------------------------------------------------
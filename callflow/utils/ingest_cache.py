@@ -0,0 +1,451 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+"""
+CallFlow's cache of the hatchet GraphFrames read from the profiles.
+
+The stale entries can be evicted from the command line, e.g.,
+
+    $ python -m callflow.utils.ingest_cache /path/to/.callflow/ingest-cache --stale
+"""
+import os
+import time
+import json
+import pickle
+import shutil
+import hashlib
+import argparse
+import subprocess
+import multiprocessing
+
+import numpy as np
+import hatchet as ht
+
+import callflow
+from callflow.utils.columnar import pack_lists, unpack_lists
+
+LOGGER = callflow.get_logger(__name__)
+
+
+# ------------------------------------------------------------------------------
+class IngestCache:
+    """
+    Content-addressed cache of the hatchet GraphFrames read from the profiles.
+
+    An entry is keyed on the profile format and the size, modification time
+    and content hash of every file of the profile, so a modified profile is
+    read again. Each entry is a directory that is written under a temporary
+    name and renamed, so that concurrent workers never read a partial entry.
+
+    The graph is stored as arrays of node indexes (instead of a pickle of the
+    nodes), which neither recurses over deep graphs nor duplicates the nodes
+    of the dataframe's index.
+
+    The .cali files are converted to the json-split format (by cali-query)
+    under the same key, so that a directory of .cali files can be converted
+    in parallel before the runs are read.
+    """
+
+    _FILENAMES = {"gf": "gf.pkl", "meta": "meta.json", "cali-json": ".cali-json"}
+
+    # profile formats read from files
+    FORMATS = ["hpctoolkit", "caliper", "caliper_json", "gprof"]
+
+    def __init__(self, cache_dir):
+        """
+        Constructor to the ingestion cache.
+
+        :param cache_dir: (str) directory of the cache (created if needed)
+        """
+        assert isinstance(cache_dir, str) and len(cache_dir) > 0
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __str__(self):
+        return f"IngestCache<{self.cache_dir}; {len(self.entries())} entries>"
+
+    def __repr__(self):
+        return self.__str__()
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def is_cacheable(data_path, profile_format):
+        return (
+            profile_format in IngestCache.FORMATS
+            and isinstance(data_path, str)
+            and os.path.exists(data_path)
+        )
+
+    @staticmethod
+    def key(data_path, profile_format):
+        """
+        Key of a profile, i.e., the sha1 of its format and the name, size,
+        modification time and content of every file of the profile. The
+        hidden directories (e.g., .callflow) are skipped.
+
+        :param data_path: (str) file or directory of the profile
+        :param profile_format: (str) profile format
+        :return: (str) sha1 hex digest
+        """
+        sha = hashlib.sha1(f"{profile_format};".encode())
+        for fname in IngestCache._list_files(data_path):
+            stat = os.stat(fname)
+            relname = os.path.relpath(fname, data_path)
+            sha.update(f"{relname}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            with open(fname, "rb") as fptr:
+                for chunk in iter(lambda: fptr.read(1 << 20), b""):
+                    sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _list_files(path):
+        if os.path.isfile(path):
+            return [path]
+
+        ret = []
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(_ for _ in dirs if not _.startswith("."))
+            ret.extend(os.path.join(root, _) for _ in sorted(files))
+        return ret
+
+    def entries(self):
+        """
+        Keys of the entries in the cache.
+        """
+        return sorted(
+            _
+            for _ in os.listdir(self.cache_dir)
+            if not _.startswith(".") and os.path.isdir(os.path.join(self.cache_dir, _))
+        )
+
+    def has(self, key):
+        return os.path.isfile(
+            os.path.join(self.cache_dir, key, IngestCache._FILENAMES["gf"])
+        )
+
+    def cali_json(self, key):
+        """
+        Path of the json-split file of a .cali file.
+        """
+        return os.path.join(
+            self.cache_dir, IngestCache._FILENAMES["cali-json"], f"{key}.json"
+        )
+
+    # --------------------------------------------------------------------------
+    def get(self, key):
+        """
+        Read the GraphFrame of an entry.
+
+        :param key: (str) key
+        :return: (hatchet.GraphFrame) None on a miss.
+        """
+        path = os.path.join(self.cache_dir, key)
+        fname = os.path.join(path, IngestCache._FILENAMES["gf"])
+        if not os.path.isfile(fname):
+            return None
+
+        try:
+            with open(fname, "rb") as fptr:
+                gf = IngestCache._unflatten(pickle.load(fptr))
+        except Exception as e:
+            LOGGER.warning(f"Ignoring the ingestion cache entry ({path}): {e}")
+            return None
+
+        # the modification time of an entry is its last access (for eviction).
+        os.utime(path)
+        LOGGER.debug(f"Read the hatchet GraphFrame from ({path})")
+        return gf
+
+    def put(self, key, gf, data_path="", profile_format=""):
+        """
+        Write the GraphFrame of an entry. A concurrent writer of the same
+        entry wins the race, since both write the same data.
+
+        :param key: (str) key
+        :param gf: (hatchet.GraphFrame) GraphFrame read from the profile
+        :param data_path: (str) file or directory of the profile
+        :param profile_format: (str) profile format
+        """
+        assert isinstance(gf, ht.GraphFrame)
+
+        path = os.path.join(self.cache_dir, key)
+        ftmp = os.path.join(self.cache_dir, f".{key}.{os.getpid()}.tmp")
+        os.makedirs(ftmp, exist_ok=True)
+        try:
+            with open(os.path.join(ftmp, IngestCache._FILENAMES["gf"]), "wb") as fptr:
+                pickle.dump(
+                    IngestCache._flatten(gf), fptr, protocol=pickle.HIGHEST_PROTOCOL
+                )
+            meta = {
+                "data_path": os.path.abspath(data_path),
+                "profile_format": profile_format,
+                "created": time.time(),
+            }
+            with open(os.path.join(ftmp, IngestCache._FILENAMES["meta"]), "w") as fptr:
+                json.dump(meta, fptr)
+            os.rename(ftmp, path)
+            LOGGER.debug(f"Wrote the hatchet GraphFrame to ({path})")
+
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+        finally:
+            shutil.rmtree(ftmp, ignore_errors=True)
+
+    def convert_caliper(self, cali_files, query, nworkers=0):
+        """
+        Convert .cali files to the json-split format with a bounded pool of
+        cali-query processes. The output of each process is streamed to the
+        cache. The files whose GraphFrame or JSON is cached are skipped.
+
+        :param cali_files: (dict) .cali file -> key
+        :param query: (str) cali-query query (in CalQL)
+        :param nworkers: (int) number of cali-query processes (0 uses all
+        cores)
+        :return: (dict) .cali file -> json-split file, for the files that are
+        converted (including the ones converted before)
+        """
+        cali_query = shutil.which("cali-query")
+        if cali_query is None:
+            LOGGER.warning("cali-query not found; cannot convert the .cali files")
+            return {}
+
+        if nworkers <= 0:
+            nworkers = multiprocessing.cpu_count()
+        os.makedirs(os.path.dirname(self.cali_json("")), exist_ok=True)
+
+        ret, pending = {}, {}
+        for fname, key in cali_files.items():
+            if os.path.isfile(self.cali_json(key)):
+                ret[fname] = self.cali_json(key)
+            elif not self.has(key):
+                pending.setdefault(key, fname)
+        pending = list(pending.items())
+
+        LOGGER.info(
+            f"Converting {len(pending)} .cali files with {nworkers} cali-query processes"
+        )
+        running = {}
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < nworkers:
+                key, fname = pending.pop()
+                ftmp = f"{self.cali_json(key)}.{os.getpid()}.tmp"
+                with open(ftmp, "wb") as fptr:
+                    proc = subprocess.Popen(
+                        [cali_query, "-q", query, fname],
+                        stdout=fptr,
+                        stderr=subprocess.DEVNULL,
+                    )
+                running[proc] = (key, fname, ftmp)
+
+            done = [_ for _ in running if _.poll() is not None]
+            for proc in done:
+                key, fname, ftmp = running.pop(proc)
+                if proc.returncode != 0:
+                    LOGGER.warning(f"cali-query failed ({proc.returncode}) on {fname}")
+                    os.remove(ftmp)
+                    continue
+                os.replace(ftmp, self.cali_json(key))
+
+            if len(done) == 0:
+                time.sleep(0.01)
+
+        ret.update(
+            {
+                fname: self.cali_json(key)
+                for fname, key in cali_files.items()
+                if os.path.isfile(self.cali_json(key))
+            }
+        )
+        return ret
+
+    # --------------------------------------------------------------------------
+    def evict(self, stale=False, max_age=0, max_bytes=0):
+        """
+        Evict entries from the cache.
+
+        :param stale: (bool) evict the entries whose profile is missing or has
+        changed
+        :param max_age: (float) evict the entries not accessed for max_age
+        seconds (0 disables it)
+        :param max_bytes: (int) evict the least recently accessed entries to
+        keep the cache under max_bytes (0 disables it)
+        :return: (list) keys of the evicted entries
+        """
+        now = time.time()
+        evicted = []
+
+        # temporaries of interrupted writes
+        cali_dir = os.path.dirname(self.cali_json(""))
+        for _dir in [self.cache_dir, cali_dir]:
+            for _ in os.listdir(_dir) if os.path.isdir(_dir) else []:
+                path = os.path.join(_dir, _)
+                if _.endswith(".tmp") and now - os.path.getmtime(path) > 86400:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+
+        entries = []
+        for key in self.entries():
+            path = os.path.join(self.cache_dir, key)
+            atime = os.path.getmtime(path)
+            if (stale and self._is_stale(key)) or (
+                max_age > 0 and now - atime > max_age
+            ):
+                evicted.append(key)
+                continue
+            nbytes = sum(os.path.getsize(_) for _ in IngestCache._list_files(path))
+            entries.append((atime, key, nbytes))
+
+        if max_bytes > 0:
+            nbytes = sum(_[2] for _ in entries)
+            for atime, key, _nbytes in sorted(entries):
+                if nbytes <= max_bytes:
+                    break
+                evicted.append(key)
+                nbytes -= _nbytes
+
+        for key in evicted:
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+        # the json-split files are evicted with their entry, or by their age.
+        for _ in os.listdir(cali_dir) if os.path.isdir(cali_dir) else []:
+            path = os.path.join(cali_dir, _)
+            is_old = max_age > 0 and now - os.path.getmtime(path) > max_age
+            if _.endswith(".json") and (_[: -len(".json")] in evicted or is_old):
+                os.remove(path)
+
+        LOGGER.info(f"Evicted {len(evicted)} entries from ({self.cache_dir})")
+        return evicted
+
+    def _is_stale(self, key):
+        try:
+            fname = os.path.join(self.cache_dir, key, IngestCache._FILENAMES["meta"])
+            with open(fname, "r") as fptr:
+                meta = json.load(fptr)
+        except (OSError, ValueError):
+            return True
+
+        data_path, profile_format = meta["data_path"], meta["profile_format"]
+        if not IngestCache.is_cacheable(data_path, profile_format):
+            return True
+        return IngestCache.key(data_path, profile_format) != key
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _flatten(gf):
+        """
+        GraphFrame as flat data: the nodes are replaced by their positions.
+        """
+        nodes, pos = [], {}
+        stack = list(reversed(gf.graph.roots))
+        while len(stack) > 0:
+            node = stack.pop()
+            if id(node) in pos:
+                continue
+            pos[id(node)] = len(nodes)
+            nodes.append(node)
+            stack.extend(reversed(node.children))
+
+        _pos = lambda _: [pos[id(n)] for n in _]  # noqa: E731
+        df = gf.dataframe
+        index_names = list(df.index.names)
+        df = df.reset_index()
+        df["node"] = np.fromiter(map(pos.get, map(id, df["node"])), dtype=np.int64)
+
+        _skip = ["frame", "parents", "children"]
+        return {
+            "frames": [_.frame.attrs for _ in nodes],
+            "attrs": [
+                {k: v for k, v in vars(_).items() if k not in _skip} for _ in nodes
+            ],
+            "parents": pack_lists([_pos(_.parents) for _ in nodes]),
+            "children": pack_lists([_pos(_.children) for _ in nodes]),
+            "roots": _pos(gf.graph.roots),
+            "node_ordering": gf.graph.node_ordering,
+            "dataframe": df,
+            "index_names": index_names,
+            "exc_metrics": gf.exc_metrics,
+            "inc_metrics": gf.inc_metrics,
+            "default_metric": gf.default_metric,
+            "metadata": gf.metadata,
+        }
+
+    @staticmethod
+    def _unflatten(data):
+        """
+        GraphFrame of the flat data of IngestCache._flatten.
+        """
+        nodes = []
+        for frame, attrs in zip(data["frames"], data["attrs"]):
+            node = ht.node.Node(ht.frame.Frame(frame))
+            vars(node).update(attrs)
+            nodes.append(node)
+
+        parents = unpack_lists(*data["parents"])
+        children = unpack_lists(*data["children"])
+        for node, _parents, _children in zip(nodes, parents, children):
+            node.parents = [nodes[_] for _ in _parents.tolist()]
+            node.children = [nodes[_] for _ in _children.tolist()]
+
+        graph = ht.graph.Graph(
+            [nodes[_] for _ in data["roots"]], node_ordering=data["node_ordering"]
+        )
+
+        _nodes = np.empty(len(nodes), dtype=object)
+        _nodes[:] = nodes
+        df = data["dataframe"]
+        df["node"] = _nodes[df["node"].to_numpy()]
+        df = df.set_index(data["index_names"])
+
+        return ht.GraphFrame(
+            graph,
+            df,
+            data["exc_metrics"],
+            data["inc_metrics"],
+            default_metric=data["default_metric"],
+            metadata=data["metadata"],
+        )
+
+
+# ------------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evict entries from CallFlow's ingestion cache."
+    )
+    parser.add_argument("cache_dir", type=str, help="Ingestion cache directory")
+    parser.add_argument(
+        "--stale",
+        action="store_true",
+        help="Evict the entries whose profile is missing or has changed",
+    )
+    parser.add_argument(
+        "--max_age_days",
+        type=float,
+        default=0,
+        help="Evict the entries not accessed for this many days (0 disables it)",
+    )
+    parser.add_argument(
+        "--max_bytes",
+        type=int,
+        default=0,
+        help="Evict the least recently accessed entries above this size "
+        "(0 disables it)",
+    )
+    args = parser.parse_args()
+
+    cache = IngestCache(args.cache_dir)
+    evicted = cache.evict(
+        stale=args.stale, max_age=args.max_age_days * 86400, max_bytes=args.max_bytes
+    )
+    for key in evicted:
+        print(key)
+
+
+if __name__ == "__main__":
+    main()
+
+# ------------------------------------------------------------------------------
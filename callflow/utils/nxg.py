@@ -3,7 +3,69 @@
 #
 # SPDX-License-Identifier: MIT
 # ------------------------------------------------------------------------------
+import itertools
 
 
 def nxg_info(nxg):
     return f"Nodes: {len(nxg.nodes())}, edges: {len(nxg.edges())}."
+
+
+def nxg_back_edges(nxg, sources=None, spanning_tree=False):
+    """
+    Edges whose removal breaks all the cycles of a directed graph, i.e., the
+    back edges of a depth-first search.
+
+    The search uses an explicit stack (i.e., it is not limited by the depth
+    of the graph) and runs in O(V + E). It starts from the sources, then
+    from the nodes that are not yet visited, and visits the successors in
+    the order of the graph, so the edges are the same across the calls.
+
+    :param nxg: (nx.DiGraph) graph
+    :param sources: (list) nodes to start from, default is the nodes without
+    predecessors
+    :param spanning_tree: (bool) also return the forward and cross edges,
+    i.e., all the edges that are not in the depth-first spanning forest
+    :return: (list) edges (source, target), in the order they are found
+    """
+    assert nxg.is_directed()
+    if sources is None:
+        sources = [_ for _ in nxg if nxg.in_degree(_) == 0]
+
+    # 1: on the stack, 2: visited (the nodes not visited are absent)
+    color = {}
+    edges = []
+    for root in itertools.chain(sources, nxg):
+        if root in color:
+            continue
+
+        color[root] = 1
+        stack = [(root, iter(nxg.succ[root]))]
+        while len(stack) > 0:
+            node, children = stack[-1]
+            for child in children:
+                if child not in color:
+                    color[child] = 1
+                    stack.append((child, iter(nxg.succ[child])))
+                    break
+                if spanning_tree or color[child] == 1:
+                    edges.append((node, child))
+            else:
+                color[node] = 2
+                stack.pop()
+
+    return edges
+
+
+def nxg_remove_back_edges(nxg, sources=None, spanning_tree=False):
+    """
+    Remove the back edges of a depth-first search (see nxg_back_edges), so
+    that the graph is acyclic (or a forest, if spanning_tree).
+
+    :param nxg: (nx.DiGraph) graph (updated in place)
+    :param sources: (list) nodes to start from
+    :param spanning_tree: (bool) also remove the forward and cross edges
+    :return: (list) removed edges
+    """
+    edges = nxg_back_edges(nxg, sources, spanning_tree)
+    nxg.remove_edges_from(edges)
+    return edges
@@ -130,15 +130,20 @@ def freedman_diaconis_bins(arr):
         return int(np.ceil((arr.max() - arr.min()) / h))
 
 
-def outliers(data, scale=1.5, side="both"):
+def outliers(data, scale=1.5, side="both", quartiles=None):
 
     assert isinstance(data, (pd.Series, np.ndarray))
     assert len(data.shape) == 1
     assert isinstance(scale, float)
     assert side in ["gt", "lt", "both"]
 
-    d_q13 = np.percentile(data, [25.0, 75.0])
-    iqr_distance = np.multiply(stats.iqr(data), scale)
+    # the (25, 75) quartiles can be passed if they are precomputed.
+    if quartiles is None:
+        d_q13 = np.percentile(data, [25.0, 75.0])
+        iqr_distance = np.multiply(stats.iqr(data), scale)
+    else:
+        d_q13 = np.asarray(quartiles, dtype=np.float64)
+        iqr_distance = np.multiply(d_q13[1] - d_q13[0], scale)
 
     if side in ["gt", "both"]:
         upper_range = d_q13[1] + iqr_distance
@@ -156,6 +161,56 @@ def outliers(data, scale=1.5, side="both"):
         return np.logical_or(upper_outlier, lower_outlier)
 
 
+def rank_priority(ranks):
+    """
+    Pseudo-random priority of the ranks (a 64-bit hash of the rank ids), i.e.,
+    a sample of the lowest priorities picks the same ranks for all the nodes
+    and all the requests.
+
+    :param ranks: (np.array) rank ids
+    :return: (np.array) uint64 priorities
+    """
+    x = np.asarray(ranks).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def sample_points(data, ranks, max_points, iqr_scale=1.5):
+    """
+    Points returned by the sketch mode of the modules (e.g., histogram,
+    scatterplot): the outliers of each column (always kept, even above
+    max_points), the min and max of each column, and a sample of the other
+    ranks (see rank_priority) up to max_points.
+
+    :param data: (np.array) values, of shape (n, ) or (n, ncolumns)
+    :param ranks: (np.array) rank of each value
+    :param max_points: (int) maximum number of points, 0 keeps all
+    :param iqr_scale: (float) IQR scale of the outliers
+    :return: (np.array) sorted positions of the points
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+
+    n = data.shape[0]
+    if max_points <= 0 or n <= max_points:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    for column in data.T:
+        keep |= outliers(column, scale=iqr_scale)
+        keep[[np.argmin(column), np.argmax(column)]] = True
+
+    nfill = max_points - np.count_nonzero(keep)
+    if nfill > 0:
+        rest = np.flatnonzero(~keep)
+        priority = rank_priority(np.asarray(ranks)[rest])
+        keep[rest[np.argsort(priority, kind="stable")[:nfill]]] = True
+    return np.flatnonzero(keep)
+
+
 # def kde(
 #     data, gridsize=10, fft=True, kernel="gau", bw="scott", cut=3, clip=(-np.inf, np.inf)
 # ):
@@ -352,8 +407,12 @@ class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.ndarray):
             return obj.tolist()
-        if isinstance(obj, np.int64):
+        if isinstance(obj, np.integer):
             return int(obj)
+        if isinstance(obj, np.floating):
+            return float(obj)
+        if isinstance(obj, np.bool_):
+            return bool(obj)
         return json.JSONEncoder.default(self, obj)
 
 
@@ -0,0 +1,78 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+"""
+Benchmark of the dictionary mapping of a dataframe column, i.e., the
+row-wise apply used by df_add_column(apply_dict=...) before, and
+callflow.utils.df.df_map_dict.
+
+The dataframe mimics a rank x node dataframe of SuperGraph.create: the
+callsites are repeated for every rank.
+
+    $ python experiments/benchmark_df_map_dict.py --ncallsites 5000 --nranks 400
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from callflow.utils.df import df_map_dict
+
+
+def make_dataframe(ncallsites, nranks):
+    names = np.array([f"callsite_{i}" for i in range(ncallsites)], dtype=object)
+    return pd.DataFrame(
+        {
+            "name": np.tile(names, nranks),
+            "rank": np.repeat(np.arange(nranks), ncallsites),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ncallsites", type=int, default=5000)
+    parser.add_argument("--nranks", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_dataframe(args.ncallsites, args.nranks)
+    names = df["name"].unique().tolist()
+    cases = {
+        # factorize_callsites_and_modules (name -> idx)
+        "callsite2idx": ({_: i for i, _ in enumerate(names)}, None),
+        # add_callsites_and_modules_maps (name -> module)
+        "callsite2module": ({_: f"module_{i % 50}" for i, _ in enumerate(names)}, None),
+        # list values, some callsites are not in the dictionary
+        "group_path": ({_: [i % 50, i] for i, _ in enumerate(names[::2])}, []),
+    }
+
+    print(f"dataframe: {len(df)} rows, {len(names)} unique callsites")
+    print(f"{'case':>16} {'apply (s)':>10} {'df_map_dict (s)':>16} {'speedup':>8}")
+    for case, (apply_dict, default) in cases.items():
+        expected = df["name"].apply(lambda _: apply_dict.get(_, default))
+        result = df_map_dict(df, "name", apply_dict, default)
+        pd.testing.assert_series_equal(expected, result)
+
+        t_apply = min(
+            timeit.repeat(
+                lambda: df["name"].apply(lambda _: apply_dict.get(_, default)),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        t_map = min(
+            timeit.repeat(
+                lambda: df_map_dict(df, "name", apply_dict, default),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        print(f"{case:>16} {t_apply:>10.3f} {t_map:>16.3f} {t_apply / t_map:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from networkx.readwrite import json_graph
 
 import callflow
 from .provider_base import BaseProvider
+from .response_cache import ResponseCache
 from callflow.utils.utils import NumpyEncoder
 
 
@@ -55,8 +56,35 @@ class APIProvider(BaseProvider):
         """
         super().__init__(config)
         # self.production = production
+        self.cache = None
         self.handle_routes()
 
+    def load(self) -> None:
+        """
+        Load the processed datasets and create the response cache for them.
+        """
+        super().load()
+
+        save_path = self.config.get("save_path", "")
+        names = [_["name"] for _ in self.datasets]
+        if len(names) > 1:
+            names.append("ensemble")
+
+        fingerprint = ResponseCache.fingerprint_paths(
+            [os.path.join(save_path, _) for _ in names]
+        )
+        cache_dir = ""
+        if self.config.get("response_cache_disk", False):
+            cache_dir = os.path.join(save_path, "response-cache")
+
+        self.cache = ResponseCache(
+            fingerprint,
+            max_bytes=self.config.get("response_cache_bytes", 268435456),
+            cache_dir=cache_dir,
+            max_disk_bytes=self.config.get("response_cache_disk_bytes", 0),
+        )
+        LOGGER.info(f"Created the response cache: {self.cache.stats()}")
+
     def start(self, host: str, port: int) -> None:
         """
         Launch the Flask application.
@@ -91,6 +119,36 @@ class APIProvider(BaseProvider):
             warnings.warn(f"[API: {endpoint}] emits no data.")
             return jsonify(isError=True, message="Error", statusCode=500)
 
+    def emit_cached(self, endpoint: str, operation: dict, compute) -> str:
+        """
+        Emit the cached response of an operation. On a miss, the response is
+        computed and stored in the cache.
+
+        :param endpoint: Endpoint to emit information to.
+        :param operation: Operation requested to the endpoint (request json).
+        :param compute: Function that computes the json data of the response.
+        :return response: Response packed with data (in JSON format).
+        """
+        if self.cache is None:
+            return APIProvider.emit_json(endpoint, compute())
+
+        key = self.cache.key(endpoint, operation)
+        data = self.cache.get(key)
+        if data is None:
+            try:
+                data = ResponseCache.dumps(compute())
+            except ValueError:
+                warnings.warn(f"[API: {endpoint}] emits no data.")
+                return jsonify(isError=True, message="Error", statusCode=500)
+            self.cache.put(key, data)
+
+        response = app.response_class(
+            response=data, status=200, mimetype="application/json"
+        )
+        response.headers.add("Access-Control-Allow-Headers", "*")
+        response.headers.add("Access-Control-Allow-Methods", "*")
+        return response
+
     def handle_routes(self) -> None:  # noqa: C901
         """
         API endpoints
@@ -131,13 +189,23 @@ class APIProvider(BaseProvider):
             )
             return APIProvider.emit_json("timeline", result)
 
+        @app.route("/cache_stats", methods=["GET"])
+        @cross_origin()
+        def cache_stats():
+            result = self.cache.stats() if self.cache is not None else {}
+            return APIProvider.emit_json("cache_stats", result)
+
         @app.route("/single_supergraph", methods=["POST"])
         @cross_origin()
         def single_supergraph():
             data = request.json
-            nxg = self.request_single({"name": "supergraph", **data})
-            result = json_graph.node_link_data(nxg)
-            return APIProvider.emit_json("single_supergraph", result)
+            return self.emit_cached(
+                "single_supergraph",
+                data,
+                lambda: json_graph.node_link_data(
+                    self.request_single({"name": "supergraph", **data})
+                ),
+            )
 
         @app.route("/cct", methods=["POST"])
         @cross_origin()
@@ -163,9 +231,13 @@ class APIProvider(BaseProvider):
         @cross_origin()
         def ensemble_supergraph():
             data = request.json
-            nxg = self.request_ensemble({"name": "supergraph", **data})
-            result = json_graph.node_link_data(nxg)
-            return APIProvider.emit_json("ensemble_supergraph", result)
+            return self.emit_cached(
+                "ensemble_supergraph",
+                data,
+                lambda: json_graph.node_link_data(
+                    self.request_ensemble({"name": "supergraph", **data})
+                ),
+            )
 
         @app.route("/similarity", methods=["POST"])
         @cross_origin()
@@ -178,9 +250,14 @@ class APIProvider(BaseProvider):
         @cross_origin()
         def module_hierarchy():
             data = request.json
-            nxg = self.request_ensemble({"name": "module_hierarchy", **data})
-            result = json_graph.tree_data(nxg, root=data.get("node"))
-            return APIProvider.emit_json("module_hierarchy", result)
+            return self.emit_cached(
+                "module_hierarchy",
+                data,
+                lambda: json_graph.tree_data(
+                    self.request_ensemble({"name": "module_hierarchy", **data}),
+                    root=data.get("node"),
+                ),
+            )
 
         @app.route("/projection", methods=["POST"])
         @cross_origin()
@@ -200,8 +277,11 @@ class APIProvider(BaseProvider):
         @cross_origin()
         def single_histogram():
             data = request.json
-            result = self.request_single({"name": "histogram", **data})
-            return APIProvider.emit_json("single_histogram", result)
+            return self.emit_cached(
+                "single_histogram",
+                data,
+                lambda: self.request_single({"name": "histogram", **data}),
+            )
 
         @app.route("/single_scatterplot", methods=["POST"])
         @cross_origin()
@@ -214,15 +294,21 @@ class APIProvider(BaseProvider):
         @cross_origin()
         def single_boxplot():
             data = request.json
-            result = self.request_single({"name": "boxplots", **data})
-            return APIProvider.emit_json("single_boxplots", result)
+            return self.emit_cached(
+                "single_boxplots",
+                data,
+                lambda: self.request_single({"name": "boxplots", **data}),
+            )
 
         @app.route("/ensemble_histogram", methods=["POST"])
         @cross_origin()
         def ensemble_histogram():
             data = request.json
-            result = self.request_ensemble({"name": "histogram", **data})
-            return APIProvider.emit_json("ensemble_histogram", result)
+            return self.emit_cached(
+                "ensemble_histogram",
+                data,
+                lambda: self.request_ensemble({"name": "histogram", **data}),
+            )
 
         @app.route("/ensemble_scatterplot", methods=["POST"])
         @cross_origin()
@@ -235,15 +321,21 @@ class APIProvider(BaseProvider):
         @cross_origin()
         def ensemble_boxplot():
             data = request.json
-            result = self.request_ensemble({"name": "boxplots", **data})
-            return APIProvider.emit_json("ensemble_boxplots", result)
+            return self.emit_cached(
+                "ensemble_boxplots",
+                data,
+                lambda: self.request_ensemble({"name": "boxplots", **data}),
+            )
 
         @app.route("/gradients", methods=["POST"])
         @cross_origin()
         def gradients():
             data = request.json
-            result = self.request_ensemble({"name": "gradients", **data})
-            return APIProvider.emit_json("gradients", result)
+            return self.emit_cached(
+                "gradients",
+                data,
+                lambda: self.request_ensemble({"name": "gradients", **data}),
+            )
 
 
 # ------------------------------------------------------------------------------
@@ -5,23 +5,30 @@
 # ------------------------------------------------------------------------------
 
 import os
+import time
 import shutil
+import traceback
 import multiprocessing
 from functools import partial
 
+import psutil
+from networkx.readwrite import json_graph
+
 from callflow import SuperGraph, EnsembleGraph
 from callflow import get_logger
-from callflow.operations import Filter, Group, Unify
+from callflow.operations import Filter, Group, Unify, UnifyAppend
 
 from callflow.layout import NodeLinkLayout, SankeyLayout, HierarchyLayout
 
 from callflow.utils.sanitizer import Sanitizer
+from callflow.utils.utils import format_bytes
 from callflow.modules import (
     Histogram,
     Scatterplot,
     BoxPlot,
     ParameterProjection,
     DiffView,
+    NodeStats,
 )
 
 LOGGER = get_logger(__name__)
@@ -80,15 +87,19 @@ class BaseProvider:
         """
         _name = run_prop["name"]
         _path = os.path.join(save_path, _name)
-        process = False
-        for f_type in ["df", "nxg"]:
-            f_path = os.path.join(_path, SuperGraph._FILENAMES[f_type])
-            if not os.path.isfile(f_path):
-                process = True
-
-        if not process:
+        if SuperGraph.has_store(_path, ["df", "nxg"]):
             return run_prop
 
+    def convert_legacy_stores(self):
+        """
+        Convert the runs (and the ensemble) processed in the legacy format
+        (df.pkl, nxg.json, maps.json) into the columnar stores.
+        """
+        save_path = self.config.get("save_path", "")
+        names = [_["name"] for _ in self.config["runs"]] + ["ensemble"]
+        for name in names:
+            SuperGraph.convert_legacy_store(os.path.join(save_path, name))
+
     def load(self):
         """Load the processed datasets by the format."""
         load_path = self.config.get("save_path", "")
@@ -96,10 +107,25 @@ class BaseProvider:
 
         is_not_ensemble = self.ndatasets == 1
 
-        with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-            supergraphs = pool.map(
-                partial(self.mp_dataset_load, save_path=load_path), self.datasets
+        self.convert_legacy_stores()
+
+        # Lazy SuperGraphs only read the graph and the maps, so they are
+        # loaded in this process; their dataframes are memory-mapped on the
+        # first access and released by the LRU budget.
+        if not self.config.get("eager_load", False):
+            SuperGraph.set_load_budget(
+                runs=self.config.get("load_budget_runs", 0),
+                nbytes=self.config.get("load_budget_bytes", 0),
             )
+            supergraphs = [
+                self.mp_dataset_load(_, save_path=load_path, lazy=True)
+                for _ in self.datasets
+            ]
+        else:
+            with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
+                supergraphs = pool.map(
+                    partial(self.mp_dataset_load, save_path=load_path), self.datasets
+                )
         self.supergraphs = {sg.name: sg for sg in supergraphs}
 
         # ensemble case
@@ -117,7 +143,7 @@ class BaseProvider:
 
         # self.aux = { dataset: Auxiliary(self.supergraphs[dataset]) for dataset in all_runs }
 
-    def mp_dataset_load(self, dataset, save_path):
+    def mp_dataset_load(self, dataset, save_path, lazy=False):
         """
         Parallel function to load single supergraph loading.
         """
@@ -129,6 +155,7 @@ class BaseProvider:
             os.path.join(save_path, name),
             module_callsite_map=self.config.get("module_callsite_map", {}),
             read_parameter=read_param,
+            lazy=lazy,
         )
         return sg
 
@@ -141,14 +168,11 @@ class BaseProvider:
 
         # TODO: Parallelize this.
         for dataset in self.config["runs"]:
-            process = False
             _name = dataset["name"]
             _path = os.path.join(save_path, _name)
-            for f_type in ["df", "nxg", "maps"]:
-                f_path = os.path.join(_path, SuperGraph._FILENAMES[f_type])
-                if not os.path.isfile(f_path):
-                    LOGGER.debug(f"{f_path} not found!!")
-                    process = True
+            process = not SuperGraph.has_store(_path)
+            if process:
+                LOGGER.debug(f"Columnar stores in {_path} not found!!")
 
             if process:
                 ret.append(dataset)
@@ -182,18 +206,31 @@ class BaseProvider:
         return ret
 
     def process_single(self, process_datasets, save_supergraphs):
-
+        """
+        Process each dataset into a SuperGraph (create, group, filter, and
+        write). With process_workers > 1, the datasets are processed in a
+        pool of worker processes. A dataset that fails is logged and skipped.
+        """
         if len(process_datasets) == 0:
             return
 
         append_path = self.config.get("append_path", "")
         load_path = self.config["data_path"]
-        m2c = self.config.get("m2c", {})
-        m2m = self.config.get("m2m", {})
-        group_by = self.config["group_by"]
-        filter_by = self.config.get("filter_by", "")
-        filter_perc = self.config.get("filter_perc", 0)
         save_path = self.config.get("save_path", "")
+        ingest_cache = ""
+        if self.config.get("ingest_cache", True):
+            ingest_cache = os.path.join(save_path, "ingest-cache")
+        params = {
+            "m2c": self.config.get("m2c", {}),
+            "m2m": self.config.get("m2m", {}),
+            "module_policy": self.config.get("module_match_policy", "interactive"),
+            "module_cache": self.config.get("module_map_cache", ""),
+            "ingest_cache": ingest_cache,
+            "group_by": self.config["group_by"],
+            "filter_by": self.config.get("filter_by", ""),
+            "filter_perc": self.config.get("filter_perc", 0),
+            "save_path": save_path,
+        }
 
         run_props = {
             _["name"]: (
@@ -208,13 +245,11 @@ class BaseProvider:
         if save_supergraphs:
             self.supergraphs = {}
 
-        for idx, dataset in enumerate(process_datasets):
+        jobs = []
+        for dataset in process_datasets:
             name = dataset["name"]
             _prop = run_props[name]
 
-            LOGGER.info(
-                f"Processing dataset [{idx+1}/{len(process_datasets)}] ({name}) (save={save_supergraphs})"
-            )
             data_path = os.path.join(load_path, _prop[0])
             if _prop[1] == "hpctoolkit" and not os.path.isfile(
                 os.path.join(data_path, "experiment.xml")
@@ -223,21 +258,250 @@ class BaseProvider:
                     f"Skipping {data_path} as it is missing the experiment.xml file"
                 )
                 continue
+            jobs.append((name, data_path, _prop[1]))
+
+        # the .cali files are converted in parallel before they are read.
+        cali_files = [_[1] for _ in jobs if _[2] == "caliper"]
+        if len(ingest_cache) > 0 and len(cali_files) > 0:
+            SuperGraph.convert_caliper(
+                cali_files,
+                ingest_cache,
+                nworkers=int(self.config.get("cali_query_workers", 0)),
+            )
+
+        nworkers = int(self.config.get("process_workers", 1))
+        if nworkers <= 0:
+            nworkers = multiprocessing.cpu_count()
+        nworkers = min(nworkers, len(jobs))
+
+        LOGGER.info(
+            f"Processing {len(jobs)} datasets with {max(nworkers, 1)} worker(s) (save={save_supergraphs})"
+        )
+        if nworkers <= 1:
+            results = []
+            for job in jobs:
+                results.append(
+                    BaseProvider._process_run(job, params, keep=save_supergraphs)
+                )
+                BaseProvider._log_progress(results[-1], len(results), len(jobs))
+        else:
+            # the workers cannot prompt for the modules.
+            if params["module_policy"] == "interactive":
+                LOGGER.warning(
+                    "Interactive module matching is not supported with "
+                    "process_workers > 1; using the 'unknown' policy"
+                )
+                params["module_policy"] = "unknown"
+            results = self._process_pool(jobs, params, nworkers)
 
+        failed = [_["name"] for _ in results if _["error"] is not None]
+        if len(failed) > 0:
+            LOGGER.error(f"Failed to process {len(failed)} datasets: {failed}")
+
+        if save_supergraphs:
+            for res in results:
+                if res["error"] is not None:
+                    continue
+                sg = res["sg"]
+                if sg is None:
+                    sg = self.mp_dataset_load({"name": res["name"]}, save_path)
+                self.supergraphs[sg.name] = sg
+                LOGGER.debug(f"Stored in dictionary ({sg.name})")
+
+    @staticmethod
+    def _process_run(job, params, keep=False):
+        """
+        Process a single dataset into a SuperGraph and write it. Exceptions
+        are caught so that a bad dataset does not abort the batch.
+
+        :param job: (tuple) name, data path, and profile format of the dataset
+        :param params: (dict) m2c, m2m, module_policy, module_cache,
+        ingest_cache, group_by, filter_by, filter_perc and save_path
+        :param keep: (bool) return the SuperGraph in the result
+        :return: (dict) name, sg (if keep), error, elapsed time, and RSS
+        """
+        name, data_path, profile_format = job
+        start = time.perf_counter()
+        ret = {"name": name, "sg": None, "error": None}
+        try:
             sg = SuperGraph(name)
-            sg.create(path=data_path, profile_format=_prop[1], m2c=m2c, m2m=m2m)
+            sg.create(
+                path=data_path,
+                profile_format=profile_format,
+                m2c=params["m2c"],
+                m2m=params["m2m"],
+                module_policy=params["module_policy"],
+                module_cache=params["module_cache"],
+                ingest_cache=params["ingest_cache"],
+            )
             LOGGER.info(f"Created supergraph ({name})")
 
-            Group(sg, group_by=group_by)
+            Group(sg, group_by=params["group_by"])
             LOGGER.info(f"Grouped supergraph {name}")
 
-            Filter(sg, filter_by=filter_by, filter_perc=filter_perc)
+            Filter(
+                sg, filter_by=params["filter_by"], filter_perc=params["filter_perc"]
+            )
             LOGGER.info(f"Filtered supergraph {name}")
 
-            sg.write(os.path.join(save_path, name))
-            if save_supergraphs:
-                self.supergraphs[sg.name] = sg
-                LOGGER.debug(f"Stored in dictionary ({name})")
+            sg.stats = NodeStats.from_supergraph(sg)
+
+            path = os.path.join(params["save_path"], name)
+            sg.write(path)
+
+            # the default layout is computed from the written SuperGraph, as
+            # it is loaded to serve the requests (lazily, so only what the
+            # layout reads is loaded).
+            _sg = SuperGraph(name)
+            _sg.load(path, lazy=True)
+            sg.sankey = BaseProvider._write_sankey(_sg, path)
+            _sg.unload()
+            if keep:
+                ret["sg"] = sg
+        except Exception as e:
+            LOGGER.error(
+                f"Failed to process dataset ({name}): {e}\n{traceback.format_exc()}"
+            )
+            ret["error"] = repr(e)
+
+        ret["elapsed"] = time.perf_counter() - start
+        ret["rss"] = psutil.Process(os.getpid()).memory_info().rss
+        return ret
+
+    @staticmethod
+    def _write_sankey(sg, path):
+        """
+        Compute the default Sankey layout of a SuperGraph (i.e., the layout
+        of a supergraph request without interactions) and write it, so that
+        it is served without running the layout. A failure is logged, and the
+        layout is then computed per request.
+
+        :param sg: (SuperGraph) SuperGraph loaded from path
+        :param path: path to the .callflow directory of the SuperGraph
+        :return: (dict) node-link data of the layout, None on a failure
+        """
+        try:
+            nxg = SankeyLayout(grp_column="group_path", sg=sg).nxg
+            sg.sankey = json_graph.node_link_data(nxg)
+        except Exception as e:
+            LOGGER.warning(
+                f"Failed to compute the default layout of ({sg.name}): {e}\n{traceback.format_exc()}"
+            )
+            sg.sankey = None
+
+        SuperGraph.write_sankey(path, sg.sankey)
+        return sg.sankey
+
+    def _process_pool(self, jobs, params, nworkers):
+        """
+        Process the datasets in worker processes, a process per dataset (so
+        its memory is returned to the system afterwards), and at most
+        nworkers at a time. No new dataset is started while the RSS of this
+        process and its workers, plus the largest RSS observed for a
+        dataset, exceeds process_memory_limit. A worker that dies (e.g., is
+        killed by the OOM killer) gives an error result for its dataset.
+
+        :return: (list) results of BaseProvider._process_run
+        """
+        memory_limit = int(self.config.get("process_memory_limit", 0))
+        pending = list(reversed(jobs))
+        running, results = [], []  # running: (process, connection, job, start)
+        peak_rss = 0
+
+        while len(pending) > 0 or len(running) > 0:
+            for task in list(running):
+                proc, conn, job, start = task
+                if not conn.poll() and proc.is_alive():
+                    continue
+
+                running.remove(task)
+                results.append(BaseProvider._worker_result(proc, conn, job, start))
+                peak_rss = max(peak_rss, results[-1]["rss"])
+                BaseProvider._log_progress(results[-1], len(results), len(jobs))
+
+            can_start = len(pending) > 0 and len(running) < nworkers
+            if can_start and memory_limit > 0 and len(running) > 0:
+                rss = BaseProvider._total_rss()
+                can_start = rss + peak_rss <= memory_limit
+                if not can_start:
+                    LOGGER.debug(
+                        f"Throttling: RSS ({format_bytes(rss)}) is close to the limit ({format_bytes(memory_limit)})"
+                    )
+
+            if can_start:
+                job = pending.pop()
+                conn, child_conn = multiprocessing.Pipe(duplex=False)
+                proc = multiprocessing.Process(
+                    target=BaseProvider._process_worker,
+                    args=(child_conn, job, params),
+                )
+                proc.start()
+                child_conn.close()
+                running.append((proc, conn, job, time.perf_counter()))
+            else:
+                time.sleep(0.5)
+
+        return results
+
+    @staticmethod
+    def _process_worker(conn, job, params):
+        """
+        Worker process of _process_pool: sends the result of a dataset.
+        """
+        conn.send(BaseProvider._process_run(job, params))
+        conn.close()
+
+    @staticmethod
+    def _worker_result(proc, conn, job, start):
+        """
+        Result of a finished worker of _process_pool, or an error result if
+        the worker died before sending it.
+        """
+        result = None
+        try:
+            if conn.poll():
+                result = conn.recv()
+        except (EOFError, OSError):
+            pass
+        conn.close()
+        proc.join()
+
+        if result is None:
+            result = {
+                "name": job[0],
+                "sg": None,
+                "error": f"Worker process died (exit code {proc.exitcode})",
+                "elapsed": time.perf_counter() - start,
+                "rss": 0,
+            }
+        return result
+
+    @staticmethod
+    def _total_rss():
+        """
+        RSS of this process and its child processes (in bytes).
+        """
+        process = psutil.Process(os.getpid())
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return rss
+
+    @staticmethod
+    def _log_progress(result, ndone, ntotal):
+        name = result["name"]
+        if result["error"] is not None:
+            LOGGER.error(
+                f"Skipped dataset [{ndone}/{ntotal}] ({name}): {result['error']}"
+            )
+            return
+
+        LOGGER.info(
+            f"Processed dataset [{ndone}/{ntotal}] ({name}) in {result['elapsed']:.1f}s (RSS: {format_bytes(result['rss'])})"
+        )
 
     def load_single(self, load_datasets):
 
@@ -285,10 +549,85 @@ class BaseProvider:
         Unify(sg, self.supergraphs)
         LOGGER.info(f"Created supergraph ({name})")
 
-        sg.write(os.path.join(save_path, name))
+        sg.stats = NodeStats.from_supergraph(sg)
+
+        path = os.path.join(save_path, name)
+        sg.write(path)
+
+        eg = EnsembleGraph(name)
+        eg.load(
+            path,
+            module_callsite_map=self.config.get("module_callsite_map", {}),
+            lazy=True,
+        )
+        sg.sankey = BaseProvider._write_sankey(eg, path)
+        eg.unload()
         self.supergraphs[name] = sg
         LOGGER.debug(f"Stored in dictionary ({name})")
 
+    def append_ensemble(self, save_path):
+        """
+        Append the processed datasets that are not in the processed ensemble
+        to it (see UnifyAppend), instead of unifying all the datasets again.
+
+        :return: (bool) False if the ensemble has to be processed from
+        scratch, i.e., it was not processed, it has datasets that are not
+        in this config, or the new rows do not match its columns.
+        """
+        name = "ensemble"
+        path = os.path.join(save_path, name)
+        if not SuperGraph.has_store(path):
+            LOGGER.info(f"Did not find a processed ensemble in ({path})")
+            return False
+
+        # the ensembles processed before the path table store the paths in
+        # the dataframe, so the new rows cannot be appended.
+        if not SuperGraph.has_store(path, f_types=["paths"]):
+            LOGGER.info(f"Processing the ensemble in ({path}) to add its path table")
+            return False
+
+        names = [
+            _["name"]
+            for _ in self.datasets
+            if SuperGraph.has_store(os.path.join(save_path, _["name"]))
+        ]
+        unified = EnsembleGraph.read_datasets(path)
+        removed = [_ for _ in unified if _ not in names]
+        if len(removed) > 0:
+            LOGGER.warning(
+                f"Processing the ensemble from scratch, as it has datasets that are not processed: {removed}"
+            )
+            return False
+
+        append = [_ for _ in names if _ not in unified]
+        if len(append) == 0:
+            LOGGER.info(f"Ensemble in ({path}) is up to date ({len(unified)} datasets)")
+            return True
+
+        eg = EnsembleGraph(name)
+        eg.load(
+            path,
+            module_callsite_map=self.config.get("module_callsite_map", {}),
+            lazy=True,
+        )
+
+        supergraphs = {
+            _: self.mp_dataset_load({"name": _}, save_path=save_path) for _ in append
+        }
+        unify = UnifyAppend(eg, supergraphs)
+        try:
+            eg.write_append(path, unify.dataframe)
+        except ValueError as e:
+            LOGGER.warning(f"Processing the ensemble from scratch: {e}")
+            return False
+        BaseProvider._write_sankey(eg, path)
+        LOGGER.info(
+            f"Appended {len(append)} datasets to the ensemble ({len(unified) + len(append)} datasets)"
+        )
+
+        self.supergraphs = {**supergraphs, name: eg}
+        return True
+
     # --------------------------------------------------------------------------
     def process(self, reset=False):
         """Process the datasets using a Pipeline of operations.
@@ -299,14 +638,30 @@ class BaseProvider:
         """
         save_path = self.config.get("save_path", "")
         ensemble_process = self.config.get("ensemble_process", False)
+        incremental = ensemble_process and not reset
+        incremental = incremental and self.config.get("ensemble_incremental", False)
 
         # Do not process, if already processed.
         if reset:
             process_datasets, load_datasets = self.datasets, []
         else:
+            self.convert_legacy_stores()
             process_datasets, load_datasets = self.split_process_load_datasets()
 
-        self.process_single(process_datasets, save_supergraphs=ensemble_process)
+        # In the incremental mode, the new datasets are appended to the
+        # processed ensemble, and the other datasets are not loaded.
+        self.process_single(
+            process_datasets, save_supergraphs=ensemble_process and not incremental
+        )
+        if incremental and self.append_ensemble(save_path):
+            return
+
+        if incremental:
+            load_datasets = [
+                _
+                for _ in self.datasets
+                if SuperGraph.has_store(os.path.join(save_path, _["name"]))
+            ]
         self.load_single(load_datasets)
         self.process_ensemble(save_path)
 
@@ -390,9 +745,55 @@ class BaseProvider:
 
         elif operation_name == "cct":
             sg = self.supergraphs[operation["dataset"]]
-            nll = NodeLinkLayout(sg=sg, selected_runs=operation["dataset"])
+            nll = NodeLinkLayout(
+                sg=sg,
+                selected_runs=operation["dataset"],
+                max_nodes=int(operation.get("max_nodes", 0)),
+            )
             return nll.nxg
 
+    def request_sankey(self, operation, sg, esg=None):
+        """
+        Sankey layout of a supergraph request. The default layout written at
+        process time (see _write_sankey) is served without running the
+        layout, and the reveal and split interactions are applied to it.
+
+        :param operation: (dict) supergraph request
+        :param sg: (SuperGraph) SuperGraph of the dataset
+        :param esg: (SuperGraph) SuperGraph of the ensemble (the layout is
+        computed for it, if given)
+        :return: (nx.DiGraph) Sankey layout
+        """
+        nbins = int(operation.get("nbins", 20))
+        filter_perc = float(operation.get("filter_perc", 0.0))
+        interactions = {
+            _: operation.get(_, [])
+            for _ in ["reveal_callsites", "split_entry_module", "split_callee_module"]
+        }
+
+        # the default layout has 20 bins and no filter percentage.
+        nxg = (sg if esg is None else esg).sankey
+        if nxg is not None and nbins == 20 and filter_perc == 0:
+            nxg = json_graph.node_link_graph(nxg)
+            if all(len(_) == 0 for _ in interactions.values()):
+                return nxg
+        else:
+            nxg = None
+
+        ssg = SankeyLayout(
+            grp_column="group_path",
+            sg=sg,
+            esg=esg,
+            nbins=nbins,
+            **interactions,
+            filter_by=operation.get(
+                "filter_by", self.config.get("filter_by", "time (inc)")
+            ),
+            filter_perc=filter_perc,
+            nxg=nxg,
+        )
+        return ssg.nxg
+
     def request_single(self, operation):
         """
         Handles requests connected to Single CallFlow.
@@ -418,16 +819,7 @@ class BaseProvider:
             ntype = operation["ntype"]
 
         if operation_name == "supergraph":
-            ssg = SankeyLayout(
-                grp_column="group_path",
-                sg=sg,
-                esg=None,
-                nbins=operation.get("nbins", 20),
-                reveal_callsites=operation.get("reveal_callsites", []),
-                split_entry_module=operation.get("split_entry_module", []),
-                split_callee_module=operation.get("split_callee_module", []),
-            )
-            return ssg.nxg
+            return self.request_sankey(operation, sg)
 
         elif operation_name == "split_ranks":
             selected_ranks = operation["ranks"]
@@ -459,6 +851,7 @@ class BaseProvider:
                 ntype=ntype,
                 histo_types=["rank"],
                 bins=nbins,
+                max_points=int(operation.get("max_points", 0)),
             )
 
             return hist.unpack()
@@ -473,6 +866,7 @@ class BaseProvider:
                 name=node,
                 ntype=ntype,
                 orientation=orientation,
+                max_points=int(operation.get("max_points", 0)),
             )
 
             return scatterplot.unpack()
@@ -480,9 +874,11 @@ class BaseProvider:
         elif operation_name == "boxplots":
             callsites = operation["callsites"]
 
+            max_points = int(operation.get("max_points", 0))
+
             result = {}
             for callsite in callsites:
-                bp = BoxPlot(sg=sg, name=callsite, ntype=ntype)
+                bp = BoxPlot(sg=sg, name=callsite, ntype=ntype, max_points=max_points)
                 result[callsite] = bp.unpack()
 
             return result
@@ -529,16 +925,7 @@ class BaseProvider:
             sg = self.supergraphs[operation["dataset"]]
 
         if operation_name == "supergraph":
-            ssg = SankeyLayout(
-                grp_column="group_path",
-                sg=sg,
-                esg=e_sg,
-                nbins=int(operation.get("nbins", 20)),
-                reveal_callsites=operation.get("reveal_callsites", []),
-                split_entry_module=operation.get("split_entry_module", []),
-                split_callee_module=operation.get("split_callee_module", []),
-            )
-            return ssg.nxg
+            return self.request_sankey(operation, sg, e_sg)
 
         elif operation_name == "module_hierarchy":
             nbins = int(operation.get("nbins", 20))
@@ -566,8 +953,11 @@ class BaseProvider:
             compare_dataset = operation.get("compareRun", None)
             target_dataset = operation.get("targetRun", None)
             selected_metric = operation.get("selectedMtric", "time")
+            max_points = int(operation.get("max_points", 0))
 
-            dv = DiffView(e_sg, compare_dataset, target_dataset, selected_metric)
+            dv = DiffView(
+                e_sg, compare_dataset, target_dataset, selected_metric, max_points
+            )
             return dv.result
 
         elif operation_name == "histogram":
@@ -581,6 +971,7 @@ class BaseProvider:
                 ntype=ntype,
                 histo_types=["rank"],
                 bins=nbins,
+                max_points=int(operation.get("max_points", 0)),
             )
 
             return hist.unpack()
@@ -595,6 +986,7 @@ class BaseProvider:
                 name=node,
                 ntype=ntype,
                 orientation=orientation,
+                max_points=int(operation.get("max_points", 0)),
             )
 
             return scatterplot.unpack()
@@ -602,6 +994,7 @@ class BaseProvider:
         elif operation_name == "boxplots":
             callsites = operation.get("callsites", [])
             iqr = float(operation.get("iqr", 1.5))
+            max_points = int(operation.get("max_points", 0))
 
             result = {}
             for callsite in callsites:
@@ -611,6 +1004,7 @@ class BaseProvider:
                     name=callsite,
                     ntype=ntype,
                     iqr_scale=iqr,
+                    max_points=max_points,
                 )
                 result[callsite] = bp.unpack()
 
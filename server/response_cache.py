@@ -0,0 +1,270 @@
+# Copyright 2017-2021 Lawrence Livermore National Security, LLC and other
+# CallFlow Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: MIT
+# ------------------------------------------------------------------------------
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+import callflow
+from callflow.utils.utils import NumpyEncoder
+
+LOGGER = callflow.get_logger(__name__)
+
+
+# ------------------------------------------------------------------------------
+class ResponseCache:
+    """
+    Cache of the serialized responses of the API endpoints.
+
+    The responses are keyed on the endpoint, the normalized operation, and
+    the fingerprint of the loaded datasets, so a re-processed dataset
+    invalidates all its responses. The cache has a byte-bounded LRU in
+    memory and an optional tier on disk, which is also an LRU if bounded.
+    The responses are kept as utf-8 bytes, so the bounds are in bytes.
+    """
+
+    def __init__(self, fingerprint, max_bytes=0, cache_dir="", max_disk_bytes=0):
+        """
+        Constructor to ResponseCache class.
+
+        :param fingerprint: (str) fingerprint of the loaded datasets
+        :param max_bytes: (int) size of the in-memory LRU (0 disables it)
+        :param cache_dir: (str) directory for the on-disk tier ("" disables it)
+        :param max_disk_bytes: (int) size of the on-disk tier (0 is unbounded)
+        """
+        assert isinstance(fingerprint, str)
+        assert max_bytes >= 0 and max_disk_bytes >= 0
+
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.cache_dir = ""
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_nbytes = 0
+        self.disk_entries = OrderedDict()  # key -> size, least recent first
+        if len(cache_dir) > 0:
+            self.cache_dir = os.path.join(cache_dir, fingerprint)
+            ResponseCache._prune_disk(cache_dir, keep=fingerprint)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def fingerprint_paths(paths):
+        """
+        Fingerprint of the processed data, i.e., size and modification time
+        of every file under the given paths.
+
+        :param paths: (list) processed directories (e.g., .callflow/<dataset>)
+        :return: (str) sha1 hex digest
+        """
+        sha = hashlib.sha1()
+        for path in sorted(paths):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for fname in sorted(files):
+                    fname = os.path.join(root, fname)
+                    stat = os.stat(fname)
+                    sha.update(f"{fname}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return sha.hexdigest()
+
+    @staticmethod
+    def dumps(data):
+        """
+        Serialize a response (numpy arrays and scalars are converted).
+
+        :param data: json data of the response
+        :return: (str) serialized response
+        """
+        return json.dumps(data, cls=NumpyEncoder)
+
+    def key(self, endpoint, operation):
+        """
+        Key of an operation.
+
+        :param endpoint: (str) endpoint name
+        :param operation: (dict) operation (request json)
+        :return: (str) sha1 hex digest
+        """
+        normalized = json.dumps(
+            {"endpoint": endpoint, "operation": operation},
+            sort_keys=True,
+            cls=NumpyEncoder,
+        )
+        return hashlib.sha1((self.fingerprint + normalized).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Lookup a response.
+
+        :param key: (str) key
+        :return: (bytes) serialized response (utf-8), None on a miss.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return self.entries[key]
+
+        data = self._read_disk(key)
+        with self.lock:
+            if data is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._put_memory(key, data)
+        return data
+
+    def put(self, key, data):
+        """
+        Store a response.
+
+        :param key: (str) key
+        :param data: (str) serialized response
+        """
+        assert isinstance(data, str)
+        data = data.encode()
+        with self.lock:
+            self._put_memory(key, data)
+        self._write_disk(key, data)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            self.disk_entries.clear()
+            self.disk_nbytes = 0
+        if len(self.cache_dir) > 0:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "disk": self.cache_dir,
+                "disk_entries": len(self.disk_entries),
+                "disk_bytes": self.disk_nbytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "fingerprint": self.fingerprint,
+            }
+
+    # --------------------------------------------------------------------------
+    def _put_memory(self, key, data):
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.nbytes -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if len(self.cache_dir) == 0:
+            return None
+
+        fname = self._disk_path(key)
+        try:
+            with open(fname, "rb") as fptr:
+                data = fptr.read()
+        except FileNotFoundError:
+            return None
+
+        # the modification time orders the entries across the restarts.
+        os.utime(fname)
+        with self.lock:
+            if key in self.disk_entries:
+                self.disk_entries.move_to_end(key)
+        return data
+
+    def _write_disk(self, key, data):
+        if len(self.cache_dir) == 0:
+            return
+        if self.max_disk_bytes > 0 and len(data) > self.max_disk_bytes:
+            return
+
+        fname = self._disk_path(key)
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        ftmp = f"{fname}.{threading.get_ident()}.tmp"
+        with open(ftmp, "wb") as fptr:
+            fptr.write(data)
+        os.replace(ftmp, fname)
+
+        with self.lock:
+            self.disk_nbytes += len(data) - self.disk_entries.pop(key, 0)
+            self.disk_entries[key] = len(data)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """
+        Remove the least recently used responses on disk above the bound.
+        """
+        evicted = []
+        with self.lock:
+            while self.max_disk_bytes > 0 and self.disk_nbytes > self.max_disk_bytes:
+                key, size = self.disk_entries.popitem(last=False)
+                self.disk_nbytes -= size
+                evicted.append(key)
+
+        for key in evicted:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _scan_disk(self):
+        """
+        Index the responses on disk, least recently used first.
+        """
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for fname in files:
+                if not fname.endswith(".json"):
+                    continue
+                stat = os.stat(os.path.join(root, fname))
+                entries.append((stat.st_mtime_ns, fname[: -len(".json")], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.disk_entries[key] = size
+            self.disk_nbytes += size
+        self._evict_disk()
+
+    @staticmethod
+    def _prune_disk(cache_dir, keep):
+        """
+        Remove the on-disk responses of the other fingerprints.
+        """
+        if not os.path.isdir(cache_dir):
+            return
+
+        is_fingerprint = lambda _: len(_) == 40 and all(
+            c in "0123456789abcdef" for c in _
+        )
+        for _ in os.listdir(cache_dir):
+            if _ != keep and is_fingerprint(_):
+                LOGGER.debug(f"Removing the stale response cache ({_})")
+                shutil.rmtree(os.path.join(cache_dir, _), ignore_errors=True)
+
+
+# ------------------------------------------------------------------------------